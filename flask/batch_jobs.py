@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Asynchronous batch jobs for the Sentiment Analysis API
+
+A large /batch-analyze call holds its connection and a request thread until
+the whole batch is scored. A batch job is submitted instead: the client gets
+a job id at once, a small bounded pool of background threads scores the
+texts chunk by chunk, and the client polls for progress and pages through
+the results.
+
+Jobs and their results live in a local SQLite store (JobStore), shared by
+every server worker process on the host, and are deleted once they expire
+(on the next submission, or the next read after PURGE_INTERVAL_SECONDS).
+Each client may only have a few jobs queued or running at a time, and
+between chunks a job gives way to interactive /analyze requests that are
+waiting, so bulk work cannot starve them.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sentiment_stats import SentimentStatistics
+
+# SQLite file holding jobs and results
+JOB_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batch_jobs.sqlite3')
+
+# Background threads scoring jobs, per server process
+JOB_WORKERS = 1
+
+# Texts scored per chunk; progress is saved after every chunk
+JOB_CHUNK_SIZE = 500
+
+# Seconds a job and its results are kept after its last progress
+JOB_TTL_SECONDS = 3600
+
+# Shortest interval between purges of expired jobs triggered by reads (every
+# submission purges), so a store nobody submits to is still cleaned
+PURGE_INTERVAL_SECONDS = 60
+
+# Jobs a single client may have queued or running at once
+JOBS_PER_CLIENT = 2
+
+# Jobs waiting for a background thread, per server process
+MAX_QUEUED_JOBS = 100
+
+# Longest pause between chunks while interactive requests are waiting
+YIELD_SECONDS = 0.05
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    client TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    options TEXT NOT NULL,
+    model_version TEXT,
+    statistics TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client, status);
+CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (expires_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, position)
+) WITHOUT ROWID;
+"""
+
+
+class JobLimitError(Exception):
+    """The client or the server has too many jobs in flight."""
+
+
+class JobNotFoundError(Exception):
+    """No such job (or it belongs to another client, or has expired)."""
+
+
+def _process_id():
+    """Identify this process as owner of the jobs it runs."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner):
+    """Whether the process that owns a job is still running (assumed so on other hosts)."""
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class JobStore:
+    """
+    SQLite store of jobs and their results.
+    """
+
+    def __init__(self, path=JOB_DB_PATH):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            path (str): SQLite database file (':memory:' for a private store)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+        self._db()
+
+    def _db(self):
+        """This process's connection; a connection must not be used across fork."""
+        if self._connection_pid != os.getpid():
+            connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            connection.row_factory = sqlite3.Row
+            with connection:
+                if self.path != ':memory:':
+                    # Readers in other worker processes do not block the writer
+                    connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _execute(self, sql, parameters=()):
+        """Run one statement in its own transaction."""
+        with self._lock, self._db() as connection:
+            return connection.execute(sql, parameters)
+
+    def create(self, job_id, client, owner, total, options, ttl):
+        """Insert a queued job."""
+        now = time.time()
+        self._execute(
+            'INSERT INTO jobs (id, client, owner, status, total, options, created_at, updated_at, expires_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, client, owner, 'queued', total, json.dumps(options), now, now, now + ttl)
+        )
+
+    def get(self, job_id):
+        """
+        Read a job.
+
+        Returns:
+            dict: The job row, or None if there is no such job
+        """
+        with self._lock:
+            row = self._db().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def update(self, job_id, ttl=None, **fields):
+        """Update columns of a job, optionally extending its expiry by ttl seconds from now."""
+        fields["updated_at"] = time.time()
+        if ttl is not None:
+            fields["expires_at"] = fields["updated_at"] + ttl
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self._execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def add_results(self, job_id, start, results, done, ttl):
+        """
+        Store a chunk of results and the job's progress in one transaction.
+
+        Returns:
+            bool: False if the job no longer exists (cancelled or expired)
+        """
+        now = time.time()
+        with self._lock, self._db() as connection:
+            updated = connection.execute(
+                'UPDATE jobs SET done = ?, updated_at = ?, expires_at = ? WHERE id = ?',
+                (done, now, now + ttl, job_id)
+            )
+            if not updated.rowcount:
+                return False
+            connection.executemany(
+                'INSERT OR REPLACE INTO results (job_id, position, result) VALUES (?, ?, ?)',
+                ((job_id, start + i, json.dumps(result)) for i, result in enumerate(results))
+            )
+        return True
+
+    def results(self, job_id, offset, limit):
+        """
+        Read a page of results.
+
+        Returns:
+            list: Results at positions offset .. offset + limit - 1
+        """
+        with self._lock:
+            rows = self._db().execute(
+                'SELECT result FROM results WHERE job_id = ? AND position >= ? ORDER BY position LIMIT ?',
+                (job_id, offset, limit)
+            ).fetchall()
+        return [json.loads(row['result']) for row in rows]
+
+    def active_jobs(self, client):
+        """Jobs of a client that are queued or running."""
+        with self._lock:
+            rows = self._db().execute(
+                'SELECT * FROM jobs WHERE client = ? AND status IN (?, ?)', (client, *ACTIVE_STATUSES)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, job_id):
+        """Delete a job and its results."""
+        with self._lock, self._db() as connection:
+            connection.execute('DELETE FROM results WHERE job_id = ?', (job_id,))
+            connection.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def purge_expired(self, now=None):
+        """
+        Delete expired jobs and their results.
+
+        Returns:
+            int: Number of jobs deleted
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._db() as connection:
+            expired = [row['id'] for row in connection.execute(
+                'SELECT id FROM jobs WHERE expires_at <= ?', (now,)
+            )]
+            for job_id in expired:
+                connection.execute('DELETE FROM results WHERE job_id = ?', (job_id,))
+                connection.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        return len(expired)
+
+
+class BatchJobManager:
+    """
+    Runs batch jobs on a bounded pool of background threads.
+    """
+
+    def __init__(self, get_analyzer, store=None, workers=JOB_WORKERS, chunk_size=JOB_CHUNK_SIZE,
+                 ttl=JOB_TTL_SECONDS, jobs_per_client=JOBS_PER_CLIENT, max_queued_jobs=MAX_QUEUED_JOBS,
+                 interactive_waiting=None, on_results=None):
+        """
+        Create the manager; its threads start with the first submitted job.
+
+        Args:
+            get_analyzer (callable): Returns the analyzer to score a job with
+            store (JobStore): Where jobs and results are kept (defaults to JOB_DB_PATH)
+            workers (int): Background threads scoring jobs
+            chunk_size (int): Texts scored per chunk
+            ttl (float): Seconds a job and its results are kept
+            jobs_per_client (int): Jobs a client may have queued or running
+            max_queued_jobs (int): Jobs this process accepts ahead of its threads
+            interactive_waiting (callable): Returns True while interactive
+                requests are waiting, so jobs pause between chunks
+            on_results (callable): Called with each chunk's results and the
+                job options (e.g. to record live statistics)
+        """
+        self.get_analyzer = get_analyzer
+        self.store = store if store is not None else JobStore()
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.jobs_per_client = jobs_per_client
+        self.max_queued_jobs = max_queued_jobs
+        self.interactive_waiting = interactive_waiting
+        self.on_results = on_results
+
+        self._owner = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._purged_at = None
+
+    def submit(self, client, texts, options=None):
+        """
+        Queue a batch of texts for scoring.
+
+        Args:
+            client (str): Client submitting the job
+            texts (list): Texts to analyze
+            options (dict): Job options ('topic', 'record') passed to on_results
+
+        Returns:
+            dict: Status of the new job
+
+        Raises:
+            JobLimitError: If the client or this process has too many jobs in flight
+        """
+        self._purge_expired()
+        with self._lock:
+            # The store is shared by every worker process, so a client's
+            # limit holds across them; jobs of dead processes do not count
+            active = [job for job in self.store.active_jobs(client) if self._check_owner(job)]
+            if len(active) >= self.jobs_per_client:
+                raise JobLimitError(f"Client already has {len(active)} jobs in progress (limit {self.jobs_per_client})")
+            if self._pending >= self.max_queued_jobs:
+                raise JobLimitError(f"Too many queued jobs ({self.max_queued_jobs})")
+
+            if self._executor is None or self._owner != _process_id():
+                # Started lazily, so each forked server worker gets its own threads
+                self._owner = _process_id()
+                self._pending = 0
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='sentiment-job')
+            job_id = uuid.uuid4().hex
+            self.store.create(job_id, client, self._owner, len(texts), options or {}, self.ttl)
+            self._pending += 1
+            self._executor.submit(self._run, job_id, list(texts), options or {})
+        return self.status(job_id, client)
+
+    def _check_owner(self, job):
+        """Fail an active job whose owner process is gone; returns whether it is still active."""
+        if _owner_alive(job['owner']):
+            return True
+        self.store.update(job['id'], status='failed', error='Interrupted: the server process running it stopped')
+        return False
+
+    def _run(self, job_id, texts, options):
+        """Background thread: score a job chunk by chunk."""
+        with self._lock:
+            self._pending -= 1
+        job = self.store.get(job_id)
+        if job is None or job['status'] != 'queued':
+            return
+
+        try:
+            # One analyzer for the whole job, so every result comes from the
+            # same model version even if a new one is swapped in meanwhile
+            analyzer = self.get_analyzer()
+            if analyzer is None:
+                raise RuntimeError("Sentiment model is not available")
+            self.store.update(job_id, status='running', model_version=analyzer.model_version)
+
+            statistics = SentimentStatistics()
+            for start in range(0, len(texts), self.chunk_size):
+                self._yield_to_interactive()
+                results = analyzer.batch_analyze(texts[start:start + self.chunk_size])
+                if not self.store.add_results(job_id, start, results, start + len(results), self.ttl):
+                    # Cancelled (deleted) meanwhile
+                    return
+                statistics.update(results)
+                if self.on_results is not None:
+                    self.on_results(results, options)
+
+            self.store.update(job_id, ttl=self.ttl, status='completed', statistics=json.dumps(statistics.summary()))
+        except Exception as e:
+            self.store.update(job_id, ttl=self.ttl, status='failed', error=f"{type(e).__name__}: {e}")
+
+    def _yield_to_interactive(self):
+        """Pause (up to YIELD_SECONDS) while interactive requests are waiting."""
+        if self.interactive_waiting is None:
+            return
+        deadline = time.perf_counter() + YIELD_SECONDS
+        while self.interactive_waiting() and time.perf_counter() < deadline:
+            time.sleep(0.001)
+
+    def _purge_expired(self, interval=0.0):
+        """Delete expired jobs, unless that was done less than interval seconds ago."""
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < interval:
+            return
+        self._purged_at = now
+        self.store.purge_expired()
+
+    def _get(self, job_id, client):
+        """Read a job of a client, failing it if its owner process is gone."""
+        self._purge_expired(PURGE_INTERVAL_SECONDS)
+        job = self.store.get(job_id)
+        if job is None or job['client'] != client or job['expires_at'] <= time.time():
+            raise JobNotFoundError(f"No job {job_id}")
+        if job['status'] in ACTIVE_STATUSES and not self._check_owner(job):
+            job = self.store.get(job_id)
+        return job
+
+    def status(self, job_id, client):
+        """
+        Report the status and progress of a job.
+
+        Args:
+            job_id (str): Job id
+            client (str): Client asking (jobs are only visible to their client)
+
+        Returns:
+            dict: Status, progress and, once completed, statistics
+
+        Raises:
+            JobNotFoundError: If there is no such job for the client
+        """
+        job = self._get(job_id, client)
+        status = {
+            "job_id": job['id'],
+            "status": job['status'],
+            "total": job['total'],
+            "done": job['done'],
+            "progress": round(job['done'] / job['total'], 4) if job['total'] else 1.0,
+            "model_version": job['model_version'],
+            "created_at": job['created_at'],
+            "expires_at": job['expires_at']
+        }
+        if job['status'] == 'completed':
+            status["statistics"] = json.loads(job['statistics'])
+        if job['error']:
+            status["error"] = job['error']
+        return status
+
+    def results(self, job_id, client, offset=0, limit=100):
+        """
+        Read a page of a job's results (those scored so far while it runs).
+
+        Args:
+            job_id (str): Job id
+            client (str): Client asking
+            offset (int): Position of the first result
+            limit (int): Largest number of results returned
+
+        Returns:
+            tuple: (job status, list of results)
+
+        Raises:
+            JobNotFoundError: If there is no such job for the client
+        """
+        status = self.status(job_id, client)
+        return status, self.store.results(job_id, offset, limit)
+
+    def cancel(self, job_id, client):
+        """
+        Cancel a job and delete it with its results.
+
+        Args:
+            job_id (str): Job id
+            client (str): Client asking
+
+        Raises:
+            JobNotFoundError: If there is no such job for the client
+        """
+        self._get(job_id, client)
+        # A running job stops at its next chunk once its row is gone
+        self.store.delete(job_id)
+
+    def shutdown(self):
+        """Stop accepting jobs and wait for the running ones."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
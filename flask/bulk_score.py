@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Offline bulk scoring for exported comment archives
+
+Rescoring the whole feedback archive through /batch-analyze pays HTTP and
+JSON overhead on every request. This command scores an export directly:
+it reads a CSV, JSON lines, JSON array or Parquet file in chunks, scores every chunk on
+the batched path (spread over worker processes with --processes) and
+streams the results to a JSON lines or CSV file:
+
+    python bulk_score.py feedback.csv scored.jsonl --text-column comment --id-column id
+    python bulk_score.py feedback.parquet scored.csv --processes 8
+
+Progress is checkpointed next to the output after every chunk (the number
+of rows done, the output size and the running statistics). Running the same
+command again after an interruption resumes where it stopped; --fresh
+starts over. The run ends with statistics over every scored row.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from file_utils import atomic_write_text
+from model_artifacts import MODEL_DIR
+from response_shaping import parse_fields, select_fields
+from sentiment import BlockchainVotingSentimentAnalyzer
+from sentiment_stats import SentimentStatistics
+
+# Rows read and scored at once
+CHUNK_SIZE = 10000
+
+# Input formats by file extension
+INPUT_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.json': 'json',
+    '.parquet': 'parquet',
+    '.pq': 'parquet'
+}
+
+# Output formats by file extension
+OUTPUT_FORMATS = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv'
+}
+
+# Columns of CSV output
+CSV_COLUMNS = ('row', 'id', 'sentiment', 'confidence', 'positive', 'neutral', 'negative',
+               'positive_terms', 'negative_terms', 'error')
+
+
+def detect_format(path, formats):
+    """
+    Pick a file format from the file extension.
+
+    Args:
+        path (str): File path
+        formats (dict): Extension to format mapping
+
+    Returns:
+        str: The format
+
+    Raises:
+        ValueError: If the extension is not recognized
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in formats:
+        raise ValueError(f"Cannot tell the format of {path}; use one of {', '.join(sorted(formats))}")
+    return formats[extension]
+
+
+def read_chunks(path, input_format, chunk_size, columns):
+    """
+    Read an input file chunk by chunk.
+
+    Args:
+        path (str): Input file
+        input_format (str): 'csv', 'jsonl', 'json' or 'parquet'
+        chunk_size (int): Rows per chunk (Parquet chunks may be smaller, at
+            row group boundaries)
+        columns (list): Columns to read
+
+    Yields:
+        DataFrame: The next rows
+    """
+    if input_format == 'csv':
+        yield from pd.read_csv(path, usecols=columns, dtype=str, keep_default_na=False,
+                               chunksize=chunk_size)
+    elif input_format == 'jsonl':
+        for chunk in pd.read_json(path, lines=True, dtype=False, chunksize=chunk_size):
+            yield _select_columns(chunk, columns, path)
+    elif input_format == 'json':
+        # A JSON array of objects cannot be parsed incrementally, so it is
+        # read whole; export large archives as JSON lines instead
+        with open(path, encoding='utf-8') as f:
+            try:
+                records = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} is not a JSON array ({e}); name JSON lines files .jsonl") from None
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ValueError(f"{path} must hold a JSON array of objects (use .jsonl for JSON lines)")
+        frame = _select_columns(pd.DataFrame.from_records(records), columns, path)
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+    else:
+        import pyarrow.parquet as pq  # Lazy import; only needed for Parquet input
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+
+
+def _select_columns(frame, columns, path):
+    """Keep the requested columns of a JSON chunk, which may lack some of them."""
+    missing = [column for column in columns if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Column {missing[0]!r} not found in {path}")
+    return frame[columns]
+
+
+def _plain_values(series):
+    """Column values as plain Python objects, with missing values as None."""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+class BulkScoringJob:
+    """
+    Scores an input file into an output file, resumably.
+    """
+
+    def __init__(self, analyzer, input_path, output_path, text_column='text', id_column=None,
+                 chunk_size=CHUNK_SIZE, fields='compact', resume=True):
+        """
+        Prepare the job; nothing is read until run is called.
+
+        Args:
+            analyzer (BlockchainVotingSentimentAnalyzer): Loaded analyzer
+            input_path (str): CSV, JSON lines or Parquet file
+            output_path (str): JSON lines or CSV file to write
+            text_column (str): Column holding the comment text
+            id_column (str): Column copied to the output to identify rows
+            chunk_size (int): Rows read and scored at once
+            fields (str): Result fields written to JSON lines output (see
+                response_shaping.parse_fields)
+            resume (bool): Whether to continue from an existing checkpoint
+
+        Raises:
+            ValueError: On unknown file formats or result fields
+        """
+        self.analyzer = analyzer
+        self.input_path = os.path.abspath(input_path)
+        self.output_path = os.path.abspath(output_path)
+        self.checkpoint_path = self.output_path + '.checkpoint.json'
+        self.input_format = detect_format(input_path, INPUT_FORMATS)
+        self.output_format = detect_format(output_path, OUTPUT_FORMATS)
+        self.text_column = text_column
+        self.id_column = id_column
+        self.chunk_size = chunk_size
+        self.fields = fields
+        self._selected_fields = parse_fields(fields)
+        self.resume = resume
+
+        self.rows_done = 0
+        self.skipped = 0
+        self.output_bytes = 0
+        self.completed = False
+        self.statistics = SentimentStatistics()
+
+    def _options(self):
+        """Options a checkpoint must match to be resumed."""
+        return {
+            "input": self.input_path,
+            "text_column": self.text_column,
+            "id_column": self.id_column,
+            "fields": self.fields,
+            "model_version": self.analyzer.model_version
+        }
+
+    def _load_checkpoint(self):
+        """Restore progress from the checkpoint, if there is one to resume."""
+        if not self.resume or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        for name, value in self._options().items():
+            if checkpoint[name] != value:
+                raise ValueError(
+                    f"Checkpoint {self.checkpoint_path} was written with {name}={checkpoint[name]!r}, "
+                    f"not {value!r}; rerun with --fresh to start over"
+                )
+        if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) < checkpoint["output_bytes"]:
+            raise ValueError(f"Output {self.output_path} is shorter than its checkpoint; rerun with --fresh")
+
+        self.rows_done = checkpoint["rows_done"]
+        self.skipped = checkpoint["skipped"]
+        self.output_bytes = checkpoint["output_bytes"]
+        self.completed = checkpoint["completed"]
+        self.statistics = SentimentStatistics.from_dict(checkpoint["statistics"])
+
+    def _write_checkpoint(self):
+        """Record the progress made so far."""
+        checkpoint = dict(
+            self._options(),
+            rows_done=self.rows_done,
+            skipped=self.skipped,
+            output_bytes=self.output_bytes,
+            completed=self.completed,
+            statistics=self.statistics.to_dict(),
+            updated_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        )
+        atomic_write_text(self.checkpoint_path, json.dumps(checkpoint))
+
+    def _chunks_to_do(self):
+        """Input chunks with the rows done before a resume cut off."""
+        columns = [self.text_column] + ([self.id_column] if self.id_column else [])
+        seen = 0
+        for chunk in read_chunks(self.input_path, self.input_format, self.chunk_size, columns):
+            start = seen
+            seen += len(chunk)
+            if seen <= self.rows_done:
+                continue
+            yield start, chunk.iloc[max(self.rows_done - start, 0):]
+
+    def _score_chunk(self, start, chunk):
+        """
+        Score one chunk.
+
+        Returns:
+            list: (row number, id, result or None) per row
+        """
+        texts = _plain_values(chunk[self.text_column])
+        ids = _plain_values(chunk[self.id_column]) if self.id_column else [None] * len(texts)
+        rows = range(start, start + len(texts))
+
+        # Rows without usable text get an error line instead of a result
+        valid = [i for i, text in enumerate(texts) if isinstance(text, str) and text.strip()]
+        results = [None] * len(texts)
+        for i, result in zip(valid, self.analyzer.batch_analyze([texts[i] for i in valid])):
+            results[i] = result
+        self.statistics.update(results[i] for i in valid)
+        self.skipped += len(texts) - len(valid)
+        return list(zip(rows, ids, results))
+
+    def _write_jsonl(self, output, scored):
+        """Append scored rows as JSON lines."""
+        lines = []
+        for row, row_id, result in scored:
+            record = {"row": row}
+            if self.id_column:
+                record["id"] = row_id
+            if result is None:
+                record["error"] = "Missing text"
+            else:
+                record.update(select_fields(result, self._selected_fields))
+            lines.append(json.dumps(record, ensure_ascii=False))
+        output.write(('\n'.join(lines) + '\n').encode('utf-8'))
+
+    def _write_csv(self, output, scored):
+        """Append scored rows as CSV records."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row, row_id, result in scored:
+            if result is None:
+                writer.writerow([row, row_id, '', '', '', '', '', '', '', 'Missing text'])
+                continue
+            scores = result["sentiment_scores"]
+            writer.writerow([
+                row, row_id, result["sentiment"], result["confidence"],
+                scores["positive"], scores["neutral"], scores["negative"],
+                ';'.join(result["key_terms"]["positive"]), ';'.join(result["key_terms"]["negative"]), ''
+            ])
+        output.write(buffer.getvalue().encode('utf-8'))
+
+    def run(self):
+        """
+        Score every remaining row.
+
+        Returns:
+            dict: Statistics over every scored row of the input
+        """
+        self._load_checkpoint()
+        if self.completed:
+            print(f"{self.output_path} is already complete ({self.rows_done} rows)")
+            return self.statistics.summary()
+        if self.rows_done:
+            print(f"Resuming after row {self.rows_done}")
+
+        # Anything written after the last checkpoint is dropped and rescored
+        mode = 'r+b' if self.output_bytes else 'wb'
+        with open(self.output_path, mode) as output:
+            output.truncate(self.output_bytes)
+            output.seek(self.output_bytes)
+            write_rows = self._write_csv if self.output_format == 'csv' else self._write_jsonl
+            if self.output_format == 'csv' and not self.output_bytes:
+                output.write((','.join(CSV_COLUMNS) + '\r\n').encode('utf-8'))
+
+            started = time.perf_counter()
+            rows_this_run = 0
+            for start, chunk in self._chunks_to_do():
+                write_rows(output, self._score_chunk(start, chunk))
+                output.flush()
+                os.fsync(output.fileno())
+
+                self.rows_done = start + len(chunk)
+                self.output_bytes = output.tell()
+                self._write_checkpoint()
+
+                rows_this_run += len(chunk)
+                elapsed = time.perf_counter() - started
+                print(f"Scored {self.rows_done} rows ({rows_this_run / elapsed:.0f} rows/s)")
+
+        self.completed = True
+        self._write_checkpoint()
+        return self.statistics.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score an exported comment archive offline.")
+    parser.add_argument('input', help="CSV, JSON lines, JSON array or Parquet file of comments")
+    parser.add_argument('output', help="JSON lines or CSV file to write the results to")
+    parser.add_argument('--text-column', default='text', help="Column holding the comment text")
+    parser.add_argument('--id-column', help="Column copied to the output to identify rows")
+    parser.add_argument('--model-dir', default=MODEL_DIR, help="Versioned model directory")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows scored at once")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes scoring each chunk")
+    parser.add_argument('--fields', default='compact',
+                        help="Result fields written to JSON lines output (full, compact, label or a list)")
+    parser.add_argument('--fresh', action='store_true', help="Ignore an existing checkpoint and start over")
+    parser.add_argument('--statistics-output', help="Also write the final statistics to this JSON file")
+    args = parser.parse_args()
+
+    analyzer = BlockchainVotingSentimentAnalyzer(load_pretrained=True, model_path=args.model_dir, cache_size=0)
+    try:
+        job = BulkScoringJob(
+            analyzer, args.input, args.output, args.text_column, args.id_column,
+            args.chunk_size, args.fields, resume=not args.fresh
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+
+    if args.processes > 1:
+        analyzer.enable_parallel_scoring(args.processes, min_parallel_batch=min(args.chunk_size, 2000))
+    try:
+        statistics = job.run()
+    except KeyboardInterrupt:
+        print(f"\nStopped after row {job.rows_done}; run the same command again to resume")
+        sys.exit(130)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        analyzer.disable_parallel_scoring()
+
+    print(f"\nScored {job.rows_done - job.skipped} rows ({job.skipped} without text) into {job.output_path}")
+    print(json.dumps(statistics, indent=2))
+    if args.statistics_output:
+        with open(args.statistics_output, 'w', encoding='utf-8') as f:
+            json.dump(statistics, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
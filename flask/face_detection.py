@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Adaptive face detection and encoding for the Face Matching API
+
+HOG face detection costs time in proportion to the pixels it scans, so
+running it over a 12 MP phone selfie takes seconds. The detector only needs
+the smallest face it must find to be a little larger than its detection
+window, so this module:
+
+    1. downscales the image so the smallest face the tier must find comes
+       out at about DETECTOR_FACE_PX (times the detector's upsampling),
+    2. detects faces on that small copy, optionally retrying with one more
+       upsampling step when nothing is found (small or distant faces),
+    3. maps the boxes back to full resolution, and
+    4. encodes the largest face from a region of interest cropped around it,
+       scaled so the face is at most ENCODING_FACE_PX high. The encoder
+       works on a 150 px aligned chip, so the extra pixels of a larger face
+       only cost time.
+
+Tiers trade latency for the smallest detectable face:
+
+    full       no downscaling: detection with one upsampling step and
+               encoding of the first face found, on the full image, as the
+               API always did (default)
+    fast       faces of at least 20% of the shorter side, no retry
+    balanced   faces of at least 10%, upsampling retry
+    accurate   faces of at least 5%, detector upsampling, retry (only
+               faster than full on large photos)
+
+The downscaling tiers are opt-in (FACE_DETECTION_TIER): they may miss
+faces, and change encodings, that full resolution finds. Measure them on
+images like the ones the deployment receives first; the benchmark reports
+their speedup and how many faces and how close an encoding each one
+agrees with the full tier on:
+
+    python face_detection.py --images samples/ --tiers fast,balanced,accurate
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+# Detection tiers: the smallest face to find (as a fraction of the image's
+# shorter side, None to detect at full resolution), dlib upsampling steps,
+# whether to retry with one more upsampling step when nothing is found, and
+# whether to encode from a crop around the face
+DETECTION_TIERS = {
+    'full': {'min_face_fraction': None, 'upsample': 1, 'retry': False, 'crop': False},
+    'fast': {'min_face_fraction': 0.2, 'upsample': 0, 'retry': False, 'crop': True},
+    'balanced': {'min_face_fraction': 0.1, 'upsample': 0, 'retry': True, 'crop': True},
+    'accurate': {'min_face_fraction': 0.05, 'upsample': 1, 'retry': True, 'crop': True}
+}
+DEFAULT_TIER = 'full'
+
+# Tier the benchmark compares the others against
+REFERENCE_TIER = 'full'
+
+# Landmark model of every encoding, whatever the tier: encodings made with
+# different models are not comparable against the match tolerance
+ENCODING_LANDMARKS = 'small'
+
+# Face height the HOG detector reliably finds without upsampling (its
+# window is 80 px), with some headroom
+DETECTOR_FACE_PX = 100
+
+# Largest face height passed to the encoder
+ENCODING_FACE_PX = 300
+
+# Context kept around a face when cropping it, as a fraction of the face size
+ROI_MARGIN = 0.5
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def detection_scale(shape, tier):
+    """
+    Scale at which to run detection.
+
+    Args:
+        shape (tuple): Image shape
+        tier (dict): Detection tier
+
+    Returns:
+        float: Scale factor, at most 1 (images are never enlarged)
+    """
+    if tier['min_face_fraction'] is None:
+        return 1.0
+    smallest_face = tier['min_face_fraction'] * min(shape[:2])
+    target = DETECTOR_FACE_PX / 2 ** tier['upsample']
+    return min(1.0, target / smallest_face) if smallest_face > 0 else 1.0
+
+
+def resize(image, scale):
+    """Resize an image by a factor, with area interpolation when shrinking."""
+    if scale == 1.0:
+        return image
+    height, width = image.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR)
+
+
+def _scale_box(box, scale, shape):
+    """Map a (top, right, bottom, left) box from a scaled image back to the original, clipped to it."""
+    top, right, bottom, left = (int(round(value / scale)) for value in box)
+    return max(0, top), min(shape[1], right), min(shape[0], bottom), max(0, left)
+
+
+def detect_faces(rgb_image, tier=DEFAULT_TIER):
+    """
+    Detect faces, on a downscaled copy of the image unless the tier is full.
+
+    Args:
+        rgb_image (numpy.ndarray): RGB uint8 image
+        tier (str): Name of a DETECTION_TIERS entry
+
+    Returns:
+        list: Full-resolution (top, right, bottom, left) boxes, largest first
+            (in the detector's order for the full tier)
+    """
+    settings = DETECTION_TIERS[tier]
+    scale = detection_scale(rgb_image.shape, settings)
+    small = resize(rgb_image, scale)
+
+    boxes = face_recognition.face_locations(small, number_of_times_to_upsample=settings['upsample'])
+    if not boxes and settings['retry']:
+        # One more upsampling step finds faces half the size
+        boxes = face_recognition.face_locations(small, number_of_times_to_upsample=settings['upsample'] + 1)
+
+    if settings['min_face_fraction'] is None:
+        return boxes
+    boxes = [_scale_box(box, scale, rgb_image.shape) for box in boxes]
+    return sorted(boxes, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]), reverse=True)
+
+
+def encode_face(rgb_image, box, tier=DEFAULT_TIER):
+    """
+    Encode one face, from a region of interest around it unless the tier is full.
+
+    Args:
+        rgb_image (numpy.ndarray): RGB uint8 image
+        box (tuple): Full-resolution (top, right, bottom, left) face box
+        tier (str): Name of a DETECTION_TIERS entry
+
+    Returns:
+        numpy.ndarray: 128-d face encoding, or None
+    """
+    settings = DETECTION_TIERS[tier]
+    if not settings['crop']:
+        encodings = face_recognition.face_encodings(rgb_image, [box], model=ENCODING_LANDMARKS)
+        return encodings[0] if encodings else None
+
+    top, right, bottom, left = box
+    face_size = max(bottom - top, right - left)
+    margin = int(face_size * ROI_MARGIN)
+    roi_top, roi_left = max(0, top - margin), max(0, left - margin)
+    roi = rgb_image[roi_top:min(rgb_image.shape[0], bottom + margin),
+                    roi_left:min(rgb_image.shape[1], right + margin)]
+
+    scale = min(1.0, ENCODING_FACE_PX / face_size) if face_size > 0 else 1.0
+    roi = np.ascontiguousarray(resize(roi, scale))
+    roi_box = tuple(int(round(value * scale)) for value in
+                    (top - roi_top, right - roi_left, bottom - roi_top, left - roi_left))
+
+    encodings = face_recognition.face_encodings(roi, [roi_box], model=ENCODING_LANDMARKS)
+    return encodings[0] if encodings else None
+
+
+def get_face_encoding(rgb_image, tier=DEFAULT_TIER):
+    """
+    Detect the largest face in an image (the first one for the full tier) and encode it.
+
+    Args:
+        rgb_image (numpy.ndarray): RGB uint8 image
+        tier (str): Name of a DETECTION_TIERS entry
+
+    Returns:
+        numpy.ndarray: 128-d face encoding, or None if no face was found
+    """
+    boxes = detect_faces(rgb_image, tier)
+    if not boxes:
+        return None
+    return encode_face(rgb_image, boxes[0], tier)
+
+
+# -- benchmark -------------------------------------------------------------------
+
+
+DOWNSCALING_TIERS = tuple(tier for tier in DETECTION_TIERS if tier != REFERENCE_TIER)
+
+
+def list_images(paths):
+    """Expand files, directories and glob patterns into image paths."""
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            images.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                 if name.lower().endswith(IMAGE_EXTENSIONS)))
+        else:
+            images.extend(sorted(glob.glob(path)))
+    return images
+
+
+def _timed(function, image, repeat):
+    """Best-of-repeat latency in ms, and the function's result."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(image)
+        best = min(best, (time.perf_counter() - started) * 1000.0)
+    return best, result
+
+
+def benchmark(image_paths, tiers=DOWNSCALING_TIERS, repeat=3):
+    """
+    Compare the tiers with the full tier on sample images.
+
+    Args:
+        image_paths (list): Sample images
+        tiers (tuple): Tiers to measure
+        repeat (int): Runs per image (the fastest counts)
+
+    Returns:
+        dict: Per-image measurements and per-pipeline summaries
+    """
+    images = []
+    for path in image_paths:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"Skipping unreadable image {path}")
+            continue
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        reference_ms, reference = _timed(lambda img: get_face_encoding(img, REFERENCE_TIER), rgb_image, repeat)
+        measurement = {"image": path, "megapixels": round(rgb_image.shape[0] * rgb_image.shape[1] / 1e6, 2),
+                       REFERENCE_TIER: {"ms": reference_ms, "found": reference is not None}}
+        for tier in tiers:
+            ms, encoding = _timed(lambda img: get_face_encoding(img, tier), rgb_image, repeat)
+            distance = (float(np.linalg.norm(encoding - reference))
+                        if encoding is not None and reference is not None else None)
+            measurement[tier] = {"ms": ms, "found": encoding is not None,
+                                 "missed": reference is not None and encoding is None,
+                                 "distance_to_full": distance}
+        images.append(measurement)
+
+    summary = {}
+    for pipeline in (REFERENCE_TIER,) + tuple(tiers):
+        runs = [image[pipeline] for image in images]
+        distances = [run["distance_to_full"] for run in runs if run.get("distance_to_full") is not None]
+        total_ms = sum(run["ms"] for run in runs)
+        summary[pipeline] = {
+            "mean_ms": total_ms / len(runs) if runs else 0.0,
+            "speedup": (sum(image[REFERENCE_TIER]["ms"] for image in images) / total_ms) if total_ms else 0.0,
+            "found": sum(run["found"] for run in runs),
+            "missed": sum(run.get("missed", False) for run in runs),
+            "mean_distance_to_full": float(np.mean(distances)) if distances else None,
+            "max_distance_to_full": float(np.max(distances)) if distances else None
+        }
+    return {"images": images, "summary": summary}
+
+
+def print_report(report):
+    """Print a benchmark report as a table."""
+    print(f"\n{len(report['images'])} images")
+    print(f"{'pipeline':>10} {'mean ms':>10} {'speedup':>8} {'found':>6} {'missed':>7} "
+          f"{'mean distance':>14} {'max distance':>13}")
+    for pipeline, row in report["summary"].items():
+        mean, largest = (f"{row[key]:.4f}" if row[key] is not None else "-"
+                         for key in ("mean_distance_to_full", "max_distance_to_full"))
+        print(f"{pipeline:>10} {row['mean_ms']:10.1f} {row['speedup']:7.1f}x {row['found']:>6} "
+              f"{row['missed']:>7} {mean:>14} {largest:>13}")
+    print("(missed: faces the full tier found and the tier did not; distance: how far the tier's "
+          "encoding is from the full tier's, the API matches faces within 0.4)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adaptive face detection against full resolution.")
+    parser.add_argument('--images', nargs='+', required=True, help="Image files, directories or glob patterns")
+    parser.add_argument('--tiers', default=','.join(DOWNSCALING_TIERS), help="Comma-separated tiers to measure")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per image (the fastest counts)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    tiers = tuple(args.tiers.split(','))
+    unknown = [tier for tier in tiers if tier not in DOWNSCALING_TIERS]
+    if unknown:
+        parser.error(f"unknown tiers: {', '.join(unknown)}")
+    image_paths = list_images(args.images)
+    if not image_paths:
+        parser.error("no images found")
+
+    report = benchmark(image_paths, tiers, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
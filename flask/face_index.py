@@ -0,0 +1,684 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Nearest-neighbour indexes for 1:N face identification
+
+/identify and the duplicate check in /register search every enrolled
+encoding. Two interchangeable indexes serve those searches:
+
+    - brute: FaceEncodingStore.search, an exact scan of every encoding
+    - ivf:   an inverted-file index. k-means splits the encoding space
+             into nlist cells; each voter is listed under its nearest
+             cell, and a search only scans the voters listed under the
+             nprobe cells nearest the probe, re-ranking them by their
+             exact distance
+
+The IVF index keeps only cell assignments (store rows); the encodings stay
+in the store's memory-mapped matrix. Registrations are assigned to their
+cell as they arrive, deleted voters are skipped through the store's live
+mask and dropped when the index is saved, and store compactions are
+followed by remapping the rows. The index is saved next to the store and
+memory-mapped back on startup; anything registered after the last save is
+assigned then. Below IVF_MIN_TRAIN_SIZE voters a scan is cheap, so the
+index is not trained and searches fall back to brute force.
+
+The cells are retrained in the background, with about sqrt(voters) of
+them, whenever the store has grown IVF_RETRAIN_GROWTH times past the size
+they were trained on, so a search keeps scanning about nprobe / sqrt(voters)
+of the store as it grows. Saves merge and write the cell lists without
+holding the lock searches take.
+
+Recall and latency against brute force on synthetic encodings:
+
+    python face_index.py --voters 200000 --nprobe 1,4,16,64
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from face_store import ENCODING_DIM, FaceEncodingStore
+from file_utils import atomic_write_text
+
+INDEX_TYPES = ('brute', 'ivf')
+
+# Voters needed before the IVF index is trained
+IVF_MIN_TRAIN_SIZE = 20000
+
+# Cells scanned per search; more cells trade latency for recall
+IVF_NPROBE = 16
+
+# k-means training: sampled voters per cell and Lloyd iterations
+IVF_TRAIN_POINTS_PER_CELL = 40
+IVF_KMEANS_ITERATIONS = 10
+
+# Index updates (registrations and deletions) between saves
+IVF_SAVE_EVERY = 1000
+
+# Retrain the cells once the live voters reach this multiple of the voters
+# they were trained on (about twice the cells each time)
+IVF_RETRAIN_GROWTH = 4
+
+# Rows assigned to cells at once
+ASSIGN_CHUNK_ROWS = 16384
+
+INDEX_DIRNAME = 'ivf'
+INDEX_FILE = 'index.json'
+
+
+def default_nlist(voters):
+    """Number of IVF cells for a store of this size (about sqrt(voters))."""
+    return int(np.clip(np.sqrt(voters), 16, 65536))
+
+
+def nearest_cells(vectors, centroids, nprobe=1, chunk_rows=ASSIGN_CHUNK_ROWS):
+    """
+    Find the cells nearest each vector.
+
+    Args:
+        vectors (numpy.ndarray): (n, dim) vectors
+        centroids (numpy.ndarray): (nlist, dim) cell centroids
+        nprobe (int): Cells to return per vector
+        chunk_rows (int): Vectors compared at once
+
+    Returns:
+        numpy.ndarray: (n, nprobe) cell numbers, nearest first
+    """
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    cells = np.empty((len(vectors), nprobe), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_rows):
+        chunk = np.asarray(vectors[start:start + chunk_rows], dtype=np.float32)
+        # The vector's own norm does not change the order of the cells
+        scores = centroid_norms - 2.0 * (chunk @ centroids.T)
+        if nprobe < len(centroids):
+            nearest = np.argpartition(scores, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            nearest = np.broadcast_to(np.arange(len(centroids)), scores.shape)
+        order = np.argsort(np.take_along_axis(scores, nearest, axis=1), axis=1)
+        cells[start:start + len(chunk)] = np.take_along_axis(nearest, order, axis=1)
+    return cells
+
+
+def assign_rows(encodings, rows, centroids, chunk_rows=ASSIGN_CHUNK_ROWS):
+    """
+    Nearest cell of each of some rows of an encoding matrix.
+
+    The rows are gathered a chunk at a time, so a large memory-mapped
+    matrix is never copied whole.
+
+    Returns:
+        numpy.ndarray: Cell number per row
+    """
+    cells = [nearest_cells(encodings[rows[start:start + chunk_rows]], centroids)[:, 0]
+             for start in range(0, len(rows), chunk_rows)]
+    return np.concatenate(cells) if cells else np.zeros(0, dtype=np.int64)
+
+
+def _group_by_cell(rows, cells, nlist):
+    """Sort (row, cell) pairs into cell lists: the rows ordered by cell, and each cell's offset."""
+    order = np.argsort(cells, kind='stable')
+    return rows[order], np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=nlist))])
+
+
+def _flatten_lists(rows, offsets, pending):
+    """All (row, cell) pairs of grouped cell lists plus each cell's pending rows."""
+    cells = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    pending_rows = [row for cell_rows in pending for row in cell_rows]
+    pending_cells = [cell for cell, cell_rows in enumerate(pending) for _ in cell_rows]
+    return (np.concatenate([rows, np.array(pending_rows, dtype=np.int64)]),
+            np.concatenate([cells, np.array(pending_cells, dtype=np.int64)]))
+
+
+def kmeans(vectors, nlist, iterations=IVF_KMEANS_ITERATIONS, seed=0):
+    """
+    Cluster vectors with Lloyd's algorithm.
+
+    Args:
+        vectors (numpy.ndarray): (n, dim) float32 training vectors, n >= nlist
+        nlist (int): Number of clusters
+        iterations (int): Lloyd iterations
+        seed (int): Random seed
+
+    Returns:
+        numpy.ndarray: (nlist, dim) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_cells(vectors, centroids)[:, 0]
+        counts = np.bincount(assignment, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters with random training vectors
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+
+class BruteForceIndex:
+    """
+    Exact search by scanning every encoding in the store.
+    """
+
+    name = 'brute'
+
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, user_id):
+        """Index a user just written to the store (nothing to do)."""
+
+    def delete(self, user_id):
+        """Forget a user just deleted from the store (nothing to do)."""
+
+    def save(self):
+        """Persist the index (nothing to do)."""
+
+    def search(self, probe, k=1, max_distance=None, exclude=None):
+        """See FaceEncodingStore.search."""
+        return self.store.search(probe, k=k, max_distance=max_distance, exclude=exclude)
+
+    def stats(self):
+        """Describe the index."""
+        return {"type": self.name, "voters": len(self.store)}
+
+
+class IVFIndex:
+    """
+    Inverted-file index over a FaceEncodingStore.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, store, directory=None, nprobe=IVF_NPROBE, nlist=None, min_train_size=IVF_MIN_TRAIN_SIZE,
+                 save_every=IVF_SAVE_EVERY):
+        """
+        Load the index saved next to the store, or train one if the store is large enough.
+
+        Args:
+            store (FaceEncodingStore): Store being indexed
+            directory (str): Index directory (defaults to <store>/ivf)
+            nprobe (int): Cells scanned per search
+            nlist (int): Cells when training (defaults to default_nlist, and
+                then grows with the store; a fixed nlist is never retrained)
+            min_train_size (int): Voters needed before training
+            save_every (int): Index updates between saves
+        """
+        self.store = store
+        self.directory = directory or os.path.join(store.directory, INDEX_DIRNAME)
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.min_train_size = min_train_size
+        self.save_every = save_every
+        self._lock = threading.RLock()
+        # Serializes saves, which write files without holding _lock
+        self._save_lock = threading.Lock()
+
+        self.centroids = None
+        self._offsets = None
+        self._rows = None
+        self._pending = None
+        self._rows_indexed = 0
+        self._generation = None
+        self._unsaved = 0
+        # Bumped whenever the cell lists are rebuilt, so a save does not
+        # install lists merged from ones that were replaced meanwhile
+        self._lists_version = 0
+        # Live voters the cells were trained on
+        self._trained_voters = 0
+        self._retraining = False
+
+        if os.path.exists(os.path.join(self.directory, INDEX_FILE)):
+            self.load()
+        elif len(store) >= min_train_size:
+            self.train()
+        store.add_compaction_listener(self._remap)
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    # -- building -------------------------------------------------------------
+
+    def _set_lists(self, rows, cells, rows_indexed, generation):
+        """Replace the cell lists with these (row, cell) pairs."""
+        self._rows, self._offsets = _group_by_cell(rows, cells, len(self.centroids))
+        self._pending = [[] for _ in range(len(self.centroids))]
+        self._rows_indexed = rows_indexed
+        self._generation = generation
+        self._lists_version += 1
+
+    def _assign_all(self):
+        """Assign every live voter to its cell with the current centroids."""
+        encodings, alive, generation = self.store.matrix()
+        rows = np.flatnonzero(alive)
+        cells = assign_rows(encodings, rows, self.centroids)
+        self._set_lists(rows, cells, len(encodings), generation)
+
+    def _fit(self, encodings, live, nlist, seed):
+        """k-means centroids for nlist cells, trained on a sample of the live rows."""
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(live), nlist * IVF_TRAIN_POINTS_PER_CELL)
+        # Sorted rows read the memory-mapped matrix sequentially
+        sample = np.sort(rng.choice(live, sample_size, replace=False))
+        centroids = kmeans(np.ascontiguousarray(encodings[sample]), nlist, seed=seed)
+        print(f"Trained IVF index with {nlist} cells on {sample_size} of {len(live)} voters")
+        return centroids
+
+    def _train(self, nlist, seed):
+        """Train the cells and assign everyone (with the lock held); returns whether it did."""
+        encodings, alive, _ = self.store.matrix()
+        live = np.flatnonzero(alive)
+        if not len(live):
+            return False
+        nlist = min(nlist or self.nlist or default_nlist(len(live)), len(live))
+        self.centroids = self._fit(encodings, live, nlist, seed)
+        self._trained_voters = len(live)
+        self._assign_all()
+        return True
+
+    def train(self, nlist=None, seed=0):
+        """
+        Train the cells with k-means on a sample of the voters and assign everyone.
+
+        Args:
+            nlist (int): Number of cells (defaults to the nlist option or default_nlist)
+            seed (int): Random seed
+        """
+        with self._lock:
+            trained = self._train(nlist, seed)
+        if trained:
+            self.save()
+
+    def retrain(self, seed=0):
+        """
+        Retrain the cells for the store's current size without blocking searches.
+
+        The centroids are trained and everyone assigned on a snapshot of the
+        store; the new cells then replace the old ones, unless a compaction
+        renumbered the rows meanwhile.
+
+        Args:
+            seed (int): Random seed
+
+        Returns:
+            bool: Whether the new cells were installed
+        """
+        encodings, alive, generation = self.store.matrix()
+        live = np.flatnonzero(alive)
+        if not len(live):
+            return False
+        centroids = self._fit(encodings, live, min(default_nlist(len(live)), len(live)), seed)
+        cells = assign_rows(encodings, live, centroids)
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self.centroids = centroids
+            self._set_lists(live, cells, len(encodings), generation)
+            self._trained_voters = len(live)
+            # Rows registered while training
+            self._catch_up(*self.store.matrix())
+        self.save()
+        return True
+
+    def _maybe_retrain(self):
+        """Start retraining in the background once the store has outgrown the cells (lock held)."""
+        if (self.nlist is None and not self._retraining
+                and len(self.store) >= self._trained_voters * IVF_RETRAIN_GROWTH):
+            self._retraining = True
+            threading.Thread(target=self._retrain_in_background, name='face-index-retrain', daemon=True).start()
+
+    def _retrain_in_background(self):
+        try:
+            self.retrain()
+        except Exception as e:
+            print(f"Could not retrain the IVF index: {e}")
+        finally:
+            self._retraining = False
+
+    def _catch_up(self, encodings, alive, generation):
+        """Assign rows the store has added since they were last indexed."""
+        if generation != self._generation or len(encodings) <= self._rows_indexed:
+            return
+        rows = self._rows_indexed + np.flatnonzero(alive[self._rows_indexed:])
+        if len(rows):
+            for row, cell in zip(rows.tolist(), nearest_cells(encodings[rows], self.centroids)[:, 0].tolist()):
+                self._pending[cell].append(row)
+        self._rows_indexed = len(encodings)
+
+    def _remap(self, row_mapping):
+        """Follow a store compaction: renumber the indexed rows."""
+        if self._follow_compaction(row_mapping):
+            self.save()
+
+    def _follow_compaction(self, row_mapping):
+        """Renumber the indexed rows; returns whether the index should be saved."""
+        with self._lock:
+            if not self.trained:
+                return False
+            encodings, alive, generation = self.store.matrix()
+            if len(row_mapping) < self._rows_indexed or generation != self._generation + 1:
+                # Missed a compaction; reassign everyone instead
+                self._assign_all()
+                return False
+            previous_indexed = self._rows_indexed
+            rows, cells = _flatten_lists(self._rows, self._offsets, self._pending)
+            rows = row_mapping[rows]
+            kept = rows >= 0
+            self._set_lists(rows[kept], cells[kept], int((row_mapping >= 0).sum()), generation)
+
+            # Rows written before the compaction but not indexed yet
+            unindexed = row_mapping[previous_indexed:]
+            unindexed = unindexed[unindexed >= 0]
+            if len(unindexed):
+                for row, cell in zip(unindexed.tolist(),
+                                     nearest_cells(encodings[unindexed], self.centroids)[:, 0].tolist()):
+                    self._pending[cell].append(row)
+            self._catch_up(encodings, alive, generation)
+            return True
+
+    # -- updates --------------------------------------------------------------
+
+    def _updated(self):
+        """Count an index update; returns whether it is time to save."""
+        self._unsaved += 1
+        return self._unsaved >= self.save_every
+
+    def add(self, user_id):
+        """
+        Index a user just written to the store.
+
+        Args:
+            user_id (str): User id
+        """
+        with self._lock:
+            if not self.trained:
+                save = len(self.store) >= self.min_train_size and self._train(None, 0)
+            else:
+                self._catch_up(*self.store.matrix())
+                save = self._updated()
+                self._maybe_retrain()
+        if save:
+            self.save()
+
+    def delete(self, user_id):
+        """
+        Forget a user just deleted from the store.
+
+        The user's row is already dead in the store's live mask, so searches
+        skip it; it leaves the cell lists at the next save.
+
+        Args:
+            user_id (str): User id
+        """
+        with self._lock:
+            save = self.trained and self._updated()
+        if save:
+            self.save()
+
+    # -- persistence ----------------------------------------------------------
+
+    def save(self):
+        """
+        Write the index next to the store, dropping deleted voters.
+
+        The lock searches take is only held to snapshot the cell lists and
+        to swap in the merged ones; merging and writing happen without it.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self.trained:
+                    return
+                encodings, alive, generation = self.store.matrix()
+                if generation != self._generation:
+                    return
+                self._catch_up(encodings, alive, generation)
+                centroids, rows, offsets = self.centroids, self._rows, self._offsets
+                # Pending lists only grow until the lists are rebuilt
+                pending = [list(cell_rows) for cell_rows in self._pending]
+                rows_indexed, trained_voters, version = self._rows_indexed, self._trained_voters, self._lists_version
+                self._unsaved = 0
+
+            rows, cells = _flatten_lists(rows, offsets, pending)
+            kept = alive[rows]
+            rows, offsets = _group_by_cell(rows[kept], cells[kept], len(centroids))
+
+            os.makedirs(self.directory, exist_ok=True)
+            version_dir = tempfile.mkdtemp(dir=self.directory, prefix='index-')
+            for name, array in (('centroids', centroids), ('offsets', offsets), ('rows', rows)):
+                np.save(os.path.join(version_dir, f'{name}.npy'), array, allow_pickle=False)
+
+            index_path = os.path.join(self.directory, INDEX_FILE)
+            previous = None
+            if os.path.exists(index_path):
+                with open(index_path, encoding='utf-8') as f:
+                    previous = json.load(f)["version_dir"]
+            atomic_write_text(index_path, json.dumps({
+                "version_dir": os.path.basename(version_dir),
+                "generation": generation,
+                "rows_indexed": rows_indexed,
+                "nlist": len(centroids),
+                "voters": len(rows),
+                "trained_voters": trained_voters
+            }))
+            if previous and previous != os.path.basename(version_dir):
+                shutil.rmtree(os.path.join(self.directory, previous), ignore_errors=True)
+
+            with self._lock:
+                if self._lists_version == version:
+                    # Keep what was assigned while merging as pending
+                    self._rows, self._offsets = rows, offsets
+                    self._pending = [cell_rows[len(saved):] for cell_rows, saved in zip(self._pending, pending)]
+
+    def load(self):
+        """Memory-map the saved index and index anything registered since."""
+        with self._lock:
+            with open(os.path.join(self.directory, INDEX_FILE), encoding='utf-8') as f:
+                meta = json.load(f)
+            version_dir = os.path.join(self.directory, meta["version_dir"])
+            self.centroids = np.load(os.path.join(version_dir, 'centroids.npy'))
+            self._trained_voters = meta.get("trained_voters", meta["voters"])
+            if meta["generation"] != self.store.generation:
+                # Saved before a compaction that renumbered the rows
+                self._assign_all()
+                return
+            rows = np.asarray(np.load(os.path.join(version_dir, 'rows.npy'), mmap_mode='r' if meta["voters"] else None))
+            self._offsets = np.load(os.path.join(version_dir, 'offsets.npy'))
+            self._rows = rows
+            self._pending = [[] for _ in range(len(self.centroids))]
+            self._rows_indexed = meta["rows_indexed"]
+            self._generation = meta["generation"]
+            self._lists_version += 1
+            self._catch_up(*self.store.matrix())
+
+    # -- search ---------------------------------------------------------------
+
+    def search(self, probe, k=1, max_distance=None, exclude=None, nprobe=None):
+        """
+        Find the registered users nearest a probe.
+
+        Args:
+            probe (numpy.ndarray): Face encoding to search for
+            k (int): Number of matches to return
+            max_distance (float): Only return matches within this Euclidean distance
+            exclude (str): User id to leave out of the results
+            nprobe (int): Cells to scan (defaults to the index's nprobe)
+
+        Returns:
+            list: (user_id, distance) tuples, nearest first
+        """
+        probe = np.asarray(probe, dtype=np.float32)
+        while True:
+            encodings, alive, generation = self.store.matrix()
+            with self._lock:
+                if not self.trained or generation != self._generation:
+                    # Untrained, or a compaction is being followed
+                    return self.store.search(probe, k=k, max_distance=max_distance, exclude=exclude)
+                self._catch_up(encodings, alive, generation)
+                cells = nearest_cells(probe[None, :], self.centroids, min(nprobe or self.nprobe,
+                                                                          len(self.centroids)))[0]
+                rows = np.concatenate([np.asarray(self._rows[self._offsets[cell]:self._offsets[cell + 1]])
+                                       for cell in cells] +
+                                      [np.array(self._pending[cell], dtype=np.int64) for cell in cells])
+            # Rows registered after this search took its snapshot of the
+            # store may have been indexed by another thread meanwhile
+            rows = rows[rows < len(alive)]
+            rows = rows[alive[rows]]
+            matches = self.store.rank(probe, rows, encodings, generation, k, max_distance, exclude)
+            if matches is not None:
+                return matches
+
+    def stats(self):
+        """Describe the index."""
+        with self._lock:
+            stats = {"type": self.name, "voters": len(self.store), "trained": self.trained}
+            if self.trained:
+                sizes = np.diff(self._offsets) + np.array([len(rows) for rows in self._pending])
+                stats.update(nlist=len(self.centroids), nprobe=self.nprobe,
+                             largest_cell=int(sizes.max()), mean_cell=float(sizes.mean()))
+            return stats
+
+
+def create_index(index_type, store, nprobe=IVF_NPROBE):
+    """
+    Create the search index for a store.
+
+    Args:
+        index_type (str): One of INDEX_TYPES
+        store (FaceEncodingStore): Store to index
+        nprobe (int): IVF cells scanned per search
+
+    Returns:
+        BruteForceIndex or IVFIndex: The index
+
+    Raises:
+        ValueError: On an unknown index type
+    """
+    if index_type == 'brute':
+        return BruteForceIndex(store)
+    if index_type == 'ivf':
+        return IVFIndex(store, nprobe=nprobe)
+    raise ValueError(f"Unknown face index type {index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+
+
+# -- recall vs latency report ----------------------------------------------------
+
+
+def synthetic_encodings(voters, queries, seed=0, spread=0.65, noise=0.03):
+    """
+    Generate enrolled encodings and probes that resemble face encodings.
+
+    Voters are drawn around a few hundred "face types" so the space is
+    clustered like real encodings. Each probe is an enrolled voter plus
+    noise, like a new photo of the same person.
+
+    Returns:
+        tuple: (encodings, probes, probe_voters)
+    """
+    rng = np.random.default_rng(seed)
+    types = rng.normal(0.0, 0.04, (min(500, voters), ENCODING_DIM))
+    encodings = types[rng.integers(0, len(types), voters)] + rng.normal(0.0, spread / np.sqrt(ENCODING_DIM),
+                                                                       (voters, ENCODING_DIM))
+    probe_voters = rng.choice(voters, queries, replace=False)
+    probes = encodings[probe_voters] + rng.normal(0.0, noise, (queries, ENCODING_DIM))
+    return encodings.astype(np.float32), probes.astype(np.float32), probe_voters
+
+
+def _timed_searches(index, probes, k, **options):
+    """Run one search per probe; returns the results and latencies in ms."""
+    results = []
+    latencies = []
+    for probe in probes:
+        started = time.perf_counter()
+        results.append([user_id for user_id, _ in index.search(probe, k=k, **options)])
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    return results, np.array(latencies)
+
+
+def recall_report(voters=200000, queries=200, k=10, nlist=None, nprobes=(1, 4, 16, 64), seed=0):
+    """
+    Measure IVF recall and latency against brute force on synthetic encodings.
+
+    Args:
+        voters (int): Enrolled voters
+        queries (int): Probes searched
+        k (int): Neighbours compared for recall@k
+        nlist (int): IVF cells (defaults to default_nlist)
+        nprobes (tuple): Cells scanned per search, one row per value
+        seed (int): Random seed
+
+    Returns:
+        dict: Build time and, per nprobe, recall@1, recall@k and latency
+    """
+    encodings, probes, _ = synthetic_encodings(voters, queries, seed)
+    directory = tempfile.mkdtemp(prefix='face-index-report-')
+    try:
+        store = FaceEncodingStore.create(os.path.join(directory, 'store'), [f"voter-{i}" for i in range(voters)],
+                                         encodings)
+        started = time.perf_counter()
+        index = IVFIndex(store, nlist=nlist, min_train_size=0)
+        build_seconds = time.perf_counter() - started
+
+        exact, brute_latencies = _timed_searches(BruteForceIndex(store), probes, k)
+        rows = [{"index": "brute", "nprobe": None, "recall_at_1": 1.0, "recall_at_k": 1.0,
+                 "mean_ms": float(brute_latencies.mean()), "p95_ms": float(np.percentile(brute_latencies, 95))}]
+        for nprobe in nprobes:
+            found, latencies = _timed_searches(index, probes, k, nprobe=nprobe)
+            rows.append({
+                "index": "ivf",
+                "nprobe": nprobe,
+                "recall_at_1": float(np.mean([f[:1] == e[:1] for f, e in zip(found, exact)])),
+                "recall_at_k": float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, exact)])),
+                "mean_ms": float(latencies.mean()),
+                "p95_ms": float(np.percentile(latencies, 95))
+            })
+        store.close()
+        return {"voters": voters, "queries": queries, "k": k, "nlist": len(index.centroids),
+                "build_seconds": round(build_seconds, 3), "results": rows}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def print_report(report):
+    """Print a recall report as a table."""
+    print(f"\n{report['voters']:,} voters, {report['queries']} queries, nlist {report['nlist']}, "
+          f"built in {report['build_seconds']} s")
+    print(f"{'index':>6} {'nprobe':>7} {'recall@1':>9} {'recall@' + str(report['k']):>10} {'mean ms':>9} "
+          f"{'p95 ms':>9} {'speedup':>8}")
+    brute_ms = report["results"][0]["mean_ms"]
+    for row in report["results"]:
+        print(f"{row['index']:>6} {row['nprobe'] or '-':>7} {row['recall_at_1']:9.3f} {row['recall_at_k']:10.3f} "
+              f"{row['mean_ms']:9.3f} {row['p95_ms']:9.3f} {brute_ms / row['mean_ms']:7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report IVF recall and latency against brute force.")
+    parser.add_argument('--voters', type=int, default=200000, help="Synthetic voters enrolled")
+    parser.add_argument('--queries', type=int, default=200, help="Probes searched")
+    parser.add_argument('--k', type=int, default=10, help="Neighbours compared for recall@k")
+    parser.add_argument('--nlist', type=int, help="IVF cells (defaults to about sqrt(voters))")
+    parser.add_argument('--nprobe', default='1,4,16,64', help="Comma-separated cells scanned per search")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = recall_report(args.voters, args.queries, args.k, args.nlist,
+                           tuple(int(nprobe) for nprobe in args.nprobe.split(',')))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
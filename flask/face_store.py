@@ -0,0 +1,605 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Persistent face-encoding store for the Face Matching API
+
+Registered face encodings survive restarts and open in milliseconds however
+many voters are enrolled, without replaying or re-encoding anything:
+
+    face_store/
+        snapshot.json           current generation and its voter count
+        ids-<gen>.npy           user ids (UTF-8), sorted
+        encodings-<gen>.f32     float32 encodings; row i belongs to ids[i]
+        log-<gen>.jsonl         registrations and deletions since the snapshot
+
+The snapshot's ids and encodings are memory-mapped, and user ids are found
+by binary search, so opening the store costs the same for ten voters or ten
+million. A registration writes the encoding to the next free row of the
+encodings file and then appends a log record, which is the commit point; a
+deletion only appends a log record. On open, the log is replayed into a
+small in-memory overlay. Once the log grows past a fraction of the snapshot,
+or past COMPACT_MAX_LOG_RECORDS so that replay stays short at any store
+size, a background thread compacts it into a new generation: live voters
+sorted by id, their encodings contiguous, and a fresh log. Rows are never
+rewritten once committed, so the copy runs without the store lock; the lock
+is only held to carry over the records logged meanwhile and switch over.
+
+The store assumes a single writing process.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from file_utils import atomic_write_text
+
+# Default location of the store
+FACE_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'face_store')
+
+# Dimensions of a face_recognition encoding
+ENCODING_DIM = 128
+
+# Longest user id accepted, in UTF-8 bytes
+MAX_USER_ID_BYTES = 128
+
+# Compact once the log holds this many records and at least
+# COMPACT_LOG_RATIO times the number of voters in the snapshot
+COMPACT_MIN_RECORDS = 10000
+COMPACT_LOG_RATIO = 0.25
+
+# Compact whatever the snapshot size once the log holds this many records,
+# which bounds the log replay on open (about 0.65 s per 100k records)
+COMPACT_MAX_LOG_RECORDS = 100000
+
+# Rows copied at once during compaction
+COMPACT_CHUNK_ROWS = 65536
+
+# Rows scored at once by search; bounds its temporary memory at any store size
+SEARCH_CHUNK_ROWS = 65536
+
+# Squared-distance slack when pre-filtering candidates, so rounding in the
+# fast distance formula never drops a match the exact distance would keep
+SEARCH_FILTER_SLACK = 1e-4
+
+SNAPSHOT_FILE = 'snapshot.json'
+
+
+def _user_key(user_id):
+    """Encode a user id as stored in the id array."""
+    if not isinstance(user_id, str) or not user_id:
+        raise ValueError("User id must be a non-empty string")
+    key = user_id.encode('utf-8')
+    if len(key) > MAX_USER_ID_BYTES or b'\0' in key:
+        raise ValueError(f"User id must be at most {MAX_USER_ID_BYTES} bytes and contain no NUL characters")
+    return key
+
+
+class FaceEncodingStore:
+    """
+    Persistent mapping of user ids to face encodings.
+    """
+
+    def __init__(self, directory=FACE_STORE_DIR, dim=ENCODING_DIM, compact_min_records=COMPACT_MIN_RECORDS,
+                 compact_log_ratio=COMPACT_LOG_RATIO, compact_max_records=COMPACT_MAX_LOG_RECORDS):
+        """
+        Open the store, creating it if needed.
+
+        Args:
+            directory (str): Store directory
+            dim (int): Encoding dimensions
+            compact_min_records (int): Log records before compaction is considered
+            compact_log_ratio (float): Log records, relative to the snapshot
+                size, that trigger compaction
+            compact_max_records (int): Log records that trigger compaction
+                whatever the snapshot size
+        """
+        self.directory = directory
+        self.dim = dim
+        self.compact_min_records = compact_min_records
+        self.compact_log_ratio = compact_log_ratio
+        self.compact_max_records = compact_max_records
+        self._lock = threading.RLock()
+        # Held for a whole compaction, so only one runs at a time
+        self._compaction_lock = threading.Lock()
+        self._compaction_listeners = []
+
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(os.path.join(directory, SNAPSHOT_FILE)):
+            self._write_generation(0, np.zeros(0, dtype='S1'), np.zeros((0, dim), dtype=np.float32))
+        self._open()
+
+    @classmethod
+    def create(cls, directory, user_ids, encodings, **options):
+        """
+        Create a store holding many users at once, as a single snapshot.
+
+        Much faster than registering users one by one when importing an
+        existing enrollment.
+
+        Args:
+            directory (str): Store directory; must not hold a store yet
+            user_ids (list): User ids
+            encodings (numpy.ndarray): (len(user_ids), dim) encodings
+            **options: Further FaceEncodingStore arguments
+
+        Returns:
+            FaceEncodingStore: The opened store
+
+        Raises:
+            ValueError: If the directory already holds a store, or on
+                duplicate or invalid user ids
+        """
+        if os.path.exists(os.path.join(directory, SNAPSHOT_FILE)):
+            raise ValueError(f"{directory} already holds a face store")
+        ids = np.array([_user_key(user_id) for user_id in user_ids], dtype=bytes)
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("User ids must be unique")
+        encodings = np.asarray(encodings, dtype=np.float32)
+        store = cls.__new__(cls)
+        store.directory = directory
+        store.dim = options.get('dim', ENCODING_DIM)
+        if encodings.shape != (len(ids), store.dim):
+            raise ValueError(f"Encodings must have shape ({len(ids)}, {store.dim})")
+        os.makedirs(directory, exist_ok=True)
+        order = np.argsort(ids, kind='stable')
+        store._write_generation(0, ids[order], encodings, order)
+        return cls(directory, **options)
+
+    # -- files ----------------------------------------------------------------
+
+    def _path(self, kind, generation):
+        """Path of a generation's file."""
+        extension = {'ids': 'npy', 'encodings': 'f32', 'log': 'jsonl'}[kind]
+        return os.path.join(self.directory, f"{kind}-{generation}.{extension}")
+
+    def _write_generation(self, generation, ids, encodings_source, rows=None):
+        """
+        Write a complete generation (ids, encodings, empty log) and point the snapshot at it.
+
+        Args:
+            generation (int): Generation number
+            ids (numpy.ndarray): Sorted user ids
+            encodings_source (numpy.ndarray): Array the encodings are copied from
+            rows (numpy.ndarray): Rows of encodings_source for each id
+                (defaults to the first len(ids) rows)
+        """
+        self._write_generation_files(generation, ids, encodings_source, rows)
+        with open(self._path('log', generation), 'wb') as f:
+            os.fsync(f.fileno())
+        self._write_snapshot(generation, len(ids))
+
+    def _write_generation_files(self, generation, ids, encodings_source, rows=None):
+        """Write a generation's ids and encodings (see _write_generation)."""
+        with open(self._path('ids', generation), 'wb') as f:
+            np.save(f, ids, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._path('encodings', generation), 'wb') as f:
+            for start in range(0, len(ids), COMPACT_CHUNK_ROWS):
+                chunk = slice(start, start + COMPACT_CHUNK_ROWS)
+                block = encodings_source[rows[chunk]] if rows is not None else encodings_source[chunk]
+                f.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_snapshot(self, generation, count):
+        """Point the snapshot at a generation whose files are all written."""
+        atomic_write_text(os.path.join(self.directory, SNAPSHOT_FILE), json.dumps({
+            "generation": generation,
+            "count": count,
+            "dim": self.dim
+        }))
+
+    def _map_encodings(self, capacity):
+        """Memory-map the first capacity rows of the encodings file (read-only)."""
+        if capacity == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        # A plain ndarray view of the mapping indexes faster than np.memmap
+        return np.asarray(np.memmap(self._encodings_path, dtype=np.float32, mode='r', shape=(capacity, self.dim)))
+
+    def _open(self):
+        """Map the current snapshot and replay its log."""
+        with open(os.path.join(self.directory, SNAPSHOT_FILE), encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot["dim"] != self.dim:
+            raise ValueError(f"Store holds {snapshot['dim']}-d encodings, not {self.dim}-d")
+        self.generation = snapshot["generation"]
+        self._count = snapshot["count"]
+
+        self._ids = np.asarray(np.load(self._path('ids', self.generation), mmap_mode='r' if self._count else None))
+        self._encodings_path = self._path('encodings', self.generation)
+        self._encodings_fd = os.open(self._encodings_path, os.O_RDWR)
+        self._capacity = os.fstat(self._encodings_fd).st_size // (4 * self.dim)
+        self._encodings = self._map_encodings(self._capacity)
+
+        # Changes since the snapshot: user id -> row (-1 once deleted), and
+        # the user id of every row appended after the snapshot's rows
+        self._overlay = {}
+        self._appended = {}
+        self._next_row = self._count
+        self._alive = np.ones(self._capacity, dtype=bool)
+        self._alive[self._count:] = False
+        self._live = self._count
+        self._log_records = 0
+
+        log_path = self._path('log', self.generation)
+        with open(log_path, 'rb') as f:
+            valid_bytes = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A record torn by a crash; it was never committed
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self._apply(record)
+                valid_bytes += len(line)
+        self._log = open(log_path, 'ab')
+        if self._log.tell() != valid_bytes:
+            self._log.truncate(valid_bytes)
+            self._log.seek(valid_bytes)
+
+    def _apply(self, record):
+        """Apply one log record to the in-memory state."""
+        user_id = record["id"]
+        old_row = self._row(user_id)
+        if old_row >= 0:
+            self._alive[old_row] = False
+            self._live -= 1
+        if record["op"] == "put":
+            row = record["row"]
+            self._overlay[user_id] = row
+            self._appended[row] = user_id
+            self._alive[row] = True
+            self._live += 1
+            self._next_row = max(self._next_row, row + 1)
+        else:
+            self._overlay[user_id] = -1
+        self._log_records += 1
+
+    def _append_log(self, record):
+        """Append a record to the log and make it durable."""
+        self._log.write(json.dumps(record).encode('utf-8') + b'\n')
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def _ensure_capacity(self, rows):
+        """Grow the encodings file (and its mapping) to hold at least this many rows."""
+        if rows <= self._capacity:
+            return
+        capacity = max(1024, self._capacity * 2, rows)
+        os.ftruncate(self._encodings_fd, capacity * 4 * self.dim)
+        # Readers still holding the previous mapping keep a valid view of the
+        # rows it covered
+        self._encodings = self._map_encodings(capacity)
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - self._capacity, dtype=bool)])
+        self._capacity = capacity
+
+    # -- lookups --------------------------------------------------------------
+
+    def _row(self, user_id):
+        """Row holding a user's encoding, or -1."""
+        if user_id in self._overlay:
+            return self._overlay[user_id]
+        if not self._count:
+            return -1
+        try:
+            key = _user_key(user_id)
+        except ValueError:
+            return -1
+        position = int(np.searchsorted(self._ids, key))
+        if position < self._count and self._ids[position] == key:
+            return position
+        return -1
+
+    def get(self, user_id):
+        """
+        Read a user's encoding.
+
+        Args:
+            user_id (str): User id
+
+        Returns:
+            numpy.ndarray: The encoding, or None if the user is not registered
+        """
+        with self._lock:
+            row = self._row(user_id)
+            return np.array(self._encodings[row]) if row >= 0 else None
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return self._row(user_id) >= 0
+
+    def __len__(self):
+        return self._live
+
+    def user_id_at(self, row):
+        """
+        User id whose encoding is stored at a row.
+
+        Args:
+            row (int): Row of the encodings matrix
+
+        Returns:
+            str: The user id, or None if the row is not live
+        """
+        with self._lock:
+            if not self._alive[row]:
+                return None
+            if row < self._count:
+                return self._ids[row].decode('utf-8')
+            return self._appended[row]
+
+    def user_ids(self):
+        """
+        List every registered user id.
+
+        Returns:
+            list: User ids, snapshot voters in id order followed by later registrations
+        """
+        with self._lock:
+            ids = [key.decode('utf-8') for key in self._ids[self._alive[:self._count]].tolist()]
+            ids.extend(self._appended[row] for row in sorted(self._appended) if self._alive[row])
+            return ids
+
+    def matrix(self):
+        """
+        Expose the encodings for vectorized search.
+
+        Returns:
+            tuple: (encodings, alive, generation) where encodings is a
+                read-only (rows, dim) float32 array, alive marks the rows
+                holding a registered user's current encoding and generation
+                identifies the row numbering (see rank)
+        """
+        with self._lock:
+            rows = self._next_row
+            return self._encodings[:rows], self._alive[:rows].copy(), self.generation
+
+    def rank(self, probe, rows, encodings, generation, k=1, max_distance=None, exclude=None):
+        """
+        Rank candidate rows by their exact distance to a probe.
+
+        Args:
+            probe (numpy.ndarray): Face encoding searched for
+            rows (numpy.ndarray): Candidate rows
+            encodings (numpy.ndarray): Encodings from matrix()
+            generation (int): Generation from matrix()
+            k (int): Number of matches to return
+            max_distance (float): Only return matches within this Euclidean distance
+            exclude (str): User id to leave out of the results
+
+        Returns:
+            list: (user_id, distance) tuples, nearest first, or None if the
+                store was compacted since matrix() and the rows are stale
+        """
+        exact = np.linalg.norm(encodings[rows] - probe, axis=1)
+        # Rows are live when matrix() was called, so only the excluded user
+        # (or a concurrent deletion) can take the place of a match
+        limit = k + (exclude is not None)
+        if len(rows) > limit:
+            nearest = np.argpartition(exact, limit - 1)[:limit]
+            rows, exact = rows[nearest], exact[nearest]
+        order = np.argsort(exact, kind='stable')
+        with self._lock:
+            if generation != self.generation:
+                return None
+            matches = []
+            for row, distance in zip(rows[order].tolist(), exact[order].tolist()):
+                if max_distance is not None and distance > max_distance:
+                    break
+                if not self._alive[row]:
+                    continue
+                user_id = self._ids[row].decode('utf-8') if row < self._count else self._appended[row]
+                if user_id == exclude:
+                    continue
+                matches.append((user_id, distance))
+                if len(matches) == k:
+                    break
+            return matches
+
+    def search(self, probe, k=1, max_distance=None, exclude=None, chunk_rows=SEARCH_CHUNK_ROWS):
+        """
+        Find the registered users whose encodings are nearest a probe.
+
+        Distances from the probe to every row are computed chunk by chunk as
+        ||x||^2 - 2 x.p + ||p||^2, two matrix-vector passes per chunk, and only
+        each chunk's k best candidates are kept. The distances returned are
+        recomputed exactly, as face_recognition.face_distance would.
+
+        Args:
+            probe (numpy.ndarray): Face encoding to search for
+            k (int): Number of matches to return
+            max_distance (float): Only return matches within this Euclidean distance
+            exclude (str): User id to leave out of the results
+            chunk_rows (int): Rows scored at once
+
+        Returns:
+            list: (user_id, distance) tuples, nearest first
+        """
+        probe = np.asarray(probe, dtype=np.float32)
+        probe_norm = float(probe @ probe)
+        # One more candidate per chunk in case the excluded user is among them
+        keep = k + (exclude is not None)
+
+        matches = None
+        while matches is None:
+            encodings, alive, generation = self.matrix()
+            candidate_rows = []
+            candidate_distances = []
+            for start in range(0, len(encodings), chunk_rows):
+                chunk = encodings[start:start + chunk_rows]
+                squared = np.einsum('ij,ij->i', chunk, chunk) - 2.0 * (chunk @ probe) + probe_norm
+                candidates = alive[start:start + len(chunk)]
+                if max_distance is not None:
+                    candidates &= squared <= max_distance * max_distance + SEARCH_FILTER_SLACK
+                rows = np.flatnonzero(candidates)
+                if len(rows) > keep:
+                    rows = rows[np.argpartition(squared[rows], keep - 1)[:keep]]
+                candidate_rows.append(rows + start)
+                candidate_distances.append(squared[rows])
+            if not candidate_rows:
+                return []
+
+            rows = np.concatenate(candidate_rows)
+            rows = rows[np.argsort(np.concatenate(candidate_distances), kind='stable')[:keep]]
+            matches = self.rank(probe, rows, encodings, generation, k, max_distance, exclude)
+        return matches
+
+    # -- updates --------------------------------------------------------------
+
+    def put(self, user_id, encoding):
+        """
+        Register (or replace) a user's encoding.
+
+        Args:
+            user_id (str): User id
+            encoding (numpy.ndarray): Face encoding
+
+        Raises:
+            ValueError: On an invalid user id or encoding shape
+        """
+        _user_key(user_id)
+        encoding = np.asarray(encoding, dtype=np.float32)
+        if encoding.shape != (self.dim,):
+            raise ValueError(f"Encoding must have shape ({self.dim},)")
+
+        with self._lock:
+            row = self._next_row
+            self._ensure_capacity(row + 1)
+            # The encoding is written (and synced) before the log record that
+            # commits it; the read-only mapping sees it through the page cache
+            os.pwrite(self._encodings_fd, encoding.tobytes(), row * 4 * self.dim)
+            os.fsync(self._encodings_fd)
+            record = {"op": "put", "id": user_id, "row": row}
+            self._append_log(record)
+            self._apply(record)
+        self._maybe_compact()
+
+    def delete(self, user_id):
+        """
+        Remove a user.
+
+        Args:
+            user_id (str): User id
+
+        Returns:
+            bool: Whether the user was registered
+        """
+        with self._lock:
+            if self._row(user_id) < 0:
+                return False
+            record = {"op": "delete", "id": user_id}
+            self._append_log(record)
+            self._apply(record)
+        self._maybe_compact()
+        return True
+
+    def _maybe_compact(self):
+        """Start a background compaction once the log is long, relative to the snapshot or outright."""
+        if self._log_records < self.compact_min_records or self._compaction_lock.locked():
+            return
+        if (self._log_records >= self.compact_log_ratio * self._count
+                or self._log_records >= self.compact_max_records):
+            threading.Thread(target=self._compact_in_background, name='face-store-compaction',
+                             daemon=True).start()
+
+    def _compact_in_background(self):
+        """Compact unless another compaction is already running."""
+        if not self._compaction_lock.acquire(blocking=False):
+            return
+        try:
+            self._compact()
+        except Exception as e:
+            # The store keeps working on the current generation
+            print(f"Face store compaction failed: {e}")
+        finally:
+            self._compaction_lock.release()
+
+    def add_compaction_listener(self, callback):
+        """
+        Call a function after every compaction.
+
+        Compaction renumbers the rows; the callback receives an array mapping
+        each previous row to its new row (-1 for rows that were dropped).
+
+        Args:
+            callback (callable): Function taking the row mapping
+        """
+        self._compaction_listeners.append(callback)
+
+    def compact(self):
+        """
+        Write live users into a new generation and start a fresh log.
+
+        Waits for a compaction already running in the background.
+        """
+        with self._compaction_lock:
+            self._compact()
+
+    def _compact(self):
+        """Compact; the compaction lock must be held, the store lock is taken only briefly."""
+        # Capture the live users
+        with self._lock:
+            generation = self.generation + 1
+            source = self._encodings
+            snapshot_ids = self._ids
+            snapshot_rows = np.flatnonzero(self._alive[:self._count])
+            appended_rows = [row for row in sorted(self._appended) if self._alive[row]]
+            appended_ids = np.array([self._appended[row].encode('utf-8') for row in appended_rows], dtype=bytes)
+            log_offset = self._log.tell()
+
+        # Copy them without the lock: committed rows are never rewritten, so
+        # updates made meanwhile only add rows and log records
+        # (concatenation widens the id dtype to the longest id)
+        ids = np.concatenate([snapshot_ids[snapshot_rows], appended_ids])
+        rows = np.concatenate([snapshot_rows, np.array(appended_rows, dtype=np.int64)])
+        order = np.argsort(ids, kind='stable')
+        rows = rows[order]
+        self._write_generation_files(generation, ids[order], source, rows)
+
+        with self._lock:
+            # Carry the records logged during the copy over to the new log,
+            # moving registered encodings to rows after the snapshot's
+            with open(self._path('log', self.generation), 'rb') as f:
+                f.seek(log_offset)
+                records = [json.loads(line) for line in f]
+            row_mapping = np.full(self._next_row, -1, dtype=np.int64)
+            row_mapping[rows] = np.arange(len(rows))
+            next_row = len(rows)
+            with open(self._path('encodings', generation), 'ab') as encodings_file, \
+                    open(self._path('log', generation), 'wb') as log_file:
+                for record in records:
+                    if record["op"] == "put":
+                        encodings_file.write(np.ascontiguousarray(self._encodings[record["row"]]).tobytes())
+                        row_mapping[record["row"]] = next_row
+                        record = dict(record, row=next_row)
+                        next_row += 1
+                    log_file.write(json.dumps(record).encode('utf-8') + b'\n')
+                for f in (encodings_file, log_file):
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._write_snapshot(generation, len(rows))
+
+            old_generation = self.generation
+            self._log.close()
+            os.close(self._encodings_fd)
+            self._open()
+            for kind in ('ids', 'encodings', 'log'):
+                os.remove(self._path(kind, old_generation))
+
+        # Listeners are called without the store lock, so they may take their
+        # own locks and call back into the store
+        for callback in self._compaction_listeners:
+            callback(row_mapping)
+
+    def close(self):
+        """Close the store's files, after any running compaction."""
+        with self._compaction_lock, self._lock:
+            self._log.close()
+            os.close(self._encodings_fd)
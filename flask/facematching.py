@@ -2,57 +2,88 @@ import os
 import numpy as np
 import cv2
 import face_recognition
-from flask import Flask, request, jsonify
-from werkzeug.utils import secure_filename
-import base64
+from flask import Flask, Request, request, jsonify
+import binascii
 import io
-from PIL import Image
 
-app = Flask(__name__)
+import face_detection
+from face_index import IVF_NPROBE, create_index
+from face_store import FaceEncodingStore
 
 # Configuration
-UPLOAD_FOLDER = 'temp_uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 SIMILARITY_THRESHOLD = 0.6  # Adjust as needed for sensitivity
+IDENTIFY_TOP_K = 5  # Default number of matches returned by /identify
+MAX_IDENTIFY_TOP_K = 100
+DUPLICATE_TOP_K = 3  # Matching users reported when a registration is a duplicate
+FACE_STORE_DIR = os.environ.get('FACE_STORE_DIR', 'face_store')  # Persistent encoding store
+FACE_INDEX = os.environ.get('FACE_INDEX', 'ivf')  # 'ivf' (approximate) or 'brute' (exact scan)
+FACE_INDEX_NPROBE = int(os.environ.get('FACE_INDEX_NPROBE', IVF_NPROBE))  # IVF cells scanned per search
+FACE_DETECTION_TIER = os.environ.get('FACE_DETECTION_TIER', face_detection.DEFAULT_TIER)  # full, fast, balanced or accurate
+MAX_UPLOAD_BYTES = int(os.environ.get('FACE_MAX_UPLOAD_BYTES', 16 * 1024 * 1024))  # Largest request accepted
+
+if FACE_DETECTION_TIER not in face_detection.DETECTION_TIERS:
+    raise ValueError(f"Unknown FACE_DETECTION_TIER {FACE_DETECTION_TIER!r}; "
+                     f"expected one of {', '.join(face_detection.DETECTION_TIERS)}")
 
-# Create upload folder if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+class InMemoryRequest(Request):
+    """Request that keeps uploaded files in memory instead of spooling them to disk
+    
+    Safe because MAX_CONTENT_LENGTH bounds the size of every request.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+app = Flask(__name__)
+app.request_class = InMemoryRequest
+# Oversized requests are refused from their Content-Length, before the body is read
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+app.config['MAX_FORM_MEMORY_SIZE'] = MAX_UPLOAD_BYTES
 
-# Dictionary to store registered face encodings
-registered_faces = {}
+# Persistent store of registered face encodings (memory-mapped, survives restarts)
+registered_faces = FaceEncodingStore(FACE_STORE_DIR)
+
+# Nearest-neighbour index used by /identify and the duplicate check
+face_index = create_index(FACE_INDEX, registered_faces, nprobe=FACE_INDEX_NPROBE)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_face_encoding(image_data):
-    """Extract face encoding from image data"""
-    # Convert to RGB (face_recognition requires RGB)
-    rgb_image = cv2.cvtColor(image_data, cv2.COLOR_BGR2RGB)
-    
-    # Find face locations
-    face_locations = face_recognition.face_locations(rgb_image)
+def get_face_encoding(rgb_image):
+    """Extract face encoding from an RGB uint8 image
     
-    if not face_locations:
-        return None
-    
-    # Get face encodings (using first face found if multiple exist)
-    face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+    The largest face is detected and encoded at full resolution, or on a
+    downscaled copy and a crop when FACE_DETECTION_TIER picks a faster tier
+    (see face_detection.py).
+    """
+    return face_detection.get_face_encoding(rgb_image, FACE_DETECTION_TIER)
+
+def decode_image_bytes(image_data):
+    """Decode encoded image bytes (PNG/JPEG) to an RGB uint8 array, in memory
     
-    if face_encodings:
-        return face_encodings[0]
-    else:
-        return None
+    Grayscale, palette, alpha and 16-bit images are all normalized to 8-bit
+    RGB, and EXIF orientation is applied.
+    """
+    if len(image_data) == 0:
+        raise ValueError('Empty image')
+    buffer = np.frombuffer(image_data, dtype=np.uint8)
+    try:
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    except cv2.error:
+        image = None
+    if image is None:
+        raise ValueError('Unsupported or corrupt image')
+    # OpenCV decodes to BGR; face_recognition requires RGB
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
 
 def decode_image(base64_string):
-    """Decode base64 image to numpy array"""
-    # Remove header if present
-    if 'base64,' in base64_string:
-        base64_string = base64_string.split('base64,')[1]
+    """Decode base64 image to an RGB uint8 array"""
+    # Skip the data URL header if present (a2b_base64 takes ASCII str directly)
+    header = base64_string.find('base64,')
+    start = header + len('base64,') if header >= 0 else 0
     
     # Decode base64 to image
-    image_data = base64.b64decode(base64_string)
-    image = Image.open(io.BytesIO(image_data))
-    return np.array(image)
+    return decode_image_bytes(binascii.a2b_base64(base64_string[start:]))
 
 def compare_faces(known_encoding, unknown_encoding):
     """Compare face encodings and return similarity score"""
@@ -66,50 +97,84 @@ def compare_faces(known_encoding, unknown_encoding):
     similarity = 1.0 - face_distance
     return similarity
 
-@app.route('/register', methods=['POST'])
-def register_face():
-    """Register a face with a user ID"""
-    if 'user_id' not in request.form:
-        return jsonify({'error': 'Missing user_id parameter'}), 400
-    
-    user_id = request.form['user_id']
+def get_request_encoding():
+    """Extract the face encoding from the image sent with the request
     
+    Returns (face_encoding, error_response); face_encoding is None when no
+    face was detected.
+    """
     # Check if image was sent as file or base64
     if 'image' in request.files:
         # Process uploaded file
         file = request.files['image']
         if file.filename == '':
-            return jsonify({'error': 'No selected file'}), 400
+            return None, (jsonify({'error': 'No selected file'}), 400)
         
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
-            
-            # Load and process image
-            image = cv2.imread(filepath)
-            face_encoding = get_face_encoding(image)
-            
-            # Remove temporary file
-            os.remove(filepath)
+        if not allowed_file(file.filename):
+            return None, (jsonify({'error': 'File type not allowed'}), 400)
+        
+        # Decode straight from the in-memory upload
+        stream = file.stream
+        image_data = stream.getbuffer() if isinstance(stream, io.BytesIO) else stream.read()
+        try:
+            image = decode_image_bytes(image_data)
+        except ValueError as e:
+            return None, (jsonify({'error': f'Error processing uploaded image: {str(e)}'}), 400)
+        return get_face_encoding(image), None
     
     elif 'image_base64' in request.form:
         # Process base64 image
         try:
             image = decode_image(request.form['image_base64'])
-            face_encoding = get_face_encoding(image)
+            return get_face_encoding(image), None
         except Exception as e:
-            return jsonify({'error': f'Error processing base64 image: {str(e)}'}), 400
+            return None, (jsonify({'error': f'Error processing base64 image: {str(e)}'}), 400)
     
-    else:
-        return jsonify({'error': 'No image provided'}), 400
+    return None, (jsonify({'error': 'No image provided'}), 400)
+
+def find_matches(face_encoding, k, exclude=None):
+    """Find the registered users whose faces match an encoding, best first"""
+    matches = face_index.search(face_encoding, k=k, max_distance=1.0 - SIMILARITY_THRESHOLD,
+                                exclude=exclude)
+    return [{'user_id': user_id, 'similarity': 1.0 - distance} for user_id, distance in matches]
+
+@app.errorhandler(413)
+def payload_too_large(error):
+    """Reject requests larger than MAX_UPLOAD_BYTES"""
+    return jsonify({'error': f'Request exceeds the {MAX_UPLOAD_BYTES} byte limit'}), 413
+
+@app.route('/register', methods=['POST'])
+def register_face():
+    """Register a face with a user ID"""
+    if 'user_id' not in request.form:
+        return jsonify({'error': 'Missing user_id parameter'}), 400
+    
+    user_id = request.form['user_id']
+    
+    face_encoding, error = get_request_encoding()
+    if error:
+        return error
     
     # Check if face was detected
     if face_encoding is None:
         return jsonify({'error': 'No face detected in the image'}), 400
     
+    # Refuse a face already enrolled under another user id
+    duplicates = find_matches(face_encoding, DUPLICATE_TOP_K, exclude=user_id)
+    if duplicates:
+        return jsonify({
+            'success': False,
+            'error': 'Face already registered for another user',
+            'duplicates': duplicates,
+            'threshold': SIMILARITY_THRESHOLD
+        }), 409
+    
     # Store face encoding
-    registered_faces[user_id] = face_encoding
+    try:
+        registered_faces.put(user_id, face_encoding)
+        face_index.add(user_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'success': True,
@@ -125,42 +190,14 @@ def verify_face():
     
     user_id = request.form['user_id']
     
-    # Check if user is registered
-    if user_id not in registered_faces:
-        return jsonify({'error': 'User not registered'}), 404
-    
     # Get the registered face encoding
-    registered_encoding = registered_faces[user_id]
-    
-    # Check if image was sent as file or base64
-    if 'image' in request.files:
-        # Process uploaded file
-        file = request.files['image']
-        if file.filename == '':
-            return jsonify({'error': 'No selected file'}), 400
-        
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
-            
-            # Load and process image
-            image = cv2.imread(filepath)
-            face_encoding = get_face_encoding(image)
-            
-            # Remove temporary file
-            os.remove(filepath)
+    registered_encoding = registered_faces.get(user_id)
+    if registered_encoding is None:
+        return jsonify({'error': 'User not registered'}), 404
     
-    elif 'image_base64' in request.form:
-        # Process base64 image
-        try:
-            image = decode_image(request.form['image_base64'])
-            face_encoding = get_face_encoding(image)
-        except Exception as e:
-            return jsonify({'error': f'Error processing base64 image: {str(e)}'}), 400
-    
-    else:
-        return jsonify({'error': 'No image provided'}), 400
+    face_encoding, error = get_request_encoding()
+    if error:
+        return error
     
     # Check if face was detected
     if face_encoding is None:
@@ -181,20 +218,50 @@ def verify_face():
         'threshold': SIMILARITY_THRESHOLD
     })
 
+@app.route('/identify', methods=['POST'])
+def identify_face():
+    """Identify which registered users a face matches"""
+    try:
+        top_k = int(request.form.get('top_k', IDENTIFY_TOP_K))
+    except ValueError:
+        return jsonify({'error': 'top_k must be an integer'}), 400
+    if not 1 <= top_k <= MAX_IDENTIFY_TOP_K:
+        return jsonify({'error': f'top_k must be between 1 and {MAX_IDENTIFY_TOP_K}'}), 400
+    
+    face_encoding, error = get_request_encoding()
+    if error:
+        return error
+    
+    # Check if face was detected
+    if face_encoding is None:
+        return jsonify({
+            'success': False,
+            'message': 'No face detected in the image'
+        }), 400
+    
+    matches = find_matches(face_encoding, top_k)
+    
+    return jsonify({
+        'success': True,
+        'match': bool(matches),
+        'matches': matches,
+        'threshold': SIMILARITY_THRESHOLD
+    })
+
 @app.route('/users', methods=['GET'])
 def list_users():
     """List all registered users"""
     return jsonify({
         'success': True,
-        'users': list(registered_faces.keys()),
+        'users': registered_faces.user_ids(),
         'count': len(registered_faces)
     })
 
 @app.route('/delete_user/<user_id>', methods=['DELETE'])
 def delete_user(user_id):
     """Delete a registered user"""
-    if user_id in registered_faces:
-        del registered_faces[user_id]
+    if registered_faces.delete(user_id):
+        face_index.delete(user_id)
         return jsonify({
             'success': True,
             'message': f'User {user_id} deleted successfully'
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+File helpers shared by the sentiment and face services
+
+Pointers, manifests, snapshots and checkpoints are small text files that
+readers must never see half written; they are replaced atomically.
+"""
+
+import os
+import tempfile
+
+
+def atomic_write_text(path, text):
+    """
+    Write a small text file through a temporary file and an atomic rename.
+
+    Readers see either the previous contents or the new ones, never a
+    partial write, and the new contents are on disk before the rename.
+
+    Args:
+        path (str): File to replace
+        text (str): New contents
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+gunicorn configuration for the Sentiment Analysis API
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+# Address the API listens on
+bind = os.environ.get('SENTIMENT_BIND', '0.0.0.0:5000')
+
+# Worker processes (scoring is CPU-bound, so one per core by default) and
+# request threads per worker; concurrent requests within a worker are
+# micro-batched together (see SENTIMENT_MICROBATCH_*)
+workers = int(os.environ.get('SENTIMENT_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('SENTIMENT_THREADS', '4'))
+worker_class = 'gthread'
+
+# Load the analyzer once in the master and fork the workers from it, so the
+# model is shared copy-on-write (see wsgi.py)
+preload_app = True
+
+# Seconds a worker may spend on one request before it is restarted
+timeout = int(os.environ.get('SENTIMENT_WORKER_TIMEOUT', '60'))
+graceful_timeout = 30
+
+accesslog = os.environ.get('SENTIMENT_ACCESS_LOG')
+errorlog = '-'
+
+# Directory where the workers share their metrics and statistics, so
+# /metrics and /statistics cover all of them (see worker_state.py); set
+# before the app is preloaded, one per master process
+os.environ.setdefault(
+    'SENTIMENT_SHARED_STATE_DIR',
+    os.path.join(tempfile.gettempdir(), f'sentiment-workers-{os.getpid()}')
+)
+
+
+def on_starting(server):
+    """Start from an empty shared state directory."""
+    from worker_state import reset_state_directory
+    reset_state_directory(os.environ['SENTIMENT_SHARED_STATE_DIR'])
+
+
+def post_fork(server, worker):
+    """Restart the per-process threads and pools in each new worker."""
+    import sentiment
+    sentiment.init_worker_process()
+
+
+def worker_exit(server, worker):
+    """Publish the worker's final metrics and statistics."""
+    import sentiment
+    sentiment.shutdown_worker_process()
+
+
+def child_exit(server, worker):
+    """Fold an exited worker's last state into the shared totals (runs in the master)."""
+    from worker_state import retire_worker
+    retire_worker(os.environ['SENTIMENT_SHARED_STATE_DIR'], worker.pid)
@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Serving-optimized inference engine for the Sentiment Analysis Model
+
+CompiledSentimentEngine is built once from the fitted TF-IDF + random forest
+pipeline and reproduces ``pipeline.predict_proba`` bit for bit without going
+through scikit-learn at request time:
+
+    - the vocabulary is kept as a sorted term array (looked up by binary
+      search) with matching column ids, and the IDF weights as one flat
+      float64 array
+    - every tree of the forest is flattened into contiguous node arrays
+      (feature, threshold, children, leaf probabilities), so all trees are
+      traversed together with vectorized NumPy operations
+    - probabilities and classes come out of a single traversal
+
+The arithmetic mirrors scikit-learn step for step (sublinear TF, IDF
+weighting, sequential L2 row norms, float32 feature comparisons, tree-by-tree
+probability accumulation). The analyzer still checks the engine against the
+pipeline before using it and falls back to scikit-learn on any mismatch.
+
+The engine is made of plain NumPy arrays and a few scalars, so it can be
+saved as .npy files (the compact serving format, see save and load) and
+memory-mapped: worker processes then share one copy of the model pages
+instead of each unpickling a vocabulary dict and a hundred tree objects.
+"""
+
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+# Rows traversed together; bounds the (rows, trees, classes) working set
+PREDICT_CHUNK_SIZE = 2048
+
+# Arrays of the compact serving format, one .npy file each
+ENGINE_ARRAYS = ('terms', 'columns', 'idf', 'classes', 'tree_roots', 'feature', 'threshold',
+                 'children_left', 'children_right', 'leaf_proba', 'used_features')
+
+# Scalar parameters of the compact serving format
+ENGINE_PARAMETERS_FILE = 'engine.json'
+
+
+class CompiledSentimentEngine:
+    """
+    Flat-array version of a fitted TfidfVectorizer + RandomForestClassifier.
+    """
+
+    def __init__(self, terms, columns, idf, n_features, ngram_range, token_pattern, lowercase,
+                 sublinear_tf, norm, classes, tree_roots, feature, threshold, children_left,
+                 children_right, leaf_proba, used_features, max_depth):
+        self.terms = terms
+        self.columns = columns
+        self.idf = idf
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.token_pattern = token_pattern
+        self.lowercase = lowercase
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self.classes_ = classes
+        self.tree_roots = tree_roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.leaf_proba = leaf_proba
+        self.used_features = used_features
+        self.max_depth = max_depth
+
+        self._tokenize = re.compile(token_pattern).findall
+
+        # Vocabulary column -> position in the dense block of features the
+        # forest actually splits on (-1 for unused columns)
+        self._used_position = np.full(n_features, -1, dtype=np.int64)
+        self._used_position[used_features] = np.arange(len(used_features))
+
+        # Longest vocabulary term in characters (the width of the unicode
+        # term array); longer n-grams cannot be in the vocabulary
+        self._max_term_length = terms.dtype.itemsize // np.dtype('U1').itemsize
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Compile a fitted pipeline.
+
+        Args:
+            pipeline (Pipeline): Fitted TfidfVectorizer + RandomForestClassifier pipeline
+
+        Returns:
+            CompiledSentimentEngine: The compiled engine
+
+        Raises:
+            ValueError: If the pipeline uses options the engine does not reproduce
+        """
+        import sklearn
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        if len(pipeline.steps) != 2:
+            raise ValueError("Expected a vectorizer + classifier pipeline")
+        vectorizer, forest = pipeline[0], pipeline[-1]
+        if not isinstance(vectorizer, TfidfVectorizer) or not isinstance(forest, RandomForestClassifier):
+            raise ValueError("Only TfidfVectorizer + RandomForestClassifier pipelines can be compiled")
+        if (vectorizer.analyzer != 'word' or vectorizer.tokenizer is not None
+                or vectorizer.preprocessor is not None or vectorizer.stop_words is not None
+                or vectorizer.strip_accents is not None or vectorizer.binary
+                or vectorizer.input != 'content' or vectorizer.norm not in ('l2', None)
+                or vectorizer.dtype is not np.float64):
+            raise ValueError("Unsupported TfidfVectorizer options")
+        if forest.n_outputs_ != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        # Vocabulary as parallel arrays sorted by term, plus the IDF weights
+        vocabulary = vectorizer.vocabulary_
+        terms = np.sort(np.array(list(vocabulary), dtype=str))
+        columns = np.array([vocabulary[term] for term in terms.tolist()], dtype=np.int32)
+        idf = np.array(vectorizer.idf_, dtype=np.float64) if vectorizer.use_idf else None
+
+        # Flatten every tree into one set of node arrays with global indices.
+        # Leaves point to themselves so a fixed number of steps settles every
+        # traversal on its leaf.
+        n_classes = len(forest.classes_)
+        normalize_leaves = tuple(int(part) for part in sklearn.__version__.split('.')[:2]) < (1, 4)
+        tree_roots, features, thresholds, lefts, rights, probas = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            tree_roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(np.array(tree.threshold, dtype=np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            # Same leaf probabilities DecisionTreeClassifier.predict_proba returns
+            proba = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+            if normalize_leaves:
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+            probas.append(proba)
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature = np.concatenate(features)
+        is_split = np.concatenate(lefts) != np.arange(offset)
+        used_features = np.unique(feature[is_split])
+        # Re-index split features into the dense block of used features
+        feature = np.searchsorted(used_features, feature).clip(0, max(len(used_features) - 1, 0))
+
+        return cls(
+            terms=terms,
+            columns=columns,
+            idf=idf,
+            n_features=len(vocabulary),
+            ngram_range=tuple(vectorizer.ngram_range),
+            token_pattern=vectorizer.token_pattern,
+            lowercase=vectorizer.lowercase,
+            sublinear_tf=vectorizer.sublinear_tf,
+            norm=vectorizer.norm,
+            classes=np.array(forest.classes_),
+            tree_roots=np.array(tree_roots, dtype=np.int64),
+            feature=feature,
+            threshold=np.concatenate(thresholds),
+            children_left=np.concatenate(lefts),
+            children_right=np.concatenate(rights),
+            leaf_proba=np.concatenate(probas),
+            used_features=used_features,
+            max_depth=max_depth
+        )
+
+    def save(self, directory):
+        """
+        Write the engine in the compact serving format.
+
+        Args:
+            directory (str): Directory to write the .npy files and parameters into
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = dict(vars(self), classes=self.classes_)
+        for name in ENGINE_ARRAYS:
+            if arrays[name] is not None:
+                np.save(os.path.join(directory, name + '.npy'), arrays[name], allow_pickle=False)
+        parameters = {
+            "n_features": self.n_features,
+            "ngram_range": list(self.ngram_range),
+            "token_pattern": self.token_pattern,
+            "lowercase": self.lowercase,
+            "sublinear_tf": self.sublinear_tf,
+            "norm": self.norm,
+            "max_depth": int(self.max_depth)
+        }
+        with open(os.path.join(directory, ENGINE_PARAMETERS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(parameters, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r', files=None):
+        """
+        Load an engine written by save.
+
+        Args:
+            directory (str): Directory the engine was saved to
+            mmap_mode (str): Memory-map mode for the arrays (None reads them
+                into memory)
+            files (list): Names of the files save wrote (e.g. from a
+                manifest); any of them missing raises FileNotFoundError
+                instead of loading as an absent optional array
+
+        Returns:
+            CompiledSentimentEngine: The loaded engine
+        """
+        with open(os.path.join(directory, ENGINE_PARAMETERS_FILE), encoding='utf-8') as f:
+            parameters = json.load(f)
+        parameters["ngram_range"] = tuple(parameters["ngram_range"])
+        for name in ENGINE_ARRAYS:
+            path = os.path.join(directory, name + '.npy')
+            expected = os.path.exists(path) if files is None else name + '.npy' in files
+            parameters[name] = np.load(path, mmap_mode=mmap_mode) if expected else None
+        return cls(**parameters)
+
+    def _count_terms(self, texts):
+        """
+        Count vocabulary n-grams per text as CSR arrays with sorted columns.
+
+        Returns:
+            tuple: (indptr, indices, counts) arrays
+        """
+        min_n, max_n = self.ngram_range
+        limit = self._max_term_length
+        grams = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            tokens = self._tokenize(text.lower() if self.lowercase else text)
+            # A token longer than every vocabulary term cannot be part of a
+            # vocabulary n-gram; blanking it keeps its position (so it still
+            # separates its neighbours) without letting one huge token widen
+            # the lookup array below
+            if max(map(len, tokens), default=0) > limit:
+                tokens = [token if len(token) <= limit else '' for token in tokens]
+            start = len(grams)
+            for n in range(min_n, max_n + 1):
+                if n == 1:
+                    grams.extend(tokens)
+                else:
+                    grams.extend(' '.join(tokens[j:j + n]) for j in range(len(tokens) - n + 1))
+            lengths[i] = len(grams) - start
+
+        # Look every n-gram of the batch up in the sorted vocabulary at once,
+        # then count (text, column) pairs; np.unique returns them sorted by
+        # text and column, which is the CSR order
+        keys = np.zeros(0, dtype=np.int64)
+        if grams and len(self.terms):
+            gram_array = np.array(grams, dtype=str)
+            found = np.searchsorted(self.terms, gram_array).clip(max=len(self.terms) - 1)
+            known = np.flatnonzero(self.terms[found] == gram_array)
+            rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+            keys = rows[known] * self.n_features + self.columns[found[known]]
+        keys, counts = np.unique(keys, return_counts=True)
+        key_rows = keys // max(self.n_features, 1)
+        indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(key_rows, minlength=len(texts)), out=indptr[1:])
+        return indptr, keys - key_rows * self.n_features, counts.astype(np.float64)
+
+    def transform(self, texts):
+        """
+        Compute the TF-IDF rows of the texts.
+
+        Args:
+            texts (list): Preprocessed texts
+
+        Returns:
+            tuple: (indptr, indices, data) CSR arrays equal to the vectorizer's output
+        """
+        indptr, indices, data = self._count_terms(texts)
+
+        if self.sublinear_tf:
+            np.log(data, data)
+            data += 1.0
+        if self.idf is not None:
+            data *= self.idf[indices]
+
+        if self.norm == 'l2' and len(data):
+            # Row norms summed strictly left to right, as scikit-learn does:
+            # step p adds the p-th entry of every row long enough to have one
+            row_lengths = np.diff(indptr)
+            rows = np.repeat(np.arange(len(texts)), row_lengths)
+            positions = np.arange(len(data)) - indptr[rows]
+            order = np.argsort(positions, kind='stable')
+            bounds = np.searchsorted(positions[order], np.arange(row_lengths.max() + 1))
+
+            squares = data * data
+            sums = np.zeros(len(texts), dtype=np.float64)
+            for p in range(len(bounds) - 1):
+                entries = order[bounds[p]:bounds[p + 1]]
+                sums[rows[entries]] += squares[entries]
+
+            norms = np.sqrt(sums)
+            nonzero = norms[rows] != 0.0
+            data[nonzero] /= norms[rows][nonzero]
+
+        return indptr, indices, data
+
+    def _dense_used_features(self, indptr, indices, data):
+        """Scatter the TF-IDF values of the split features into a dense float32 block."""
+        n_rows = len(indptr) - 1
+        block = np.zeros((n_rows, max(len(self.used_features), 1)), dtype=np.float32)
+        positions = self._used_position[indices]
+        used = positions >= 0
+        rows = np.repeat(np.arange(n_rows), np.diff(indptr))
+        # Trees compare float32 feature values, exactly like scikit-learn
+        block[rows[used], positions[used]] = data[used].astype(np.float32)
+        return block
+
+    def _forest_proba(self, block):
+        """Traverse every tree for every row of the dense feature block."""
+        n_rows = block.shape[0]
+        rows = np.arange(n_rows)[:, np.newaxis]
+        nodes = np.broadcast_to(self.tree_roots, (n_rows, len(self.tree_roots)))
+        for _ in range(self.max_depth):
+            values = block[rows, self.feature[nodes]]
+            nodes = np.where(values <= self.threshold[nodes],
+                             self.children_left[nodes], self.children_right[nodes])
+
+        # Sum tree probabilities in tree order (as the forest accumulates
+        # them), then average
+        proba = np.cumsum(self.leaf_proba[nodes], axis=1)[:, -1, :]
+        proba /= len(self.tree_roots)
+        return proba
+
+    def predict_proba(self, texts):
+        """
+        Class probabilities for preprocessed texts.
+
+        Args:
+            texts (list): Preprocessed texts
+
+        Returns:
+            numpy.ndarray: Probabilities of shape (n_texts, n_classes)
+        """
+        probabilities = []
+        for start in range(0, len(texts), PREDICT_CHUNK_SIZE):
+            indptr, indices, data = self.transform(texts[start:start + PREDICT_CHUNK_SIZE])
+            probabilities.append(self._forest_proba(self._dense_used_features(indptr, indices, data)))
+        if not probabilities:
+            return np.zeros((0, len(self.classes_)), dtype=np.float64)
+        return np.concatenate(probabilities)
+
+    def predict(self, texts, timings=None):
+        """
+        Predicted classes for preprocessed texts.
+
+        Args:
+            texts (list): Preprocessed texts
+            timings (dict): If given, the seconds spent building TF-IDF
+                features and traversing the forest are added to its
+                'vectorize' and 'inference' entries
+
+        Returns:
+            tuple: (classes, probabilities) from a single traversal
+        """
+        if timings is None:
+            probabilities = self.predict_proba(texts)
+        else:
+            vectorize_seconds = inference_seconds = 0.0
+            probabilities = []
+            for start in range(0, len(texts), PREDICT_CHUNK_SIZE):
+                started = time.perf_counter()
+                block = self._dense_used_features(*self.transform(texts[start:start + PREDICT_CHUNK_SIZE]))
+                vectorized = time.perf_counter()
+                probabilities.append(self._forest_proba(block))
+                vectorize_seconds += vectorized - started
+                inference_seconds += time.perf_counter() - vectorized
+            timings['vectorize'] = timings.get('vectorize', 0.0) + vectorize_seconds
+            timings['inference'] = timings.get('inference', 0.0) + inference_seconds
+            if probabilities:
+                probabilities = np.concatenate(probabilities)
+            else:
+                probabilities = np.zeros((0, len(self.classes_)), dtype=np.float64)
+        return self.classes_.take(np.argmax(probabilities, axis=1)), probabilities
+
+    def matches_pipeline(self, pipeline, texts):
+        """
+        Check that the engine reproduces the pipeline exactly.
+
+        Args:
+            pipeline (Pipeline): Pipeline the engine was compiled from
+            texts (list): Preprocessed texts to compare on
+
+        Returns:
+            bool: Whether the probabilities are identical
+        """
+        return np.array_equal(self.predict_proba(texts), pipeline.predict_proba(texts))
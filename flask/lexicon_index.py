@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Compiled sentiment lexicon for the Sentiment Analysis Model
+
+LexiconIndex maps every lexicon word to a token id once. Scoring a batch then
+looks all tokens up in a single pass, builds a sparse (texts x lexicon
+entries) count matrix and multiplies it by the entry weights, so lexicon
+scores and key terms for the whole batch come from array operations instead
+of per-token set lookups.
+
+Entries may carry weights (a plain set of words weighs every word 1) and may
+be multi-word phrases. Phrases are matched against preprocessed tokens, i.e.
+lowercase lemmas with stop words removed, and count in addition to any
+single-word entries they contain.
+"""
+
+import itertools
+
+import numpy as np
+from scipy import sparse
+
+# Number of key terms reported per polarity
+KEY_TERM_LIMIT = 5
+
+
+def _weighted(terms):
+    """Turn a set of terms or a {term: weight} mapping into a weight mapping."""
+    weights = dict(terms) if isinstance(terms, dict) else dict.fromkeys(terms, 1)
+    for term, weight in weights.items():
+        if weight < 0:
+            raise ValueError(f"Lexicon weight of {term!r} must not be negative")
+    return weights
+
+
+class LexiconIndex:
+    """
+    Positive and negative lexicon entries compiled to token ids.
+    """
+
+    def __init__(self, positive_terms, negative_terms):
+        """
+        Compile the lexicon.
+
+        Args:
+            positive_terms (set or dict): Positive words and phrases, or a
+                mapping of them to weights
+            negative_terms (set or dict): Negative words and phrases, or a
+                mapping of them to weights
+
+        Raises:
+            ValueError: On empty terms, negative weights, or phrases too long
+                to index
+        """
+        self.positive_weights = positive = _weighted(positive_terms)
+        self.negative_weights = negative = _weighted(negative_terms)
+
+        # Entries (words and phrases) and the words they are made of
+        self.terms = sorted(set(positive) | set(negative))
+        self._term_array = np.array(self.terms, dtype=object)
+        entry_words = [term.split() for term in self.terms]
+        if not all(entry_words):
+            raise ValueError("Lexicon terms must not be empty")
+        words = sorted({word for entry in entry_words for word in entry})
+        self.token_ids = {word: token_id for token_id, word in enumerate(words)}
+        vocabulary_size = len(words)
+
+        # Entry weights: column 0 positive, column 1 negative
+        self.weights = np.array(
+            [[positive.get(term, 0), negative.get(term, 0)] for term in self.terms],
+            dtype=np.float64
+        ).reshape(len(self.terms), 2)
+
+        # Single words: token id -> entry id
+        self._word_entries = np.full(vocabulary_size, -1, dtype=np.int64)
+        # Phrases by length: sorted token id codes and their entry ids
+        phrases = {}
+        for entry_id, entry in enumerate(entry_words):
+            token_ids = [self.token_ids[word] for word in entry]
+            if len(entry) == 1:
+                self._word_entries[token_ids[0]] = entry_id
+                continue
+            if vocabulary_size ** len(entry) >= 2 ** 63:
+                raise ValueError(f"Lexicon phrase {self.terms[entry_id]!r} is too long to index")
+            code = 0
+            for token_id in token_ids:
+                code = code * vocabulary_size + token_id
+            phrases.setdefault(len(entry), []).append((code, entry_id))
+        self._phrases = {}
+        for length, entries in sorted(phrases.items()):
+            entries.sort()
+            self._phrases[length] = (np.array([code for code, _ in entries], dtype=np.int64),
+                                     np.array([entry_id for _, entry_id in entries], dtype=np.int64))
+        self._vocabulary_size = vocabulary_size
+
+    def _hits(self, token_ids, rows):
+        """
+        Find every entry occurrence in the flattened token ids.
+
+        Returns:
+            tuple: (positions, entry ids) ordered by position, single words
+                before phrases starting at the same position
+        """
+        known = np.flatnonzero(token_ids >= 0)
+        word_entries = self._word_entries[token_ids[known]]
+        is_word = word_entries >= 0
+        positions = [known[is_word]]
+        entries = [word_entries[is_word]]
+
+        for length, (codes, phrase_entries) in self._phrases.items():
+            count = len(token_ids) - length + 1
+            if count <= 0:
+                continue
+            # Windows of `length` known tokens within one text, encoded in
+            # base vocabulary_size and looked up among the phrase codes
+            valid = rows[:count] == rows[length - 1:]
+            window_codes = np.zeros(count, dtype=np.int64)
+            for offset in range(length):
+                part = token_ids[offset:offset + count]
+                valid &= part >= 0
+                window_codes = window_codes * self._vocabulary_size + part
+            found = np.searchsorted(codes, window_codes).clip(max=len(codes) - 1)
+            matched = np.flatnonzero(valid & (codes[found] == window_codes))
+            positions.append(matched)
+            entries.append(phrase_entries[found[matched]])
+
+        positions = np.concatenate(positions)
+        entries = np.concatenate(entries)
+        order = np.argsort(positions, kind='stable')
+        return positions[order], entries[order]
+
+    def match(self, token_lists, key_term_limit=KEY_TERM_LIMIT):
+        """
+        Score a batch of tokenized texts against the lexicon.
+
+        Args:
+            token_lists (list): Preprocessed tokens of each text
+            key_term_limit (int): Key terms reported per polarity and text
+
+        Returns:
+            tuple: (positive scores, negative scores, key terms) where the
+                scores are weighted hit counts per text and the key terms are
+                (positive terms, negative terms) per text, in order of
+                occurrence
+        """
+        n_texts = len(token_lists)
+        lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=n_texts)
+        tokens = list(itertools.chain.from_iterable(token_lists))
+        token_ids = np.fromiter(map(self.token_ids.get, tokens, itertools.repeat(-1)),
+                                dtype=np.int64, count=len(tokens))
+        rows = np.repeat(np.arange(n_texts), lengths)
+
+        positions, entries = self._hits(token_ids, rows)
+        hit_rows = rows[positions]
+
+        # Sparse (texts x entries) counts times the entry weights
+        counts = sparse.csr_matrix(
+            (np.ones(len(entries)), (hit_rows, entries)), shape=(n_texts, len(self.terms))
+        )
+        scores = np.asarray(counts @ self.weights)
+
+        # Key terms: each text's first few hits per polarity, in order of
+        # occurrence, sliced out of one list of hit terms
+        key_terms = []
+        for polarity in (0, 1):
+            is_hit = self.weights[entries, polarity] > 0
+            polarity_rows = hit_rows[is_hit]
+            rank = np.arange(len(polarity_rows)) - np.searchsorted(polarity_rows, polarity_rows)
+            kept = rank < key_term_limit
+            kept_rows = polarity_rows[kept]
+            hit_terms = self._term_array[entries[is_hit][kept]].tolist()
+
+            terms_per_text = [[] for _ in range(n_texts)]
+            texts_with_hits, starts = np.unique(kept_rows, return_index=True)
+            ends = np.append(starts[1:], len(kept_rows))
+            for row, start, end in zip(texts_with_hits.tolist(), starts.tolist(), ends.tolist()):
+                terms_per_text[row] = hit_terms[start:end]
+            key_terms.append(terms_per_text)
+
+        return scores[:, 0], scores[:, 1], list(zip(*key_terms))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Load test for the multi-worker Sentiment Analysis API
+
+Starts the API under gunicorn (see gunicorn.conf.py) once per worker count,
+drives /analyze with a fixed number of concurrent clients and reports
+throughput and latency per worker count, so the scaling with the number of
+workers can be checked:
+
+    python load_test.py --workers 1,2,4 --threads 4 --concurrency 32
+    python load_test.py --url http://localhost:5000 --requests 5000
+
+With --url an already running server is measured instead.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Comments sent by the clients; a running number keeps every text distinct
+# so the result cache does not answer for the model
+COMMENTS = (
+    "The blockchain verification process was seamless and I felt confident my vote was secure.",
+    "Had technical issues with the biometric authentication and couldn't vote properly.",
+    "The system worked as expected, nothing special but no major issues either.",
+    "Love the transparency of seeing my vote on the blockchain! 👍",
+    "This is way too complicated for the average voter. It needs to be simplified."
+)
+
+# Seconds to wait for a started server to answer /health
+STARTUP_TIMEOUT_SECONDS = 120
+
+
+def wait_until_ready(url, timeout=STARTUP_TIMEOUT_SECONDS, process=None):
+    """
+    Poll /health until the server answers.
+
+    Args:
+        url (str): Server base URL
+        timeout (float): Seconds to wait
+        process (Popen): Server process; fail early if it exits
+
+    Raises:
+        RuntimeError: If the server does not come up in time
+    """
+    parts = urllib.parse.urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout} seconds")
+
+
+def run_load(url, requests, concurrency, warmup=50):
+    """
+    Send /analyze requests from concurrent clients.
+
+    Each client keeps one persistent connection and sends its share of the
+    requests back to back.
+
+    Args:
+        url (str): Server base URL
+        requests (int): Total number of requests
+        concurrency (int): Number of concurrent clients
+        warmup (int): Requests sent (and not measured) before the run
+
+    Returns:
+        dict: Throughput, latency percentiles and error count
+    """
+    parts = urllib.parse.urlsplit(url)
+    headers = {'Content-Type': 'application/json'}
+    counter = iter(range(sys.maxsize))
+    counter_lock = threading.Lock()
+
+    def client(count):
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        latencies = []
+        errors = 0
+        for _ in range(count):
+            with counter_lock:
+                number = next(counter)
+            body = json.dumps({'text': f"{COMMENTS[number % len(COMMENTS)]} #{number}", 'record': False})
+            started = time.perf_counter()
+            try:
+                connection.request('POST', '/analyze', body, headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            latencies.append(time.perf_counter() - started)
+        connection.close()
+        return latencies, errors
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(client, [warmup // concurrency + 1] * concurrency))
+        started = time.perf_counter()
+        outcomes = list(executor.map(client, shares))
+        elapsed = time.perf_counter() - started
+
+    latencies = np.array([latency for client_latencies, _ in outcomes for latency in client_latencies]) * 1000.0
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(errors for _, errors in outcomes),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3)
+    }
+
+
+def run_with_server(workers, threads, port, requests, concurrency):
+    """
+    Start gunicorn with the given worker count, load it and shut it down.
+
+    Returns:
+        dict: Output of run_load plus the server configuration
+    """
+    env = dict(os.environ, SENTIMENT_WORKERS=str(workers), SENTIMENT_THREADS=str(threads),
+               SENTIMENT_BIND=f'127.0.0.1:{port}')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_ready(url, process=process)
+        return dict(run_load(url, requests, concurrency), workers=workers, threads=threads)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the sentiment API across worker counts.")
+    parser.add_argument('--url', help="Measure this running server instead of starting gunicorn")
+    parser.add_argument('--workers', default='1,2,4', help="Comma-separated gunicorn worker counts")
+    parser.add_argument('--threads', type=int, default=4, help="Request threads per worker")
+    parser.add_argument('--port', type=int, default=5055, help="Port for the started servers")
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per run")
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent clients")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.url:
+        wait_until_ready(args.url)
+        runs = [dict(run_load(args.url, args.requests, args.concurrency), workers=None, threads=None)]
+    else:
+        runs = [run_with_server(int(workers), args.threads, args.port, args.requests, args.concurrency)
+                for workers in args.workers.split(',')]
+
+    base = runs[0]["throughput_rps"]
+    print(f"\n{'workers':>8} {'threads':>8} {'req/s':>10} {'scaling':>8} {'p50 ms':>10} {'p95 ms':>10} "
+          f"{'p99 ms':>10} {'errors':>8}")
+    for run in runs:
+        print(f"{run['workers'] or '-':>8} {run['threads'] or '-':>8} {run['throughput_rps']:10.1f} "
+              f"{run['throughput_rps'] / base:7.2f}x {run['p50_ms']:10.3f} {run['p95_ms']:10.3f} "
+              f"{run['p99_ms']:10.3f} {run['errors']:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(runs, f, indent=2)
+        print(f"\nWrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Micro-batching scheduler for concurrent single-comment requests
+
+Every /analyze call scored on its own pays the full per-call overhead of
+preprocessing, vectorizing and traversing the forest. MicroBatchScheduler
+queues concurrent requests for at most a few milliseconds (or until a batch
+is full), scores them with one batch_analyze call on a background thread and
+hands each request its own result through a Future. A request arriving while
+the scheduler is idle and unloaded is scored immediately, without waiting.
+
+The queue is bounded: when it is full new requests are rejected at once
+(QueueFullError, answered with 429) instead of piling up latency, and a
+request whose result does not arrive in time gets a 503.
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from sentiment_metrics import NULL_METRICS
+
+# Largest batch scored at once
+MAX_BATCH_SIZE = 64
+
+# Longest time the first queued request waits for others to join its batch
+MAX_WAIT_MS = 2.0
+
+# Queued requests beyond which new requests are rejected
+MAX_QUEUE_DEPTH = 1000
+
+# Seconds a request waits for its result before giving up
+RESULT_TIMEOUT_SECONDS = 10.0
+
+
+class QueueFullError(Exception):
+    """The scheduler queue is at its depth limit."""
+
+
+class SchedulerUnavailableError(Exception):
+    """The scheduler is stopped or did not answer in time."""
+
+
+class MicroBatchScheduler:
+    """
+    Groups concurrently submitted texts into batches scored on one thread.
+    """
+
+    def __init__(self, score_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 max_queue_depth=MAX_QUEUE_DEPTH, metrics=NULL_METRICS):
+        """
+        Create the scheduler; its thread starts with the first submitted text.
+
+        Args:
+            score_batch (callable): Scores a list of texts, returning one result per text
+            max_batch_size (int): Largest batch scored at once
+            max_wait_ms (float): Longest wait for a batch to fill, in milliseconds
+            max_queue_depth (int): Queued texts beyond which submissions are rejected
+            metrics (SentimentMetrics): Where batch fill and queueing delay are recorded
+        """
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.metrics = metrics
+
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._last_batch_size = 0
+
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+
+    def submit(self, text):
+        """
+        Queue a text for scoring.
+
+        Args:
+            text (str): Text to analyze
+
+        Returns:
+            Future: Resolves to the text's sentiment analysis result
+
+        Raises:
+            QueueFullError: If the queue is at its depth limit
+            SchedulerUnavailableError: If the scheduler was stopped
+        """
+        future = Future()
+        with self._condition:
+            if self._stopped:
+                raise SchedulerUnavailableError("Scheduler is stopped")
+            if len(self._queue) >= self.max_queue_depth:
+                self.rejected += 1
+                self.metrics.observe_rejection('queue_full')
+                raise QueueFullError(f"Queue is full ({self.max_queue_depth} pending requests)")
+            if self._thread is None or not self._thread.is_alive():
+                # Started lazily, so a server that forks workers after import
+                # gets one scheduling thread per worker
+                self._thread = threading.Thread(target=self._run, name='sentiment-microbatch', daemon=True)
+                self._thread.start()
+            self._queue.append((text, future, time.perf_counter()))
+            self._condition.notify()
+        return future
+
+    def analyze(self, text, timeout=RESULT_TIMEOUT_SECONDS):
+        """
+        Queue a text and wait for its result.
+
+        Args:
+            text (str): Text to analyze
+            timeout (float): Seconds to wait for the result
+
+        Returns:
+            dict: Sentiment analysis result
+
+        Raises:
+            QueueFullError: If the queue is at its depth limit
+            SchedulerUnavailableError: If the scheduler is stopped or the result times out
+        """
+        future = self.submit(text)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.metrics.observe_rejection('timeout')
+            raise SchedulerUnavailableError(f"No result within {timeout} seconds") from None
+
+    def _next_batch(self):
+        """Wait for the first queued text, then for the batch to fill or the wait to expire."""
+        with self._condition:
+            while not self._queue and not self._stopped:
+                self._condition.wait()
+            if self._stopped:
+                return None
+
+            # A lone request arriving at an idle scheduler is scored at once;
+            # the wait only applies while requests are actually concurrent
+            deadline = self._queue[0][2] + self.max_wait
+            if len(self._queue) == 1 and self._last_batch_size <= 1:
+                deadline = 0.0
+            while len(self._queue) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            size = self._last_batch_size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        """Scheduling thread: score queued texts batch by batch."""
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            # Requests that timed out in the meantime are not scored
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            self.batches += 1
+            self.items += len(batch)
+            self.metrics.observe_microbatch(
+                len(batch), self.max_batch_size, [started - queued_at for _, _, queued_at in batch]
+            )
+            try:
+                results = self.score_batch([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stop(self):
+        """Stop the scheduling thread; queued requests fail as unavailable."""
+        with self._condition:
+            self._stopped = True
+            pending = list(self._queue)
+            self._queue.clear()
+            self._condition.notify_all()
+        for _, future, _ in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(SchedulerUnavailableError("Scheduler is stopped"))
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """
+        Report scheduler counters.
+
+        Returns:
+            dict: Queue depth, batch count, mean batch fill and rejections
+        """
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_fill": round(self.items / (self.batches * self.max_batch_size), 4) if self.batches else 0.0,
+            "rejected": self.rejected
+        }
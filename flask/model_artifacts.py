@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Versioned model artifacts for the Sentiment Analysis Model
+
+A model directory holds one sub-directory per trained model version plus a
+CURRENT pointer naming the version to serve:
+
+    models/
+        CURRENT
+        20261017T120000Z-3f2a9c1b7d4e/
+            model.joblib
+            manifest.json
+            engine-<hash>/     (optional compact serving format, *.npy)
+
+Artifacts are written by the offline training command (train_sentiment.py)
+and are only ever loaded by the API server. On the first start with an
+empty model directory, the legacy voting_sentiment_model.pkl is imported
+as the first version. Every write goes to a temporary
+location first and is moved into place with an atomic rename, so concurrent
+readers never see a half-written model.
+
+A version may also carry the compiled inference engine in the compact
+serving format (see write_compact_engine): plain .npy arrays that are
+memory-mapped at load time, so every worker process shares the same model
+pages. The API serves from it when present and never loads the pickle.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+
+from file_utils import atomic_write_text
+from inference_engine import CompiledSentimentEngine
+
+# Default location of the versioned model artifacts
+MODEL_DIR = os.environ.get(
+    'SENTIMENT_MODEL_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+)
+
+# Single-file pickle served before versioned artifacts existed; imported as
+# the first version of an empty model directory (see migrate_legacy_model)
+LEGACY_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'voting_sentiment_model.pkl')
+
+CURRENT_POINTER = 'CURRENT'
+MODEL_FILENAME = 'model.joblib'
+MANIFEST_FILENAME = 'manifest.json'
+ENGINE_DIRNAME = 'engine'
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def file_sha256(path):
+    """
+    Compute the SHA-256 digest of a file.
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def current_version(model_dir=MODEL_DIR):
+    """
+    Read the version named by the CURRENT pointer.
+
+    Args:
+        model_dir (str): Model directory
+
+    Returns:
+        str: Current model version, or None if nothing has been published
+    """
+    try:
+        with open(os.path.join(model_dir, CURRENT_POINTER), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_model_artifact(pipeline, model_dir=MODEL_DIR, metadata=None, publish=True):
+    """
+    Write a fitted pipeline as a new versioned artifact.
+
+    The model is dumped uncompressed so its NumPy arrays can be memory-mapped
+    at load time.
+
+    Args:
+        pipeline: Fitted scikit-learn pipeline
+        model_dir (str): Model directory
+        metadata (dict): Extra information stored in the manifest (e.g. metrics)
+        publish (bool): Whether to point CURRENT at the new version
+
+    Returns:
+        dict: Manifest of the written artifact
+    """
+    import sklearn
+
+    os.makedirs(model_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=model_dir, prefix='.staging-')
+    try:
+        model_file = os.path.join(staging_dir, MODEL_FILENAME)
+        joblib.dump(pipeline, model_file)
+        sha256 = file_sha256(model_file)
+
+        created_at = datetime.datetime.now(datetime.timezone.utc)
+        version = f"{created_at.strftime('%Y%m%dT%H%M%SZ')}-{sha256[:12]}"
+        manifest = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "version": version,
+            "created_at": created_at.isoformat(),
+            "model_file": MODEL_FILENAME,
+            "sha256": sha256,
+            "size_bytes": os.path.getsize(model_file),
+            "sklearn_version": sklearn.__version__,
+            "metadata": metadata or {}
+        }
+        with open(os.path.join(staging_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        os.chmod(staging_dir, 0o755)
+        os.rename(staging_dir, os.path.join(model_dir, version))
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    if publish:
+        publish_version(version, model_dir)
+    return manifest
+
+
+def migrate_legacy_model(model_dir=MODEL_DIR, legacy_path=LEGACY_MODEL_PATH):
+    """
+    Import the legacy single-file pickle into a model directory with nothing published.
+
+    A fresh deploy therefore serves the checked-in model right away instead
+    of answering 503 until train_sentiment.py has been run.
+
+    Args:
+        model_dir (str): Model directory
+        legacy_path (str): Legacy pickle file
+
+    Returns:
+        dict: Manifest of the imported version, or None if there was nothing to migrate
+    """
+    if current_version(model_dir) is not None or not os.path.isfile(legacy_path):
+        return None
+    pipeline = joblib.load(legacy_path)
+    manifest = write_model_artifact(pipeline, model_dir, metadata={
+        "migrated_from": os.path.basename(legacy_path),
+        "legacy_sha256": file_sha256(legacy_path)
+    })
+    print(f"Imported legacy model {legacy_path} as version {manifest['version']}")
+    return manifest
+
+
+def publish_version(version, model_dir=MODEL_DIR):
+    """
+    Atomically point CURRENT at an existing artifact version.
+
+    Args:
+        version (str): Version to serve
+        model_dir (str): Model directory
+    """
+    if not os.path.isfile(os.path.join(model_dir, version, MANIFEST_FILENAME)):
+        raise FileNotFoundError(f"No model artifact {version} in {model_dir}")
+    atomic_write_text(os.path.join(model_dir, CURRENT_POINTER), version + '\n')
+
+
+def list_versions(model_dir=MODEL_DIR):
+    """
+    List the artifact versions in a model directory.
+
+    Args:
+        model_dir (str): Model directory
+
+    Returns:
+        list: Version names, oldest first
+    """
+    if not os.path.isdir(model_dir):
+        return []
+    created = {}
+    for name in os.listdir(model_dir):
+        # Staging and deleted directories start with a dot
+        if name.startswith('.') or not os.path.isfile(os.path.join(model_dir, name, MANIFEST_FILENAME)):
+            continue
+        # Version names only carry the second they were created in
+        created[name] = read_manifest(model_dir, name).get("created_at", "")
+    return sorted(created, key=lambda name: (created[name], name))
+
+
+def prune_versions(model_dir=MODEL_DIR, keep=10, select=None):
+    """
+    Delete all but the newest artifact versions, never the published one.
+
+    Args:
+        model_dir (str): Model directory
+        keep (int): Number of the newest selected versions to keep
+        select (callable): Takes a manifest and returns whether its version
+            may be pruned (defaults to every version)
+
+    Returns:
+        list: Deleted versions
+    """
+    current = current_version(model_dir)
+    versions = [version for version in list_versions(model_dir)
+                if select is None or select(read_manifest(model_dir, version))]
+    deleted = [version for version in versions[:max(0, len(versions) - keep)] if version != current]
+    for version in deleted:
+        # Renamed first, so no reader ever sees a manifest without its model
+        trash_dir = os.path.join(model_dir, f".deleted-{version}")
+        os.rename(os.path.join(model_dir, version), trash_dir)
+        shutil.rmtree(trash_dir, ignore_errors=True)
+    return deleted
+
+
+def read_manifest(model_dir=MODEL_DIR, version=None):
+    """
+    Read the manifest of an artifact version.
+
+    Args:
+        model_dir (str): Model directory
+        version (str): Version to read (defaults to CURRENT)
+
+    Returns:
+        dict: Artifact manifest
+    """
+    version = version or current_version(model_dir)
+    if version is None:
+        raise FileNotFoundError(
+            f"No model published in {model_dir}. Run train_sentiment.py to build one."
+        )
+    with open(os.path.join(model_dir, version, MANIFEST_FILENAME), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_model_artifact(model_dir=MODEL_DIR, version=None, mmap_mode='r', verify=True):
+    """
+    Load a versioned pipeline artifact.
+
+    Args:
+        model_dir (str): Model directory
+        version (str): Version to load (defaults to CURRENT)
+        mmap_mode (str): joblib memory-map mode for the NumPy arrays, or None
+        verify (bool): Whether to check the model file against the manifest hash
+
+    Returns:
+        tuple: (pipeline, manifest)
+    """
+    manifest = read_manifest(model_dir, version)
+    model_file = os.path.join(model_dir, manifest["version"], manifest["model_file"])
+    if verify and file_sha256(model_file) != manifest["sha256"]:
+        raise ValueError(f"Model artifact {manifest['version']} does not match its manifest hash")
+
+    pipeline = joblib.load(model_file, mmap_mode=mmap_mode)
+    return pipeline, manifest
+
+
+def write_compact_engine(engine, model_dir=MODEL_DIR, version=None):
+    """
+    Add the compact serving format of a compiled engine to an artifact version.
+
+    The engine must have been compiled from (and checked against) the
+    version's pipeline. Its arrays are written to a staging directory and
+    moved to a new directory named after their hashes; the manifest is then
+    atomically pointed at it, and only after that is a previously exported
+    engine deleted. A reader of the version (even a published one) thus
+    always finds the engine its manifest describes.
+
+    Args:
+        engine (CompiledSentimentEngine): Engine compiled from the version's pipeline
+        model_dir (str): Model directory
+        version (str): Version to extend (defaults to CURRENT)
+
+    Returns:
+        dict: Updated manifest
+    """
+    manifest = read_manifest(model_dir, version)
+    version_dir = os.path.join(model_dir, manifest["version"])
+    previous = manifest.get("engine", {}).get("directory")
+    staging_dir = tempfile.mkdtemp(dir=version_dir, prefix='.staging-')
+    try:
+        engine.save(staging_dir)
+        files = {name: file_sha256(os.path.join(staging_dir, name)) for name in sorted(os.listdir(staging_dir))}
+        size_bytes = sum(os.path.getsize(os.path.join(staging_dir, name)) for name in files)
+        digest = hashlib.sha256(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()
+        directory = f"{ENGINE_DIRNAME}-{digest[:12]}"
+        if directory == previous:
+            # Identical to the engine already exported
+            shutil.rmtree(staging_dir)
+            return manifest
+        os.chmod(staging_dir, 0o755)
+        shutil.rmtree(os.path.join(version_dir, directory), ignore_errors=True)
+        os.rename(staging_dir, os.path.join(version_dir, directory))
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    manifest["engine"] = {"directory": directory, "files": files, "size_bytes": size_bytes}
+    atomic_write_text(os.path.join(version_dir, MANIFEST_FILENAME), json.dumps(manifest, indent=2))
+    if previous:
+        shutil.rmtree(os.path.join(version_dir, previous), ignore_errors=True)
+    return manifest
+
+
+def load_compact_engine(model_dir=MODEL_DIR, version=None, mmap_mode='r', verify=True):
+    """
+    Load the compact serving format of an artifact version.
+
+    Args:
+        model_dir (str): Model directory
+        version (str): Version to load (defaults to CURRENT)
+        mmap_mode (str): Memory-map mode for the engine arrays, or None
+        verify (bool): Whether to check the files against the manifest hashes
+
+    Returns:
+        tuple: (engine, manifest)
+
+    Raises:
+        FileNotFoundError: If the version has no compact engine
+    """
+    manifest = read_manifest(model_dir, version)
+    if "engine" not in manifest:
+        raise FileNotFoundError(f"Model artifact {manifest['version']} has no compact engine")
+    engine_dir = os.path.join(model_dir, manifest["version"], manifest["engine"]["directory"])
+    try:
+        if verify:
+            for name, sha256 in manifest["engine"]["files"].items():
+                if file_sha256(os.path.join(engine_dir, name)) != sha256:
+                    raise ValueError(f"Compact engine file {name} of {manifest['version']} does not match its manifest hash")
+        engine = CompiledSentimentEngine.load(engine_dir, mmap_mode=mmap_mode, files=manifest["engine"]["files"])
+        return engine, manifest
+    except FileNotFoundError:
+        # Re-exported (and the engine read deleted) since the manifest was read
+        if read_manifest(model_dir, manifest["version"]).get("engine") == manifest["engine"]:
+            raise
+        return load_compact_engine(model_dir, manifest["version"], mmap_mode, verify)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Memory budget report for the Sentiment Analysis Model
+
+Breaks down the memory of a model version in both of its formats:
+
+    - the scikit-learn pickle: the TF-IDF vocabulary dict, the IDF array,
+      the tree node arrays (copied into private memory when unpickled) and
+      the per-tree Python objects
+    - the compact serving format: every engine array, memory-mapped and
+      therefore shared by all processes that load it
+
+and then measures what loading each format costs a fresh process (resident
+memory, split into private anonymous memory and shareable file-backed
+pages, Linux only):
+
+    python model_memory.py --model-dir models
+    python model_memory.py --model-dir models --export
+
+With --export the compact serving format is first added to a version that
+was trained before it existed.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from inference_engine import ENGINE_ARRAYS
+from model_artifacts import (MODEL_DIR, load_compact_engine, load_model_artifact, read_manifest,
+                             write_compact_engine)
+
+# Texts scored after loading, so the measured pages include those inference touches
+PROBE_TEXTS = [
+    "blockchain verification seamless confident vote secure",
+    "technical issue biometric authentication vote properly",
+    "system worked expected nothing special major issue either"
+]
+
+SMAPS_ROLLUP = '/proc/self/smaps_rollup'
+
+
+def _is_mapped(array):
+    """Whether a NumPy array's memory comes from a memory-mapped file."""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def deep_size(obj, seen=None):
+    """
+    Estimate the memory reachable from an object.
+
+    Args:
+        obj: Object to measure
+        seen (set): Ids of objects already counted
+
+    Returns:
+        tuple: (private bytes, memory-mapped bytes)
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0, 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        if _is_mapped(obj):
+            return sys.getsizeof(obj) - (obj.nbytes if obj.flags.owndata else 0), obj.nbytes
+        return max(sys.getsizeof(obj), obj.nbytes), 0
+
+    private = sys.getsizeof(obj)
+    mapped = 0
+    if isinstance(obj, dict):
+        children = [item for pair in obj.items() for item in pair]
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        children = list(obj)
+    else:
+        children = list(vars(obj).values()) if hasattr(obj, '__dict__') else []
+    for child in children:
+        child_private, child_mapped = deep_size(child, seen)
+        private += child_private
+        mapped += child_mapped
+    return private, mapped
+
+
+def pipeline_components(pipeline):
+    """
+    Break down the memory of a scikit-learn pipeline.
+
+    Returns:
+        list: (component, private bytes, mapped bytes) tuples
+    """
+    vectorizer, forest = pipeline[0], pipeline[-1]
+    seen = set()
+    components = [("vocabulary dict", *deep_size(vectorizer.vocabulary_, seen))]
+    if getattr(vectorizer, 'stop_words_', None):
+        components.append(("pruned terms (stop_words_)", *deep_size(vectorizer.stop_words_, seen)))
+    if getattr(vectorizer, 'idf_', None) is not None:
+        components.append(("idf", *deep_size(vectorizer.idf_, seen)))
+
+    estimators = getattr(forest, 'estimators_', [])
+    node_bytes = 0
+    object_bytes = 0
+    for estimator in estimators:
+        tree = getattr(estimator, 'tree_', None)
+        if tree is not None:
+            # Unpickling copies the nodes and values into the tree's own buffers
+            state = tree.__getstate__()
+            node_bytes += state['nodes'].nbytes + state['values'].nbytes
+            object_bytes += sys.getsizeof(tree)
+            seen.add(id(tree))
+        object_bytes += deep_size(estimator, seen)[0]
+    if estimators:
+        components.append((f"tree nodes ({len(estimators)} trees)", node_bytes, 0))
+        components.append(("tree objects", object_bytes, 0))
+
+    other_private, other_mapped = deep_size(pipeline, seen)
+    components.append(("other", other_private, other_mapped))
+    return components
+
+
+def engine_components(engine):
+    """
+    Break down the memory of a compact engine.
+
+    Returns:
+        list: (component, private bytes, mapped bytes) tuples
+    """
+    seen = set()
+    components = []
+    for name in ENGINE_ARRAYS:
+        array = engine.classes_ if name == 'classes' else getattr(engine, name)
+        if array is not None:
+            components.append((name, *deep_size(array, seen)))
+    components.append(("other", *deep_size(engine, seen)))
+    return components
+
+
+def _read_smaps():
+    """Resident, anonymous and proportional memory of this process, in bytes."""
+    values = {}
+    with open(SMAPS_ROLLUP, encoding='ascii') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {"rss": values.get("Rss", 0), "anonymous": values.get("Anonymous", 0), "pss": values.get("Pss", 0)}
+
+
+def _measure_in_process(model_format, model_dir, version):
+    """Load one format in this (fresh) process and report the memory it added."""
+    # Import everything first so only the model itself is measured
+    import joblib  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+    import sklearn.feature_extraction.text  # noqa: F401
+    import sklearn.pipeline  # noqa: F401
+
+    before = _read_smaps()
+    if model_format == 'compact':
+        model, _ = load_compact_engine(model_dir, version)
+    else:
+        model, _ = load_model_artifact(model_dir, version, mmap_mode='r')
+    model.predict_proba(PROBE_TEXTS)
+    after = _read_smaps()
+
+    rss = after["rss"] - before["rss"]
+    anonymous = after["anonymous"] - before["anonymous"]
+    return {"rss": rss, "private_anonymous": anonymous, "file_backed": rss - anonymous}
+
+
+def measure_load(model_format, model_dir, version):
+    """
+    Measure the memory a fresh process needs to load a model format.
+
+    Returns:
+        dict: Resident, private anonymous and file-backed bytes, or None
+            where /proc/self/smaps_rollup is unavailable
+    """
+    if not os.path.exists(SMAPS_ROLLUP):
+        return None
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure', model_format,
+         '--model-dir', model_dir, '--version', version],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def export_compact(model_dir, version):
+    """
+    Add the compact serving format to a version that lacks it.
+
+    Returns:
+        dict: Updated manifest
+    """
+    from sentiment import BlockchainVotingSentimentAnalyzer
+
+    analyzer = BlockchainVotingSentimentAnalyzer(load_pretrained=True, model_path=model_dir, version=version,
+                                                 cache_size=0, use_compiled_engine=True)
+    if analyzer.engine is None:
+        raise ValueError(f"Model {version} cannot be compiled exactly; no compact format written")
+    return write_compact_engine(analyzer.engine, model_dir, version)
+
+
+def build_report(model_dir, version=None):
+    """
+    Build the memory report of a model version.
+
+    Args:
+        model_dir (str): Model directory
+        version (str): Version to report on (defaults to CURRENT)
+
+    Returns:
+        dict: Components and load measurements per format
+    """
+    manifest = read_manifest(model_dir, version)
+    version = manifest["version"]
+    pipeline, _ = load_model_artifact(model_dir, version, mmap_mode='r')
+    report = {
+        "version": version,
+        "formats": {
+            "sklearn": {
+                "file_bytes": manifest["size_bytes"],
+                "components": pipeline_components(pipeline),
+                "load": measure_load('sklearn', model_dir, version)
+            }
+        }
+    }
+    if "engine" in manifest:
+        engine, _ = load_compact_engine(model_dir, version)
+        report["formats"]["compact"] = {
+            "file_bytes": manifest["engine"]["size_bytes"],
+            "components": engine_components(engine),
+            "load": measure_load('compact', model_dir, version)
+        }
+    return report
+
+
+def _kib(size):
+    return f"{size / 1024:,.1f}"
+
+
+def print_report(report):
+    """Print a memory report as tables."""
+    print(f"Model {report['version']}")
+    for model_format, details in report["formats"].items():
+        print(f"\n{model_format} format ({_kib(details['file_bytes'])} KiB on disk)")
+        print(f"  {'component':32} {'private KiB':>14} {'mapped KiB':>14}")
+        for name, private, mapped in details["components"]:
+            print(f"  {name:32} {_kib(private):>14} {_kib(mapped):>14}")
+        private = sum(component[1] for component in details["components"])
+        mapped = sum(component[2] for component in details["components"])
+        print(f"  {'total':32} {_kib(private):>14} {_kib(mapped):>14}")
+
+    measured = {name: details["load"] for name, details in report["formats"].items() if details["load"]}
+    if measured:
+        print(f"\nMeasured load in a fresh process\n  {'format':10} {'RSS KiB':>12} "
+              f"{'private KiB':>14} {'shareable KiB':>14}")
+        for name, load in measured.items():
+            print(f"  {name:10} {_kib(load['rss']):>12} {_kib(load['private_anonymous']):>14} "
+                  f"{_kib(load['file_backed']):>14}")
+        print("  (private memory is paid by every worker; shareable pages are held once)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the memory of a sentiment model version.")
+    parser.add_argument('--model-dir', default=MODEL_DIR, help="Versioned model directory")
+    parser.add_argument('--version', help="Version to report on (defaults to CURRENT)")
+    parser.add_argument('--export', action='store_true',
+                        help="Add the compact serving format to the version if it lacks one")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument('--measure', choices=('sklearn', 'compact'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(_measure_in_process(args.measure, args.model_dir, args.version)))
+        return
+
+    version = read_manifest(args.model_dir, args.version)["version"]
+    if args.export and "engine" not in read_manifest(args.model_dir, version):
+        export_compact(args.model_dir, version)
+        print(f"Added the compact serving format to {version}")
+
+    report = build_report(args.model_dir, version)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
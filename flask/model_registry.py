@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Zero-downtime model hot-swap for the Sentiment Analysis API
+
+ModelRegistry owns the analyzer the API serves. A new model version (found
+by watching the CURRENT pointer of the model directory, or requested through
+an admin reload) is loaded on a background thread, warmed with a canned
+batch and then swapped in with a single reference assignment. Requests take
+the reference once when they start, so in-flight requests finish on the
+model they started with; the previous analyzer's worker pool is only shut
+down after a grace period.
+"""
+
+import collections
+import datetime
+import threading
+import time
+
+from model_artifacts import current_version
+
+# Seconds between checks of the CURRENT pointer
+WATCH_INTERVAL_SECONDS = 5.0
+
+# Seconds a replaced analyzer keeps its worker pool for in-flight requests;
+# batches still in the pool after that are finished before it stops
+RETIRE_GRACE_SECONDS = 60.0
+
+# Swaps remembered in the registry status
+HISTORY_SIZE = 10
+
+
+class ModelRegistry:
+    """
+    Loads, warms and atomically swaps the serving analyzer.
+    """
+
+    def __init__(self, load_version, model_dir=None, warmup_texts=None, on_swap=None,
+                 poll_seconds=WATCH_INTERVAL_SECONDS, retire_grace_seconds=RETIRE_GRACE_SECONDS):
+        """
+        Create the registry; nothing is loaded until load or reload is called.
+
+        Args:
+            load_version (callable): Builds an analyzer for a model version
+                (None meaning the published CURRENT version)
+            model_dir (str): Versioned model directory to watch (None disables watching)
+            warmup_texts (list): Texts scored before a new analyzer is swapped
+                in (defaults to the analyzer's built-in sample texts)
+            on_swap (callable): Called with each analyzer once it is serving
+            poll_seconds (float): Seconds between checks of the CURRENT pointer
+            retire_grace_seconds (float): Seconds before a replaced analyzer's
+                worker pool is shut down (after the batches inside it finish)
+        """
+        self.load_version = load_version
+        self.model_dir = model_dir
+        self.warmup_texts = warmup_texts
+        self.on_swap = on_swap
+        self.poll_seconds = poll_seconds
+        self.retire_grace_seconds = retire_grace_seconds
+
+        # The serving analyzer; read it once per request
+        self.current = None
+
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.loading_version = None
+        self.last_error = None
+        self.history = collections.deque(maxlen=HISTORY_SIZE)
+
+    def load(self, version=None):
+        """
+        Load, warm and swap in a model version on the calling thread.
+
+        Args:
+            version (str): Version to serve (defaults to CURRENT)
+
+        Returns:
+            BlockchainVotingSentimentAnalyzer: The analyzer now serving
+        """
+        with self._load_lock:
+            return self._load(version)
+
+    def _load(self, version):
+        """Load and swap with the load lock held."""
+        self.loading_version = version or 'CURRENT'
+        started = time.perf_counter()
+        try:
+            analyzer = self.load_version(version)
+            # Warm up outside the result cache so the first real requests do
+            # not pay for lazy initialization
+            analyzer._score_batch(list(self.warmup_texts or analyzer.sample_data["texts"]))
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.loading_version = None
+
+        self._swap(analyzer, time.perf_counter() - started)
+        return analyzer
+
+    def _swap(self, analyzer, load_seconds):
+        """Make the analyzer the serving one and retire the previous one."""
+        previous = self.current
+        self.current = analyzer
+        if self.on_swap is not None:
+            self.on_swap(analyzer)
+
+        self.last_error = None
+        self.history.append({
+            "version": analyzer.model_version,
+            "previous_version": previous.model_version if previous is not None else None,
+            "swapped_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "load_seconds": round(load_seconds, 4)
+        })
+        print(f"Serving sentiment model {analyzer.model_version}")
+
+        if previous is not None and previous.parallel_scorer is not None:
+            retire = threading.Timer(self.retire_grace_seconds, previous.disable_parallel_scoring)
+            retire.daemon = True
+            retire.start()
+
+    def reload(self, version=None):
+        """
+        Load a model version in the background and swap it in when ready.
+
+        Args:
+            version (str): Version to serve (defaults to CURRENT)
+
+        Returns:
+            bool: False if a load is already in progress, True otherwise
+        """
+        if not self._load_lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self._load(version)
+            except Exception as e:
+                print(f"Model reload failed: {e}")
+            finally:
+                self._load_lock.release()
+
+        threading.Thread(target=run, name='sentiment-model-reload', daemon=True).start()
+        return True
+
+    def start_watching(self):
+        """Reload in the background whenever the CURRENT pointer changes."""
+        if self.model_dir is None or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name='sentiment-model-watch', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        """Watcher thread: poll the CURRENT pointer."""
+        # Only changes of the pointer trigger a load, so a version pinned
+        # through an admin reload stays until the next publish, and a version
+        # that failed to load is not retried
+        watched = current_version(self.model_dir)
+        while not self._stop.wait(self.poll_seconds):
+            version = current_version(self.model_dir)
+            if version is None or version == watched:
+                continue
+            if not self._load_lock.acquire(blocking=False):
+                # Another load is running; look again on the next poll
+                continue
+            watched = version
+            try:
+                if self.current is None or version != self.current.model_version:
+                    self._load(version)
+            except Exception as e:
+                print(f"Model reload of {version} failed: {e}")
+            finally:
+                self._load_lock.release()
+
+    def stop(self):
+        """Stop watching the model directory."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def status(self):
+        """
+        Report the registry state.
+
+        Returns:
+            dict: Serving and loading versions, last error and recent swaps
+        """
+        return {
+            "serving_version": self.current.model_version if self.current is not None else None,
+            "loading_version": self.loading_version,
+            "watching": self._watcher is not None,
+            "last_error": self.last_error,
+            "history": list(self.history)
+        }
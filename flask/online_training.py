@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Online incremental training for the Sentiment Analysis Model
+
+Keeps learning from moderator-labeled comments as they arrive instead of
+retraining from the built-in sample sentences. The online pipeline pairs a
+stateless HashingVectorizer (no vocabulary to grow) with an SGDClassifier
+trained through partial_fit, so memory stays constant however much labeled
+data accumulates: only the current mini-batch is ever held.
+
+Labeled feedback is read as JSON lines, one {"text": ..., "label": ...}
+object per line, where the label is one of "negative", "neutral",
+"positive" (or 0, 1, 2):
+
+    python online_training.py --feedback feedback.jsonl --follow
+
+Checkpoints are written as new model versions, so the API server can pick
+them up without a restart. A checkpoint is only published once the model
+has learned from moderator feedback, and only if its test-then-train
+accuracy since the previous checkpoint reaches MIN_PUBLISH_ACCURACY;
+otherwise it is kept unpublished. Each checkpoint records how far every
+feedback file was consumed; restarting the trainer resumes from the newest
+online checkpoint at those offsets. Only the newest KEEP_CHECKPOINTS online
+checkpoints are kept (never the published version).
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import time
+
+import numpy as np
+
+from model_artifacts import (
+    MODEL_DIR, list_versions, load_model_artifact, prune_versions, read_manifest, write_model_artifact
+)
+from sentiment import SENTIMENT_LABELS, BlockchainVotingSentimentAnalyzer
+
+# Manifest 'trainer' value of online checkpoints
+TRAINER_NAME = 'online'
+
+# Labeled comments per partial_fit call
+BATCH_SIZE = 256
+
+# Write a checkpoint after this many mini-batches
+CHECKPOINT_EVERY = 20
+
+# Hashed feature space; the classifier's weights are the only state that
+# scales with it (3 classes x 2**18 features x 8 bytes = 6 MiB)
+HASH_FEATURES = 2 ** 18
+
+# Passes over the built-in sample sentences when starting a fresh model
+BOOTSTRAP_EPOCHS = 5
+
+# Accuracy on the feedback learned since the previous checkpoint (scored
+# before it was learned) needed to publish a checkpoint; chance is 1/3
+MIN_PUBLISH_ACCURACY = 0.5
+
+# Online checkpoints kept in the model directory (0 keeps every one)
+KEEP_CHECKPOINTS = 10
+
+
+def build_online_pipeline(n_features=HASH_FEATURES):
+    """
+    Build the untrained online pipeline.
+
+    Args:
+        n_features (int): Size of the hashed feature space
+
+    Returns:
+        Pipeline: Hashing vectorizer followed by a logistic-loss SGD classifier
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([
+        ('vectorizer', HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 3),  # Same n-grams as the batch-trained model
+            alternate_sign=False,
+            norm='l2'
+        )),
+        ('classifier', SGDClassifier(
+            loss='log_loss',  # Logistic loss, so predict_proba is available
+            alpha=1e-5,
+            random_state=42
+        ))
+    ])
+
+
+def parse_label(label):
+    """
+    Map a feedback label to its class id.
+
+    Args:
+        label: Label name ("negative", "neutral", "positive") or class id
+
+    Returns:
+        int: Class id, or None if the label is not recognised
+    """
+    if isinstance(label, str):
+        label = label.strip().lower()
+        return SENTIMENT_LABELS.index(label) if label in SENTIMENT_LABELS else None
+    if isinstance(label, int) and not isinstance(label, bool) and 0 <= label < len(SENTIMENT_LABELS):
+        return label
+    return None
+
+
+def read_feedback_lines(path, offset=0, follow=False, poll_seconds=1.0):
+    """
+    Read labeled feedback records from a JSON lines file.
+
+    Args:
+        path (str): Feedback file
+        offset (int): Byte offset to start reading at
+        follow (bool): Keep waiting for new lines at the end of the file
+        poll_seconds (float): Sleep between polls when following
+
+    Yields:
+        tuple: (record dict or None for an unreadable line, byte offset after the line)
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            line = f.readline()
+            if not line or not line.endswith(b'\n'):
+                # End of file, or a line still being written
+                if not follow:
+                    return
+                f.seek(offset)
+                time.sleep(poll_seconds)
+                continue
+            offset = f.tell()
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield (record if isinstance(record, dict) else None), offset
+
+
+class OnlineSentimentTrainer:
+    """
+    Incrementally trains the online pipeline and checkpoints it as model versions.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, batch_size=BATCH_SIZE, checkpoint_every=CHECKPOINT_EVERY,
+                 publish=True, resume=True, min_accuracy=MIN_PUBLISH_ACCURACY, keep=KEEP_CHECKPOINTS):
+        """
+        Start from the newest online checkpoint, or from a fresh model
+        bootstrapped on the built-in sample sentences.
+
+        Args:
+            model_dir (str): Model directory checkpoints are written to
+            batch_size (int): Labeled comments per partial_fit call
+            checkpoint_every (int): Mini-batches between checkpoints
+            publish (bool): Whether checkpoints that pass min_accuracy are
+                published as CURRENT
+            resume (bool): Whether to continue from the newest online checkpoint
+            min_accuracy (float): Accuracy since the previous checkpoint needed
+                to publish (None publishes every checkpoint)
+            keep (int): Online checkpoints kept in the model directory (0 keeps all)
+        """
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.publish = publish
+        self.min_accuracy = min_accuracy
+        self.keep = keep
+
+        self.samples_seen = 0
+        self.samples_skipped = 0
+        self.batches_since_checkpoint = 0
+        # Test-then-train accuracy: every batch is scored before it is learned
+        self.progressive_correct = 0
+        self.progressive_total = 0
+        # The same, since the last checkpoint (the publishing gate)
+        self.recent_correct = 0
+        self.recent_total = 0
+        # Feedback file path -> byte offset consumed so far
+        self.feedback_offsets = {}
+        self._checkpointed_offsets = {}
+        self.parent_version = None
+
+        pipeline = self._resume_pipeline() if resume else None
+        bootstrap = pipeline is None
+        if bootstrap:
+            pipeline = build_online_pipeline()
+
+        # The analyzer supplies the exact preprocessing used at serving time
+        self.analyzer = BlockchainVotingSentimentAnalyzer(
+            load_pretrained=False, pipeline=pipeline, cache_size=0, use_compiled_engine=False
+        )
+        self.pipeline = pipeline
+
+        if bootstrap:
+            texts = self.analyzer.sample_data["texts"]
+            labels = [SENTIMENT_LABELS.index(label) for label in self.analyzer.sample_data["labels"]]
+            rng = np.random.RandomState(42)
+            for _ in range(BOOTSTRAP_EPOCHS):
+                order = rng.permutation(len(texts))
+                self._fit([texts[i] for i in order], [labels[i] for i in order])
+            # Progressive accuracy only counts moderator feedback
+            self.progressive_correct = self.progressive_total = 0
+            self.recent_correct = self.recent_total = 0
+
+    def _resume_pipeline(self):
+        """Load the newest online checkpoint, published or not, restoring the trainer state."""
+        for version in reversed(list_versions(self.model_dir)):
+            manifest = read_manifest(self.model_dir, version)
+            state = manifest.get("metadata", {})
+            if state.get("trainer") == TRAINER_NAME:
+                break
+        else:
+            return None
+
+        # Loaded into memory (not memory-mapped): partial_fit updates the weights in place
+        pipeline, manifest = load_model_artifact(self.model_dir, manifest["version"], mmap_mode=None)
+        self.parent_version = manifest["version"]
+        self.samples_seen = state.get("samples_seen", 0)
+        self.samples_skipped = state.get("samples_skipped", 0)
+        self.progressive_correct = state.get("progressive_correct", 0)
+        self.progressive_total = state.get("progressive_total", 0)
+        self.feedback_offsets = dict(state.get("feedback_offsets", {}))
+        self._checkpointed_offsets = dict(self.feedback_offsets)
+        print(f"Resuming online training from {self.parent_version} ({self.samples_seen} samples seen)")
+        return pipeline
+
+    def _fit(self, texts, labels):
+        """Preprocess a mini-batch exactly as serving does and update the classifier."""
+        preprocessed_texts = [self.analyzer._preprocess_text(text)[0] for text in texts]
+        features = self.pipeline[:-1].transform(preprocessed_texts)
+        classifier = self.pipeline[-1]
+        labels = np.asarray(labels)
+
+        if hasattr(classifier, 'classes_'):
+            correct = int((classifier.predict(features) == labels).sum())
+            self.progressive_correct += correct
+            self.progressive_total += len(labels)
+            self.recent_correct += correct
+            self.recent_total += len(labels)
+        classifier.partial_fit(features, labels, classes=np.arange(len(SENTIMENT_LABELS)))
+
+    def partial_fit(self, texts, labels):
+        """
+        Learn from one mini-batch of labeled comments.
+
+        Args:
+            texts (list): Comments
+            labels (list): Class ids (see parse_label)
+
+        Returns:
+            dict: Manifest of the checkpoint written after this batch, or None
+        """
+        if not texts:
+            return None
+        self._fit(texts, labels)
+        self.samples_seen += len(texts)
+        self.batches_since_checkpoint += 1
+        if self.batches_since_checkpoint >= self.checkpoint_every:
+            return self.checkpoint()
+        return None
+
+    def consume(self, records, source=None):
+        """
+        Learn from a stream of feedback records in mini-batches.
+
+        Args:
+            records (iterable): (record, offset) pairs; records are dicts with
+                'text' and 'label', offsets are the source position after each
+                record (None if the source has no positions)
+            source (str): Name under which the consumed offset is checkpointed
+
+        Returns:
+            int: Number of records learned from
+        """
+        learned = 0
+        texts, labels = [], []
+        for record, offset in records:
+            label = parse_label(record.get('label')) if record is not None else None
+            text = record.get('text') if record is not None else None
+            if label is None or not isinstance(text, str) or not text.strip():
+                self.samples_skipped += 1
+            else:
+                texts.append(text)
+                labels.append(label)
+
+            if len(texts) >= self.batch_size:
+                if source is not None:
+                    self.feedback_offsets[source] = offset
+                self.partial_fit(texts, labels)
+                learned += len(texts)
+                texts, labels = [], []
+            elif source is not None and not texts:
+                # Nothing pending: skipped records are consumed as well
+                self.feedback_offsets[source] = offset
+
+        if texts:
+            if source is not None:
+                self.feedback_offsets[source] = offset
+            self.partial_fit(texts, labels)
+            learned += len(texts)
+        return learned
+
+    def consume_file(self, path, follow=False, poll_seconds=1.0):
+        """
+        Learn from a JSON lines feedback file, resuming at the checkpointed offset.
+
+        When following, a mini-batch is trained on as soon as it fills up;
+        stop with KeyboardInterrupt (a final checkpoint is still written).
+
+        Args:
+            path (str): Feedback file
+            follow (bool): Keep waiting for new feedback at the end of the file
+            poll_seconds (float): Sleep between polls when following
+
+        Returns:
+            int: Number of records learned from
+        """
+        source = os.path.abspath(path)
+        offset = self.feedback_offsets.get(source, 0)
+        if offset > os.path.getsize(path):
+            # The file was truncated or replaced since the last checkpoint
+            offset = 0
+        try:
+            return self.consume(read_feedback_lines(path, offset, follow, poll_seconds), source)
+        finally:
+            self.checkpoint()
+
+    def consume_queue(self, feedback_queue, stop_event, max_wait=1.0):
+        """
+        Learn from records put on a queue.Queue until stop_event is set.
+
+        A partial mini-batch is trained on after max_wait seconds without new
+        records, so feedback never waits indefinitely.
+
+        Args:
+            feedback_queue (queue.Queue): Queue of feedback record dicts
+            stop_event (threading.Event): Set to stop consuming
+            max_wait (float): Seconds to wait for a mini-batch to fill
+
+        Returns:
+            int: Number of records learned from
+        """
+        learned = 0
+        while not stop_event.is_set():
+            batch = []
+            deadline = time.monotonic() + max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append((feedback_queue.get(timeout=remaining), None))
+                except queue.Empty:
+                    break
+            learned += self.consume(batch)
+        self.checkpoint()
+        return learned
+
+    def checkpoint(self):
+        """
+        Write the current model as a new version, published if it passes the
+        accuracy gate.
+
+        Returns:
+            dict: Manifest of the written artifact, or None if nothing was
+                learned or consumed since the last checkpoint (or ever: the
+                bootstrap model alone is never written)
+        """
+        if self.samples_seen == 0:
+            return None
+        if (self.batches_since_checkpoint == 0 and self.parent_version is not None
+                and self.feedback_offsets == self._checkpointed_offsets):
+            return None
+
+        recent_accuracy = self.recent_correct / self.recent_total if self.recent_total else None
+        publish = self.publish and (
+            self.min_accuracy is None or (recent_accuracy is not None and recent_accuracy >= self.min_accuracy)
+        )
+        manifest = write_model_artifact(
+            self.pipeline,
+            self.model_dir,
+            metadata={
+                "trainer": TRAINER_NAME,
+                "parent_version": self.parent_version,
+                "samples_seen": self.samples_seen,
+                "samples_skipped": self.samples_skipped,
+                "progressive_correct": self.progressive_correct,
+                "progressive_total": self.progressive_total,
+                "progressive_accuracy": (
+                    round(self.progressive_correct / self.progressive_total, 4)
+                    if self.progressive_total else None
+                ),
+                "recent_accuracy": round(recent_accuracy, 4) if recent_accuracy is not None else None,
+                "published": publish,
+                "feedback_offsets": self.feedback_offsets
+            },
+            publish=publish
+        )
+        self.parent_version = manifest["version"]
+        self.batches_since_checkpoint = 0
+        self.recent_correct = self.recent_total = 0
+        self._checkpointed_offsets = dict(self.feedback_offsets)
+
+        status = "published" if publish else "not published"
+        if self.publish and not publish:
+            status += f", recent accuracy below {self.min_accuracy}"
+        print(f"Checkpointed online model {manifest['version']} ({self.samples_seen} samples seen, {status})")
+        if self.keep:
+            pruned = prune_versions(self.model_dir, self.keep,
+                                    select=lambda m: m.get("metadata", {}).get("trainer") == TRAINER_NAME)
+            if pruned:
+                print(f"Removed {len(pruned)} old online checkpoints")
+        return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally train the voting sentiment model.")
+    parser.add_argument('--feedback', required=True, help="JSON lines file of labeled comments")
+    parser.add_argument('--follow', action='store_true', help="Keep training as new feedback is appended")
+    parser.add_argument('--model-dir', default=MODEL_DIR, help="Versioned model directory")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Comments per partial_fit call")
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY,
+                        help="Mini-batches between checkpoints")
+    parser.add_argument('--no-publish', action='store_true',
+                        help="Write checkpoints without pointing CURRENT at them")
+    parser.add_argument('--min-accuracy', type=float, default=MIN_PUBLISH_ACCURACY,
+                        help="Accuracy since the previous checkpoint needed to publish (0 disables the gate)")
+    parser.add_argument('--keep', type=int, default=KEEP_CHECKPOINTS,
+                        help="Online checkpoints kept in the model directory (0 keeps all)")
+    parser.add_argument('--fresh', action='store_true',
+                        help="Start a new model instead of resuming the newest online checkpoint")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.feedback):
+        sys.exit(f"Feedback file {args.feedback} not found")
+    trainer = OnlineSentimentTrainer(
+        args.model_dir, args.batch_size, args.checkpoint_every,
+        publish=not args.no_publish, resume=not args.fresh,
+        min_accuracy=args.min_accuracy or None, keep=args.keep
+    )
+    try:
+        learned = trainer.consume_file(args.feedback, follow=args.follow)
+    except KeyboardInterrupt:
+        print("\nStopped")
+        return
+    print(f"\nLearned from {learned} labeled comments ({trainer.samples_skipped} skipped in total)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Multi-core batch scoring for the Sentiment Analysis Model
+
+Preprocessing and random forest inference are GIL-bound, so a single
+process scores a large batch on one core. ParallelBatchScorer splits large
+batches into shards scored by a pool of worker processes and merges the
+results back in input order.
+
+Workers never receive the pipeline through pickling: with the 'fork' start
+method they inherit the parent's analyzer copy-on-write, otherwise each
+worker loads the analyzer's model version once at startup with joblib's
+memory-mapped mode. Forking is only safe while the process has a single
+thread (a lock held by another thread at fork time stays locked forever in
+the child), so pools started once the server is running, e.g. by a model
+hot-swap, use 'forkserver' instead. Small batches stay on the in-process
+fast path.
+"""
+
+import math
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+from sentiment_metrics import NULL_METRICS
+
+# Batches smaller than this are scored in-process
+MIN_PARALLEL_BATCH = 2000
+
+# Smallest shard worth sending to a worker
+MIN_SHARD_SIZE = 250
+
+# Shards per worker, so uneven shards still keep every core busy
+SHARDS_PER_WORKER = 2
+
+# Analyzer used inside worker processes
+_worker_analyzer = None
+
+
+def default_start_method():
+    """
+    Pick the safest multiprocessing start method for a new pool.
+
+    Returns:
+        str: 'fork' while this is the only thread, else 'forkserver' (or
+            'spawn' where forkserver is unavailable)
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        return 'fork'
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+def _init_worker(model_path, version, lexicon):
+    """Load the analyzer and its lexicon in a worker that did not inherit them through fork."""
+    global _worker_analyzer
+    if _worker_analyzer is not None:
+        # Stage timings recorded here would never reach the parent, and a
+        # metrics lock held by another parent thread at fork time would
+        # never be released in this process
+        _worker_analyzer.metrics = NULL_METRICS
+    else:
+        from sentiment import BlockchainVotingSentimentAnalyzer
+        _worker_analyzer = BlockchainVotingSentimentAnalyzer(
+            load_pretrained=True, model_path=model_path, cache_size=0, mmap_mode='r', version=version
+        )
+        _worker_analyzer.update_lexicon(*lexicon)
+
+
+def _score_shard(texts):
+    """Preprocess and score one shard inside a worker process."""
+    return _worker_analyzer._score_columns(texts)
+
+
+def concatenate_scores(shard_scores):
+    """
+    Merge the score columns of consecutive shards.
+
+    Args:
+        shard_scores (list): Outputs of _score_columns, in input order
+
+    Returns:
+        dict: Score columns covering every shard
+    """
+    merged = {}
+    for name, first in shard_scores[0].items():
+        if isinstance(first, np.ndarray):
+            merged[name] = np.concatenate([scores[name] for scores in shard_scores])
+        else:
+            merged[name] = [item for scores in shard_scores for item in scores[name]]
+    return merged
+
+
+class ParallelBatchScorer:
+    """
+    Scores large batches across a pool of worker processes.
+
+    The pool is started when the scorer is created. Created at startup,
+    before any other thread exists, its workers are forked and share the
+    model copy-on-write; created later, they load the model themselves.
+    Either way the workers score with the analyzer's lexicon as it was when
+    the pool started (see BlockchainVotingSentimentAnalyzer.update_lexicon).
+    Closing the scorer waits for the batches already in the pool, and any
+    batch scored after that runs in-process.
+    """
+
+    def __init__(self, analyzer, processes=None, min_parallel_batch=MIN_PARALLEL_BATCH,
+                 min_shard_size=MIN_SHARD_SIZE, start_method=None):
+        """
+        Start the worker pool.
+
+        Args:
+            analyzer (BlockchainVotingSentimentAnalyzer): Analyzer to parallelize
+            processes (int): Number of worker processes (defaults to the CPU count)
+            min_parallel_batch (int): Smallest batch sent to the pool
+            min_shard_size (int): Smallest shard handed to a worker
+            start_method (str): multiprocessing start method (defaults to
+                default_start_method())
+        """
+        global _worker_analyzer
+
+        self.analyzer = analyzer
+        self.processes = processes or os.cpu_count() or 1
+        self.min_parallel_batch = min_parallel_batch
+        self.min_shard_size = min_shard_size
+
+        if start_method is None:
+            start_method = default_start_method()
+        self.start_method = start_method
+
+        if start_method == 'fork':
+            # Forked workers share the parent's model pages copy-on-write
+            _worker_analyzer = analyzer
+            initargs = (None, None, None)
+        else:
+            if analyzer.model_path is None:
+                raise ValueError(
+                    f"Workers started with {start_method!r} load the model from disk; "
+                    "the analyzer must be loaded from a model artifact"
+                )
+            # The same version the analyzer serves, not whatever is CURRENT now
+            version = analyzer.model_manifest["version"] if analyzer.model_manifest else None
+            lexicon = (analyzer.lexicon_index.positive_weights, analyzer.lexicon_index.negative_weights)
+            initargs = (analyzer.model_path, version, lexicon)
+
+        context = multiprocessing.get_context(start_method)
+        self._pool = context.Pool(self.processes, initializer=_init_worker, initargs=initargs)
+
+        # Batches inside the pool, so close() never stops it under one
+        self._in_flight = 0
+        self._closed = False
+        self._idle = threading.Condition()
+
+    def _shards(self, texts):
+        """Split texts into contiguous shards of roughly equal size."""
+        shard_count = min(self.processes * SHARDS_PER_WORKER, math.ceil(len(texts) / self.min_shard_size))
+        shard_size = math.ceil(len(texts) / shard_count)
+        return [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+
+    def score(self, texts):
+        """
+        Score a batch, in parallel when it is large enough.
+
+        Args:
+            texts (list): List of text inputs to analyze
+
+        Returns:
+            list: Sentiment analysis results in input order
+        """
+        if self.processes < 2 or len(texts) < self.min_parallel_batch:
+            return self.analyzer._score_batch(texts)
+
+        with self._idle:
+            if self._closed:
+                # A request still holding a retired analyzer
+                return self.analyzer._score_batch(texts)
+            self._in_flight += 1
+        try:
+            # Workers return score arrays, which pickle far more cheaply than
+            # result dictionaries; the dictionaries are built here, in order
+            shard_scores = self._pool.map(_score_shard, self._shards(texts))
+        finally:
+            with self._idle:
+                self._in_flight -= 1
+                self._idle.notify_all()
+        return self.analyzer._build_results(texts, concatenate_scores(shard_scores))
+
+    def close(self):
+        """Stop the worker processes once the batches in the pool are scored."""
+        with self._idle:
+            if self._closed:
+                return
+            self._closed = True
+            while self._in_flight:
+                self._idle.wait()
+        self._pool.close()
+        self._pool.join()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Response shaping for the Sentiment Analysis API
+
+Full results carry the original text, every score and a debug block, which
+dominates the size of large batch responses. Clients can ask for less:
+
+- fields: a preset ("full", "compact" or "label") or a list of result fields
+  (a JSON array or a comma-separated string) to keep in each result
+- layout: "rows" (a list of result objects, the default) or "columns"
+  (one array per field, nested fields as nested column objects)
+
+Responses are JSON unless the Accept header prefers MessagePack
+(application/msgpack or application/x-msgpack) and msgpack is installed;
+without it, clients asking for MessagePack get JSON. JSON is encoded with
+orjson when it is installed and with Flask's encoder otherwise.
+"""
+
+import numpy as np
+from flask import Response, jsonify
+
+try:
+    import orjson
+except ImportError:  # optional: the standard encoder is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack is then never negotiated
+    msgpack = None
+
+# Fields of a sentiment analysis result, in result order
+RESULT_FIELDS = ('original_text', 'sentiment', 'confidence', 'sentiment_scores', 'key_terms', 'debug')
+
+# Named field selections
+FIELD_PRESETS = {
+    'full': RESULT_FIELDS,
+    'compact': ('sentiment', 'confidence', 'sentiment_scores', 'key_terms'),
+    'label': ('sentiment', 'confidence')
+}
+
+LAYOUTS = ('rows', 'columns')
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def parse_fields(value):
+    """
+    Resolve a 'fields' request option.
+
+    Args:
+        value (str or list): Preset name, comma-separated field names or a
+            list of field names (None keeps every field)
+
+    Returns:
+        tuple: Selected fields in result order, or None for all fields
+
+    Raises:
+        ValueError: On an unknown preset or field
+    """
+    if value is None or value == 'full':
+        return None
+    if isinstance(value, str):
+        if value in FIELD_PRESETS:
+            return FIELD_PRESETS[value]
+        value = [field.strip() for field in value.split(',') if field.strip()]
+    if not isinstance(value, list) or not value or not all(isinstance(field, str) for field in value):
+        raise ValueError(f"fields must be one of {', '.join(FIELD_PRESETS)} or a list of result fields")
+    unknown = sorted(set(value) - set(RESULT_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown result fields: {', '.join(unknown)}. Choose from {', '.join(RESULT_FIELDS)}")
+    return tuple(field for field in RESULT_FIELDS if field in value)
+
+
+def parse_layout(value):
+    """
+    Resolve a 'layout' request option.
+
+    Args:
+        value (str): 'rows' or 'columns' (None means 'rows')
+
+    Returns:
+        str: The layout
+
+    Raises:
+        ValueError: On an unknown layout
+    """
+    if value is None:
+        return 'rows'
+    if value not in LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+    return value
+
+
+def select_fields(result, fields):
+    """
+    Keep only the selected fields of a result.
+
+    Args:
+        result (dict): Sentiment analysis result
+        fields (tuple): Fields to keep (None keeps every field)
+
+    Returns:
+        dict: The result with the selected fields (plus any non-result keys
+            such as a stream item's id)
+    """
+    if fields is None:
+        return result
+    return {key: value for key, value in result.items() if key in fields or key not in RESULT_FIELDS}
+
+
+def to_columns(rows):
+    """
+    Turn a list of result objects into parallel arrays.
+
+    Nested objects become nested column objects, e.g.
+    rows[i]['sentiment_scores']['positive'] becomes
+    columns['sentiment_scores']['positive'][i].
+
+    Args:
+        rows (list): Result dictionaries sharing the same keys
+
+    Returns:
+        dict: One list (or nested column object) per key
+    """
+    if not rows:
+        return {}
+    columns = {}
+    for key in rows[0]:
+        values = [row[key] for row in rows]
+        columns[key] = to_columns(values) if isinstance(values[0], dict) else values
+    return columns
+
+
+def shape_results(results, fields=None, layout='rows'):
+    """
+    Apply field selection and layout to a list of results.
+
+    Args:
+        results (list): Sentiment analysis results
+        fields (tuple): Fields to keep (None keeps every field)
+        layout (str): 'rows' or 'columns'
+
+    Returns:
+        list or dict: Result objects, or parallel arrays for 'columns'
+    """
+    if fields is not None:
+        results = [select_fields(result, fields) for result in results]
+    if layout != 'columns':
+        return results
+    if not results:
+        # Keep the column names stable for an empty batch
+        return {field: [] for field in fields or RESULT_FIELDS}
+    return to_columns(results)
+
+
+def _plain(value):
+    """Convert NumPy scalars (which the encoders may not know) to Python values."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def negotiate_format(accept_mimetypes):
+    """
+    Pick the response encoding from the request's Accept header.
+
+    Args:
+        accept_mimetypes (MIMEAccept): request.accept_mimetypes
+
+    Returns:
+        str: 'msgpack' (only offered when msgpack is installed) or 'json'
+    """
+    offered = (JSON_MIMETYPE,) + MSGPACK_MIMETYPES if msgpack is not None else (JSON_MIMETYPE,)
+    best = accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+    return 'msgpack' if best in MSGPACK_MIMETYPES else 'json'
+
+
+def encode_response(payload, response_format='json', status=200):
+    """
+    Encode a response payload.
+
+    Args:
+        payload (dict): Response body
+        response_format (str): 'json' or 'msgpack' (JSON without msgpack installed)
+        status (int): HTTP status code
+
+    Returns:
+        Response: Encoded response
+    """
+    if response_format == 'msgpack' and msgpack is not None:
+        body = msgpack.packb(payload, default=_plain, use_bin_type=True)
+        return Response(body, status=status, mimetype=MSGPACK_MIMETYPES[0])
+
+    if orjson is not None:
+        try:
+            body = orjson.dumps(payload, default=_plain,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS)
+        except TypeError:
+            # e.g. non-string keys or oversized integers; the standard
+            # encoder below handles them
+            pass
+        else:
+            return Response(body, status=status, mimetype=JSON_MIMETYPE)
+
+    response = jsonify(payload)
+    response.status_code = status
+    return response
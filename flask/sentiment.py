@@ -10,34 +10,159 @@ and feedback to determine sentiment (positive, negative, neutral). The model use
 a combination of lexicon-based approach and a simple machine learning classifier.
 """
 
+import time
+
+# Import time of this module, reported by startup_report.py
+_MODULE_LOAD_STARTED = time.perf_counter()
+
+import os
 import re
+import functools
+import hmac
+import threading
 import numpy as np
-import pandas as pd
 from collections import Counter
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import classification_report, accuracy_score
 import joblib
 import json
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS  # Import Flask-CORS
+from sentiment_cache import SentimentResultCache, copy_result, make_cache_key
+from sentiment_stats import WINDOWS, SentimentStatistics, StatisticsAggregator
+from parallel_scoring import ParallelBatchScorer
+from inference_engine import CompiledSentimentEngine
+from lexicon_index import LexiconIndex
+from model_registry import ModelRegistry
+from batch_jobs import JOB_DB_PATH, BatchJobManager, JobLimitError, JobNotFoundError, JobStore
+from microbatch import MicroBatchScheduler, QueueFullError, SchedulerUnavailableError
+from sentiment_metrics import NULL_METRICS, MetricsRegistry, SentimentMetrics
+from model_artifacts import (MODEL_DIR, file_sha256, load_compact_engine, load_model_artifact, migrate_legacy_model,
+                             read_manifest)
+from worker_state import WorkerStatePublisher
+from response_shaping import encode_response, negotiate_format, parse_fields, parse_layout, select_fields, shape_results
+
+# Training-only modules (scikit-learn estimators, model selection and metrics)
+# are imported on demand in _build_pipeline and _train_model, and NLTK is only
+# imported once an analyzer is created, so serving processes start quickly.
+
+# NLTK corpora are resolved from this bundled directory and never downloaded
+# at import time; populate it with `python train_sentiment.py --download-only`
+NLTK_DATA_DIR = os.environ.get(
+    'NLTK_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data')
+)
+NLTK_RESOURCES = {
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'omw-1.4': 'corpora/omw-1.4'
+}
+
+def load_nltk_resources(data_dir=NLTK_DATA_DIR):
+    """
+    Load the NLTK stop words and lemmatizer from the bundled data directory.
+    
+    Args:
+        data_dir (str): Directory holding the NLTK corpora
+        
+    Returns:
+        tuple: (stop word set, warmed-up WordNetLemmatizer)
+    """
+    import nltk
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+    
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    try:
+        stop_words = set(stopwords.words('english'))
+        lemmatizer = WordNetLemmatizer()
+        # WordNet loads lazily on first use; pay that cost at startup instead
+        # of on the first request
+        lemmatizer.lemmatize('votes')
+    except LookupError as e:
+        raise LookupError(
+            f"NLTK data missing from {data_dir}. "
+            f"Run `python train_sentiment.py --download-only` when building the image.\n{e}"
+        ) from e
+    return stop_words, lemmatizer
+
+# Sentiment labels indexed by the numerical class used by the ML model
+SENTIMENT_LABELS = ["negative", "neutral", "positive"]
+
+# Punctuation that carries sentiment is spelled out before the remaining
+# special characters are stripped
+PUNCTUATION_TABLE = str.maketrans({'!': ' exclamation ', '?': ' question '})
+NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+
+# Once punctuation is stripped the text only holds word characters and
+# whitespace, so NLTK's word_tokenize reduces to a whitespace split plus the
+# apostrophe-free contractions it always splits apart
+CONTRACTION_SPLITS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na')
+}
+
+# Upper bound on the number of distinct tokens kept in the lemma cache
+LEMMA_CACHE_SIZE = 50000
+
+# Number of comments scored per chunk by the streaming batch endpoint
+STREAM_CHUNK_SIZE = 500
+
+# Worker processes used to score large batches (0 or 1 scores in-process)
+SCORING_PROCESSES = int(os.environ.get('SENTIMENT_SCORING_PROCESSES', '0'))
+
+# Serve predictions from the compiled inference engine instead of calling
+# scikit-learn (set SENTIMENT_COMPILED_ENGINE=0 to use the pipeline directly)
+USE_COMPILED_ENGINE = os.environ.get('SENTIMENT_COMPILED_ENGINE', '1') != '0'
+
+# Result cache configuration (set CACHE_MAX_SIZE to 0 to disable caching)
+CACHE_MAX_SIZE = 10000
+CACHE_TTL_SECONDS = 300
+
+# Micro-batching of concurrent /analyze requests: each request waits at most
+# MICROBATCH_WAIT_MS for others to be scored with it, in batches of up to
+# MICROBATCH_MAX_SIZE; beyond MICROBATCH_QUEUE_DEPTH queued requests new ones
+# get a 429 (set SENTIMENT_MICROBATCH=0 to score every request on its own)
+MICROBATCH_ENABLED = os.environ.get('SENTIMENT_MICROBATCH', '1') != '0'
+MICROBATCH_WAIT_MS = float(os.environ.get('SENTIMENT_MICROBATCH_WAIT_MS', '2'))
+MICROBATCH_MAX_SIZE = int(os.environ.get('SENTIMENT_MICROBATCH_MAX_SIZE', '64'))
+MICROBATCH_QUEUE_DEPTH = int(os.environ.get('SENTIMENT_MICROBATCH_QUEUE_DEPTH', '1000'))
+
+# Seconds between checks of the model directory's CURRENT pointer; newly
+# published versions are loaded and swapped in without a restart (0 disables)
+MODEL_WATCH_SECONDS = float(os.environ.get('SENTIMENT_MODEL_WATCH_SECONDS', '5'))
 
-# Download necessary NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
+# Token required by the admin endpoints (X-Admin-Token header); the admin
+# endpoints are disabled when it is not set
+ADMIN_TOKEN = os.environ.get('SENTIMENT_ADMIN_TOKEN')
+
+# Prometheus metrics served on /metrics (set SENTIMENT_METRICS=0 to disable)
+METRICS_ENABLED = os.environ.get('SENTIMENT_METRICS', '1') != '0'
+
+# Profile one request in this many with cProfile, aggregated on
+# /metrics/profile (0 disables profiling)
+PROFILE_SAMPLE_EVERY = int(os.environ.get('SENTIMENT_PROFILE_SAMPLE_EVERY', '0'))
+
+# Directory where server workers share their metrics and statistics, so
+# /metrics and /statistics cover every worker (gunicorn.conf.py sets it;
+# without it each process only reports its own), and seconds between a
+# worker's publications
+SHARED_STATE_DIR = os.environ.get('SENTIMENT_SHARED_STATE_DIR')
+SHARED_STATE_SECONDS = float(os.environ.get('SENTIMENT_SHARED_STATE_SECONDS', '5'))
+
+# Asynchronous batch jobs (/jobs): SQLite store shared by the server's worker
+# processes, background scoring threads per process, jobs each client may
+# have in progress, and the largest batch accepted
+JOB_DB = os.environ.get('SENTIMENT_JOB_DB', JOB_DB_PATH)
+JOB_WORKERS = int(os.environ.get('SENTIMENT_JOB_WORKERS', '1'))
+JOBS_PER_CLIENT = int(os.environ.get('SENTIMENT_JOBS_PER_CLIENT', '2'))
+JOB_MAX_TEXTS = int(os.environ.get('SENTIMENT_JOB_MAX_TEXTS', '1000000'))
+
+# Largest page of job results returned at once
+JOB_RESULTS_PAGE_LIMIT = 1000
 
 class BlockchainVotingSentimentAnalyzer:
     """
@@ -47,17 +172,37 @@ class BlockchainVotingSentimentAnalyzer:
     
     # The rest of the class remains unchanged...
     # [Keeping the existing implementation]
-    def __init__(self, load_pretrained=True, model_path='voting_sentiment_model.pkl'):
+    def __init__(self, load_pretrained=True, model_path=MODEL_DIR,
+                 cache_size=CACHE_MAX_SIZE, cache_ttl=CACHE_TTL_SECONDS, mmap_mode='r',
+                 use_compiled_engine=USE_COMPILED_ENGINE, metrics=None, pipeline=None,
+                 version=None):
         """
         Initialize the sentiment analyzer, either by loading a pre-trained model
         or preparing for training a new one.
         
         Args:
             load_pretrained (bool): Whether to load a pre-trained model
-            model_path (str): Path to the pre-trained model file
+            model_path (str): Versioned model directory (or a legacy pickle file)
+            cache_size (int): Maximum number of cached results (0 disables the cache)
+            cache_ttl (float): Seconds a cached result stays valid
+            mmap_mode (str): joblib memory-map mode used when loading the model
+            use_compiled_engine (bool): Whether to serve predictions from the
+                compiled inference engine (falls back to scikit-learn if the
+                pipeline cannot be compiled exactly)
+            metrics (SentimentMetrics): Where per-stage scoring timings are
+                recorded (defaults to the no-op NULL_METRICS)
+            pipeline (Pipeline): Pipeline to use as is, instead of loading or
+                training one (e.g. an incrementally trained model)
+            version (str): Model version to load (defaults to the published
+                CURRENT version)
         """
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        
+        # Time spent in each startup stage, reported by startup_report.py
+        self.startup_timings = {}
+        started = time.perf_counter()
+        self.stop_words, self.lemmatizer = load_nltk_resources()
+        self.startup_timings["nltk_resources"] = time.perf_counter() - started
         
         # Sentiment lexicons (expanded for better coverage)
         self.positive_words = {
@@ -97,6 +242,18 @@ class BlockchainVotingSentimentAnalyzer:
             '❌': -1, '⛔': -1, '🚫': -1, '⚠️': -1, '🔓': -1, '💔': -2, '😕': -1
         }
         
+        # Single alternation over every emoji, longest first so multi-codepoint
+        # emojis such as '❤️' are matched as a whole
+        self._emoji_pattern = re.compile('|'.join(
+            re.escape(emoji) for emoji in sorted(self.emoji_sentiment, key=len, reverse=True)
+        ))
+        
+        # Lexicons compiled to token ids for batch scoring (see update_lexicon)
+        self.lexicon_index = LexiconIndex(self.positive_words, self.negative_words)
+        
+        # Bounded memo of raw token -> lemmas kept after stop-word filtering
+        self._normalize_token = functools.lru_cache(maxsize=LEMMA_CACHE_SIZE)(self._lemmatize_token)
+        
         # Expanded training data with more balanced samples
         self.sample_data = {
             "texts": [
@@ -181,8 +338,56 @@ class BlockchainVotingSentimentAnalyzer:
             ]
         }
         
+        # Set before loading: a model artifact with the compact serving
+        # format provides the engine directly
+        self.use_compiled_engine = use_compiled_engine
+        self.engine = None
+        
+        started = time.perf_counter()
+        if pipeline is not None:
+            self.pipeline = pipeline
+            self.training_report = None
+            self.model_manifest = None
+            self.model_path = None
+            self.model_version = f"local-{joblib.hash(self.pipeline)}"
+        elif load_pretrained:
+            self.load_model(model_path, mmap_mode=mmap_mode, version=version)
+            self.startup_timings["model_load"] = time.perf_counter() - started
+        else:
+            # Training in-process is meant for the offline training command
+            # and the demo; the API server only ever loads published artifacts
+            self.pipeline = self._build_pipeline()
+            self.training_report = self._train_model()
+            self.model_manifest = None
+            self.model_path = None
+            self.model_version = f"local-{joblib.hash(self.pipeline)}"
+            self.startup_timings["model_training"] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        self._compile_engine()
+        self.startup_timings["engine_compile"] = time.perf_counter() - started
+        
+        # Results are cached per model version, so a new model never serves
+        # results computed by the previous one
+        self.result_cache = SentimentResultCache(cache_size, cache_ttl, self.metrics) if cache_size else None
+        
+        # Optional process pool for large batches (see enable_parallel_scoring)
+        self.parallel_scorer = None
+    
+    @staticmethod
+    def _build_pipeline():
+        """
+        Build the untrained model pipeline.
+        
+        Returns:
+            Pipeline: TF-IDF vectorizer followed by a random forest classifier
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.pipeline import Pipeline
+        
         # Improved model pipeline with better feature engineering and classifier
-        self.pipeline = Pipeline([
+        return Pipeline([
             ('vectorizer', TfidfVectorizer(
                 max_features=10000,  # Increased from 5000
                 min_df=2,  # Reduced from 5 to capture more rare but important terms
@@ -200,18 +405,89 @@ class BlockchainVotingSentimentAnalyzer:
                 random_state=42
             ))
         ])
+    
+    def load_model(self, model_path=MODEL_DIR, mmap_mode='r', version=None):
+        """
+        Load a trained pipeline without ever training one.
         
-        if load_pretrained:
-            try:
-                self.pipeline = joblib.load(model_path)
-                print(f"Loaded pre-trained model from {model_path}")
-            except FileNotFoundError:
-                print(f"No pre-trained model found at {model_path}. Will train a new model.")
-                self._train_model()
-                joblib.dump(self.pipeline, model_path)
+        If the artifact carries the compact serving format and the compiled
+        engine is enabled, the engine's arrays are memory-mapped instead and
+        the scikit-learn pipeline is not loaded at all (self.pipeline is None).
+        
+        Args:
+            model_path (str): Versioned model directory, or a legacy pickle file
+            mmap_mode (str): joblib memory-map mode for the model's NumPy arrays
+            version (str): Version to load from a model directory (defaults to CURRENT)
+        """
+        if os.path.isfile(model_path):
+            # Legacy single-file pickle without a manifest
+            self.pipeline = joblib.load(model_path, mmap_mode=mmap_mode)
+            self.model_manifest = None
+            self.model_version = f"legacy-{file_sha256(model_path)[:12]}"
         else:
-            self._train_model()
-            joblib.dump(self.pipeline, model_path)
+            manifest = read_manifest(model_path, version)
+            if self.use_compiled_engine and "engine" in manifest:
+                self.engine, self.model_manifest = load_compact_engine(
+                    model_path, manifest["version"], mmap_mode=mmap_mode
+                )
+                self.pipeline = None
+            else:
+                self.pipeline, self.model_manifest = load_model_artifact(
+                    model_path, manifest["version"], mmap_mode=mmap_mode
+                )
+            self.model_version = self.model_manifest["version"]
+        self.model_path = model_path
+        self.training_report = None
+        print(f"Loaded pre-trained model {self.model_version} from {model_path}")
+    
+    def _compile_engine(self):
+        """
+        Compile the fitted pipeline into the serving inference engine.
+        
+        The engine is only used if it reproduces the pipeline's probabilities
+        exactly on the built-in sample texts; otherwise predictions keep going
+        through scikit-learn. An engine loaded from the compact serving format
+        was checked when it was exported and is kept as is.
+        """
+        if self.engine is not None and self.pipeline is None:
+            return
+        self.engine = None
+        if not self.use_compiled_engine:
+            return
+        
+        try:
+            engine = CompiledSentimentEngine.from_pipeline(self.pipeline)
+        except ValueError as e:
+            print(f"Compiled inference engine unavailable, using scikit-learn: {e}")
+            return
+        
+        check_texts = [self._preprocess_text(text)[0] for text in self.sample_data["texts"]]
+        if not engine.matches_pipeline(self.pipeline, check_texts):
+            print("Compiled inference engine does not match the pipeline, using scikit-learn")
+            return
+        self.engine = engine
+    
+    def enable_parallel_scoring(self, processes=None, **options):
+        """
+        Score large batches across a pool of worker processes.
+        
+        Called at startup, before any other thread exists, the workers are
+        forked and share the loaded model copy-on-write. Called later (e.g.
+        for a hot-swapped model), they are started through a fork server and
+        load the analyzer's model version from disk.
+        
+        Args:
+            processes (int): Number of worker processes (defaults to the CPU count)
+            **options: Further ParallelBatchScorer options (e.g. min_parallel_batch)
+        """
+        self.disable_parallel_scoring()
+        self.parallel_scorer = ParallelBatchScorer(self, processes, **options)
+    
+    def disable_parallel_scoring(self):
+        """Stop the worker pool, once its running batches finish, and score every batch in-process."""
+        if self.parallel_scorer is not None:
+            self.parallel_scorer.close()
+            self.parallel_scorer = None
     
     def _preprocess_text(self, text):
         """
@@ -224,25 +500,46 @@ class BlockchainVotingSentimentAnalyzer:
         Returns:
             str: Preprocessed text
         """
-        # Extract emoji sentiment first
-        emoji_score = 0
-        for emoji, score in self.emoji_sentiment.items():
-            if emoji in text:
-                emoji_score += score
-                text = text.replace(emoji, ' ')
+        tokens, emoji_score = self._tokenize_text(text)
         
-        # Keep certain punctuation that might indicate sentiment
-        text = text.replace('!', ' exclamation ')
-        text = text.replace('?', ' question ')
+        # Remove stop words and lemmatize
+        return ' '.join([lemma for token in tokens for lemma in self._normalize_token(token)]), emoji_score
+    
+    def _tokenize_text(self, text):
+        """
+        Score and strip emojis, normalize punctuation and case, and split into tokens.
         
-        # Convert to lowercase and remove special characters
-        text = re.sub(r'[^\w\s]', ' ', text.lower())
+        Args:
+            text (str): Input text
+            
+        Returns:
+            tuple: (list of tokens, emoji score)
+        """
+        # Extract emoji sentiment first; every distinct emoji counts once
+        emoji_score = 0
+        emojis = set(self._emoji_pattern.findall(text))
+        if emojis:
+            emoji_score = sum(self.emoji_sentiment[emoji] for emoji in emojis)
+            text = self._emoji_pattern.sub(' ', text)
         
-        # Tokenize, remove stop words, and lemmatize
-        tokens = word_tokenize(text)
-        tokens = [self.lemmatizer.lemmatize(token) for token in tokens if token not in self.stop_words]
+        # Keep certain punctuation that might indicate sentiment, then convert
+        # to lowercase and remove special characters
+        text = NON_WORD_PATTERN.sub(' ', text.translate(PUNCTUATION_TABLE).lower())
         
-        return ' '.join(tokens), emoji_score
+        return text.split(), emoji_score
+    
+    def _lemmatize_token(self, token):
+        """
+        Split, stop-word filter and lemmatize a single whitespace token.
+        
+        Args:
+            token (str): Lowercase token containing only word characters
+            
+        Returns:
+            tuple: Lemmas kept for the token (empty for stop words)
+        """
+        parts = CONTRACTION_SPLITS.get(token, (token,))
+        return tuple(self.lemmatizer.lemmatize(part) for part in parts if part not in self.stop_words)
     
     def _lexicon_based_score(self, preprocessed_text):
         """
@@ -254,9 +551,9 @@ class BlockchainVotingSentimentAnalyzer:
         Returns:
             float: Sentiment score between -1 and 1
         """
-        tokens = preprocessed_text.split()
-        positive_count = sum(1 for token in tokens if token in self.positive_words)
-        negative_count = sum(1 for token in tokens if token in self.negative_words)
+        positive_scores, negative_scores, _ = self.lexicon_index.match([preprocessed_text.split()])
+        positive_count = float(positive_scores[0])
+        negative_count = float(negative_scores[0])
         
         total_sentiment_words = positive_count + negative_count
         if total_sentiment_words == 0:
@@ -265,8 +562,51 @@ class BlockchainVotingSentimentAnalyzer:
         # Calculate normalized score between -1 and 1
         return (positive_count - negative_count) / max(1, total_sentiment_words)
     
+    def update_lexicon(self, positive_terms=None, negative_terms=None):
+        """
+        Replace the sentiment lexicons and recompile the lexicon index.
+        
+        Terms may be single words or multi-word phrases, given as a set or as
+        a mapping of term to (non-negative) weight. Phrases are matched
+        against preprocessed text, so write them as lowercase lemmas without
+        stop words. Cached results are dropped since scores change, and the
+        scoring pool, whose workers hold a copy of the lexicon, is replaced by
+        one started with the new lexicon.
+        
+        Args:
+            positive_terms (set or dict): New positive lexicon (unchanged if None)
+            negative_terms (set or dict): New negative lexicon (unchanged if None)
+        """
+        if positive_terms is None:
+            positive_terms = self.lexicon_index.positive_weights
+        if negative_terms is None:
+            negative_terms = self.lexicon_index.negative_weights
+        self.lexicon_index = LexiconIndex(positive_terms, negative_terms)
+        self.positive_words = set(positive_terms)
+        self.negative_words = set(negative_terms)
+        
+        previous = self.parallel_scorer
+        if previous is not None:
+            self.parallel_scorer = ParallelBatchScorer(
+                self, previous.processes, min_parallel_batch=previous.min_parallel_batch,
+                min_shard_size=previous.min_shard_size
+            )
+            # Waits for batches still in the old pool, so not on this thread
+            threading.Thread(target=previous.close, daemon=True).start()
+        
+        if self.result_cache is not None:
+            self.result_cache.clear()
+    
     def _train_model(self):
-        """Train the sentiment analysis model using the built-in sample data."""
+        """
+        Train the sentiment analysis model using the built-in sample data.
+        
+        Returns:
+            dict: Evaluation metrics gathered while training
+        """
+        from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
+        from sklearn.metrics import classification_report, accuracy_score
+        
         # Preprocess texts
         processed_texts = []
         for text in self.sample_data["texts"]:
@@ -297,24 +637,7 @@ class BlockchainVotingSentimentAnalyzer:
         )
         
         # Train on training subset
-        pipeline_test = Pipeline([
-            ('vectorizer', TfidfVectorizer(
-                max_features=10000,
-                min_df=2,
-                max_df=0.85,
-                ngram_range=(1, 3),
-                use_idf=True,
-                sublinear_tf=True
-            )),
-            ('classifier', RandomForestClassifier(
-                n_estimators=100,
-                max_depth=20,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                class_weight='balanced',
-                random_state=42
-            ))
-        ])
+        pipeline_test = self._build_pipeline()
         
         pipeline_test.fit(X_train, y_train)
         
@@ -322,6 +645,14 @@ class BlockchainVotingSentimentAnalyzer:
         y_pred = pipeline_test.predict(X_test)
         print("\nTest set evaluation:")
         print(classification_report(y_test, y_pred, target_names=["negative", "neutral", "positive"]))
+        
+        return {
+            "training_samples": len(processed_texts),
+            "cv_f1_scores": [round(float(score), 4) for score in cv_scores],
+            "cv_f1_mean": round(float(cv_scores.mean()), 4),
+            "cv_f1_std": round(float(cv_scores.std()), 4),
+            "holdout_accuracy": round(float(accuracy_score(y_test, y_pred)), 4)
+        }
     
     def analyze_sentiment(self, text):
         """
@@ -333,132 +664,255 @@ class BlockchainVotingSentimentAnalyzer:
         Returns:
             dict: Dictionary containing sentiment analysis results
         """
-        # Preprocess text
-        preprocessed_text, emoji_score = self._preprocess_text(text)
+        return self.batch_analyze([text])[0]
+
+    def batch_analyze(self, texts):
+        """
+        Analyze sentiment for a batch of texts.
         
-        # Get lexicon-based score
-        lexicon_score = self._lexicon_based_score(preprocessed_text)
+        Cached results are reused and identical texts within the batch are
+        scored only once; the remaining texts go through _score_batch.
+        Every returned result is an independent object, so callers may
+        modify it without affecting the cache or other results.
         
-        # Get ML model prediction
-        ml_prediction = self.pipeline.predict([preprocessed_text])[0]
-        ml_probabilities = self.pipeline.predict_proba([preprocessed_text])[0]
+        Args:
+            texts (list): List of text inputs to analyze
+            
+        Returns:
+            list: List of sentiment analysis results
+        """
+        results = [None] * len(texts)
+        
+        # Look up the cache and group uncached texts by key
+        pending = {}
+        for i, text in enumerate(texts):
+            key = make_cache_key(text, self.model_version)
+            cached = self.result_cache.get(key, self.model_version) if self.result_cache else None
+            if cached is not None:
+                cached["original_text"] = text
+                results[i] = cached
+            elif key in pending:
+                pending[key].append(i)
+            else:
+                pending[key] = [i]
         
-        # Map numerical predictions to labels
-        sentiment_labels = ["negative", "neutral", "positive"]
-        ml_sentiment = sentiment_labels[ml_prediction]
+        if pending:
+            unique_texts = [texts[positions[0]] for positions in pending.values()]
+            if self.parallel_scorer is not None:
+                scored = self.parallel_scorer.score(unique_texts)
+            else:
+                scored = self._score_batch(unique_texts)
+            for (key, positions), result in zip(pending.items(), scored):
+                if self.result_cache:
+                    self.result_cache.put(key, result, self.model_version)
+                results[positions[0]] = result
+                for i in positions[1:]:
+                    duplicate = copy_result(result)
+                    duplicate["original_text"] = texts[i]
+                    results[i] = duplicate
+        
+        self.metrics.observe_batch(len(texts), len(pending))
+        return results
+    
+    def _score_batch(self, texts):
+        """
+        Score a batch of texts without consulting the result cache.
+        
+        Args:
+            texts (list): List of text inputs to analyze
+            
+        Returns:
+            list: List of sentiment analysis results
+        """
+        if not texts:
+            return []
+        return self._build_results(texts, self._score_columns(texts))
+    
+    def _score_columns(self, texts):
+        """
+        Compute the per-text scores of a non-empty batch as parallel arrays.
+        
+        The whole batch is vectorized once and scored with a single
+        ``predict_proba`` call; the lexicon, emoji, ensemble and confidence
+        math then runs as NumPy array operations over the batch. Arrays are
+        far cheaper to pass between processes than result dictionaries.
+        
+        Args:
+            texts (list): List of text inputs to analyze
+            
+        Returns:
+            dict: Score arrays (one entry per text) and the key terms per text
+        """
+        # Stages are timed once per batch and only recorded when metrics are enabled
+        timings = {} if self.metrics.enabled else None
+        started = time.perf_counter()
+        
+        # Preprocess texts (see _preprocess_text), one stage at a time
+        tokenized = [self._tokenize_text(text) for text in texts]
+        tokenized_at = time.perf_counter()
+        normalize_token = self._normalize_token
+        lemmas = [[lemma for token in tokens for lemma in normalize_token(token)] for tokens, _ in tokenized]
+        preprocessed_texts = [' '.join(text_lemmas) for text_lemmas in lemmas]
+        emoji_scores = np.array([emoji_score for _, emoji_score in tokenized], dtype=np.int64)
+        lemmatized_at = time.perf_counter()
+        
+        # Weighted lexicon hits and the first key terms per text, for the
+        # whole batch at once
+        positive_counts, negative_counts, key_terms = self.lexicon_index.match(lemmas)
+        lexicon_at = time.perf_counter()
+        
+        # One vectorizer transform and one forest pass for the whole batch;
+        # the predicted class is the argmax of the probabilities, exactly
+        # what RandomForestClassifier.predict does internally
+        if self.engine is not None:
+            ml_predictions, ml_probabilities = self.engine.predict(preprocessed_texts, timings)
+        else:
+            features = self.pipeline[:-1].transform(preprocessed_texts)
+            vectorized_at = time.perf_counter()
+            ml_probabilities = self.pipeline[-1].predict_proba(features)
+            ml_predictions = self.pipeline.classes_.take(np.argmax(ml_probabilities, axis=1))
+            if timings is not None:
+                timings['vectorize'] = vectorized_at - lexicon_at
+                timings['inference'] = time.perf_counter() - vectorized_at
+        inferred_at = time.perf_counter()
+        
+        # Lexicon score between -1 and 1 (see _lexicon_based_score)
+        total_sentiment_words = positive_counts + negative_counts
+        lexicon_scores = (positive_counts - negative_counts) / np.maximum(1, total_sentiment_words)
         
         # Combine models with adjusted weights (ML model: 0.5, lexicon: 0.3, emoji: 0.2)
         # Convert lexicon score from [-1,1] to [0,2] for compatibility
-        lexicon_adjusted = (lexicon_score + 1)  # Now [0,2]
+        lexicon_adjusted = lexicon_scores + 1
         
         # Normalize emoji score
-        emoji_adjusted = 1.0  # Default neutral
-        if emoji_score > 0:
-            emoji_adjusted = min(2.0, 1.0 + emoji_score / 3.0)  # Scale positive
-        elif emoji_score < 0:
-            emoji_adjusted = max(0.0, 1.0 + emoji_score / 3.0)  # Scale negative
-        
-        # Assign weights based on presence of each signal
-        ml_weight = 0.5
-        lexicon_weight = 0.3 if lexicon_score != 0 else 0.1
-        emoji_weight = 0.2 if emoji_score != 0 else 0.0
-        
-        # Normalize weights to sum to 1.0
-        total_weight = ml_weight + lexicon_weight + emoji_weight
-        ml_weight = ml_weight / total_weight
-        lexicon_weight = lexicon_weight / total_weight
-        emoji_weight = emoji_weight / total_weight
-        
-        # Calculate ensemble score
-        ensemble_score = (
-            ml_weight * ml_prediction +
-            lexicon_weight * lexicon_adjusted +
-            emoji_weight * emoji_adjusted
+        emoji_adjusted = np.where(
+            emoji_scores > 0,
+            np.minimum(2.0, 1.0 + emoji_scores / 3.0),
+            np.where(emoji_scores < 0, np.maximum(0.0, 1.0 + emoji_scores / 3.0), 1.0)
         )
         
-        # Map ensemble score to sentiment label with adjusted thresholds
-        if ensemble_score < 0.8:  # More stringent threshold for negative
-            ensemble_sentiment = "negative"
-        elif ensemble_score > 1.2:  # More lenient threshold for positive
-            ensemble_sentiment = "positive"
-        else:
-            ensemble_sentiment = "neutral"
-        
-        # Calculate confidence
-        # Highest probability from ML model combined with agreement certainty
-        ml_confidence = max(ml_probabilities)
-        
-        # Agreement factor: how much the different methods agree
-        methods = []
-        if ml_prediction == 0: methods.append("negative")
-        elif ml_prediction == 1: methods.append("neutral")
-        else: methods.append("positive")
+        # Assign weights based on presence of each signal, then normalize to sum to 1.0
+        lexicon_weights = np.where(lexicon_scores != 0, 0.3, 0.1)
+        emoji_weights = np.where(emoji_scores != 0, 0.2, 0.0)
+        total_weights = 0.5 + lexicon_weights + emoji_weights
+        ml_weights = 0.5 / total_weights
+        lexicon_weights = lexicon_weights / total_weights
+        emoji_weights = emoji_weights / total_weights
         
-        if lexicon_score < -0.2: methods.append("negative")
-        elif lexicon_score > 0.2: methods.append("positive")
-        else: methods.append("neutral")
+        ml_contributions = ml_weights * ml_predictions
+        lexicon_contributions = lexicon_weights * lexicon_adjusted
+        emoji_contributions = emoji_weights * emoji_adjusted
+        ensemble_scores = ml_contributions + lexicon_contributions + emoji_contributions
         
-        if emoji_score < -1: methods.append("negative")
-        elif emoji_score > 1: methods.append("positive")
-        elif emoji_score != 0: methods.append("neutral")
+        # Map ensemble score to sentiment label with adjusted thresholds
+        # (< 0.8 negative, > 1.2 positive, neutral otherwise)
+        ensemble_labels = np.where(ensemble_scores < 0.8, 0, np.where(ensemble_scores > 1.2, 2, 1))
         
-        agreement = len(set(methods))  # 1 means complete agreement, 3 means complete disagreement
-        agreement_factor = 1.0 - ((agreement - 1) / 2.0)  # Scale to 0.0-1.0
+        # Agreement factor: how many distinct labels the ML model, lexicon and
+        # emoji signals vote for (emoji only votes when present)
+        votes = np.zeros((len(texts), 3), dtype=bool)
+        rows = np.arange(len(texts))
+        votes[rows, ml_predictions] = True
+        votes[rows, np.where(lexicon_scores < -0.2, 0, np.where(lexicon_scores > 0.2, 2, 1))] = True
+        has_emoji = emoji_scores != 0
+        votes[rows[has_emoji], np.where(emoji_scores < -1, 0, np.where(emoji_scores > 1, 2, 1))[has_emoji]] = True
+        agreement = votes.sum(axis=1)  # 1 means complete agreement, 3 means complete disagreement
+        agreement_factors = 1.0 - ((agreement - 1) / 2.0)  # Scale to 0.0-1.0
         
         # Combine ML confidence with agreement factor
-        confidence = (ml_confidence * 0.7) + (agreement_factor * 0.3)
-        
-        # Extract key terms that influenced the sentiment
-        words = preprocessed_text.split()
-        positive_terms = [word for word in words if word in self.positive_words]
-        negative_terms = [word for word in words if word in self.negative_words]
-        
-        # Add debug info to help understand the classification
-        debug_info = {
-            "ml_prediction": sentiment_labels[ml_prediction],
-            "ml_probabilities": {
-                "positive": round(ml_probabilities[2], 2),
-                "neutral": round(ml_probabilities[1], 2),
-                "negative": round(ml_probabilities[0], 2)
-            },
-            "lexicon_score": round(lexicon_score, 2),
-            "emoji_score": emoji_score,
-            "ensemble_components": {
-                "ml_contribution": round(ml_weight * ml_prediction, 2),
-                "lexicon_contribution": round(lexicon_weight * lexicon_adjusted, 2),
-                "emoji_contribution": round(emoji_weight * emoji_adjusted, 2)
-            },
-            "ensemble_score": round(ensemble_score, 2),
-            "agreement_factor": round(agreement_factor, 2)
-        }
+        confidences = (ml_probabilities.max(axis=1) * 0.7) + (agreement_factors * 0.3)
+        
+        if timings is not None:
+            timings['tokenize'] = tokenized_at - started
+            timings['lemmatize'] = lemmatized_at - tokenized_at
+            timings['lexicon'] = lexicon_at - lemmatized_at
+            timings['ensemble'] = time.perf_counter() - inferred_at
+            self.metrics.observe_stages(timings)
         
         return {
-            "original_text": text,
-            "sentiment": ensemble_sentiment,
-            "confidence": round(confidence, 2),
-            "sentiment_scores": {
-                "positive": round(ml_probabilities[2], 2),
-                "neutral": round(ml_probabilities[1], 2),
-                "negative": round(ml_probabilities[0], 2)
-            },
-            "key_terms": {
-                "positive": positive_terms[:5],
-                "negative": negative_terms[:5]
-            },
-            "debug": debug_info
+            "ml_probabilities": ml_probabilities,
+            "ml_predictions": ml_predictions,
+            "lexicon_scores": lexicon_scores,
+            "total_sentiment_words": total_sentiment_words,
+            "emoji_scores": emoji_scores,
+            "ml_contributions": ml_contributions,
+            "lexicon_contributions": lexicon_contributions,
+            "emoji_contributions": emoji_contributions,
+            "ensemble_scores": ensemble_scores,
+            "ensemble_labels": ensemble_labels,
+            "agreement_factors": agreement_factors,
+            "confidences": confidences,
+            "key_terms": key_terms
         }
-
-    def batch_analyze(self, texts):
+    
+    def _build_results(self, texts, scores):
         """
-        Analyze sentiment for a batch of texts.
+        Build the result dictionaries from the arrays of _score_columns.
         
         Args:
-            texts (list): List of text inputs to analyze
+            texts (list): Texts the scores were computed for
+            scores (dict): Output of _score_columns
             
         Returns:
             list: List of sentiment analysis results
         """
-        return [self.analyze_sentiment(text) for text in texts]
+        started = time.perf_counter()
+        ml_probabilities = scores["ml_probabilities"]
+        ml_predictions = scores["ml_predictions"]
+        lexicon_scores = scores["lexicon_scores"]
+        total_sentiment_words = scores["total_sentiment_words"]
+        emoji_scores = scores["emoji_scores"]
+        ml_contributions = scores["ml_contributions"]
+        lexicon_contributions = scores["lexicon_contributions"]
+        emoji_contributions = scores["emoji_contributions"]
+        ensemble_scores = scores["ensemble_scores"]
+        ensemble_labels = scores["ensemble_labels"]
+        agreement_factors = scores["agreement_factors"]
+        confidences = scores["confidences"]
+        key_terms = scores["key_terms"]
+        
+        results = []
+        for i, text in enumerate(texts):
+            probabilities = ml_probabilities[i]
+            sentiment_scores = {
+                "positive": round(probabilities[2], 2),
+                "neutral": round(probabilities[1], 2),
+                "negative": round(probabilities[0], 2)
+            }
+            # Only the ML-derived values are NumPy scalars; the lexicon, emoji
+            # and agreement values stay plain Python numbers as they always have
+            lexicon_score = float(lexicon_scores[i]) if total_sentiment_words[i] else 0
+            
+            # Add debug info to help understand the classification
+            debug_info = {
+                "ml_prediction": SENTIMENT_LABELS[ml_predictions[i]],
+                "ml_probabilities": dict(sentiment_scores),
+                "lexicon_score": round(lexicon_score, 2),
+                "emoji_score": int(emoji_scores[i]),
+                "ensemble_components": {
+                    "ml_contribution": round(ml_contributions[i], 2),
+                    "lexicon_contribution": round(float(lexicon_contributions[i]), 2),
+                    "emoji_contribution": round(float(emoji_contributions[i]), 2)
+                },
+                "ensemble_score": round(ensemble_scores[i], 2),
+                "agreement_factor": round(float(agreement_factors[i]), 2)
+            }
+            
+            positive_terms, negative_terms = key_terms[i]
+            results.append({
+                "original_text": text,
+                "sentiment": SENTIMENT_LABELS[ensemble_labels[i]],
+                "confidence": round(confidences[i], 2),
+                "sentiment_scores": sentiment_scores,
+                "key_terms": {
+                    "positive": positive_terms,
+                    "negative": negative_terms
+                },
+                "debug": debug_info
+            })
+        
+        self.metrics.observe_stage('results', time.perf_counter() - started)
+        return results
 
     def get_sentiment_statistics(self, analysis_results):
         """
@@ -470,70 +924,305 @@ class BlockchainVotingSentimentAnalyzer:
         Returns:
             dict: Statistics about the sentiment distribution
         """
-        sentiments = [result["sentiment"] for result in analysis_results]
-        sentiment_counts = Counter(sentiments)
-        total = len(sentiments)
-        
-        statistics = {
-            "total_analyzed": total,
-            "sentiment_distribution": {
-                "positive": {
-                    "count": sentiment_counts.get("positive", 0),
-                    "percentage": round(sentiment_counts.get("positive", 0) / total * 100 if total else 0, 1)
-                },
-                "neutral": {
-                    "count": sentiment_counts.get("neutral", 0),
-                    "percentage": round(sentiment_counts.get("neutral", 0) / total * 100 if total else 0, 1)
-                },
-                "negative": {
-                    "count": sentiment_counts.get("negative", 0),
-                    "percentage": round(sentiment_counts.get("negative", 0) / total * 100 if total else 0, 1)
-                }
-            }
-        }
-        
-        # Add overall sentiment score (weighted average)
-        sentiment_values = {"positive": 1, "neutral": 0, "negative": -1}
-        weighted_sum = sum(sentiment_values[s] for s in sentiments)
-        statistics["overall_sentiment_score"] = round(weighted_sum / total if total else 0, 2)
-        
-        # Calculate average confidence score
-        avg_confidence = sum(result["confidence"] for result in analysis_results) / total if total else 0
-        statistics["average_confidence"] = round(avg_confidence, 2)
-        
-        # Add most common positive and negative terms
-        positive_terms = []
-        negative_terms = []
-        for result in analysis_results:
-            positive_terms.extend(result["key_terms"]["positive"])
-            negative_terms.extend(result["key_terms"]["negative"])
-        
-        statistics["most_common_terms"] = {
-            "positive": [term for term, _ in Counter(positive_terms).most_common(10)],
-            "negative": [term for term, _ in Counter(negative_terms).most_common(10)]
-        }
-        
-        return statistics
+        return SentimentStatistics().update(analysis_results).summary()
+
+# Seconds spent importing this module and its serving dependencies
+MODULE_IMPORT_SECONDS = time.perf_counter() - _MODULE_LOAD_STARTED
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Create sentiment analyzer instance
+# Service metrics served on /metrics, shared with the analyzer
+service_metrics = SentimentMetrics(PROFILE_SAMPLE_EVERY) if METRICS_ENABLED else NULL_METRICS
+
+@app.before_request
+def start_request_metrics():
+    """Start timing (and possibly profiling) the request."""
+    if service_metrics.enabled:
+        g.request_started = time.perf_counter()
+        g.request_profiler = service_metrics.start_profile()
+
+def record_request(endpoint, status, started, profiler):
+    """Stop the request's profiler and record its latency and status code."""
+    service_metrics.stop_profile(profiler)
+    service_metrics.observe_request(endpoint, status, time.perf_counter() - started)
+
+@app.after_request
+def note_request_status(response):
+    """
+    Note the status code for record_request_metrics.
+    
+    A streamed response is recorded when the server closes it, once its
+    body has been sent, rather than when the response object is returned.
+    """
+    if response.is_streamed and 'request_started' in g:
+        response.call_on_close(functools.partial(
+            record_request, request.endpoint or 'unknown', response.status_code,
+            g.pop('request_started'), g.pop('request_profiler', None)
+        ))
+    else:
+        g.request_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request_metrics(exc):
+    """
+    Record the request's latency and status code.
+    
+    Runs even when a view raised and no after_request hook did, so the
+    profiler is always stopped and such requests count as 500s.
+    """
+    started = g.pop('request_started', None)
+    if started is not None:
+        record_request(request.endpoint or 'unknown', g.pop('request_status', 500), started,
+                       g.pop('request_profiler', None))
+
+def json_response(payload):
+    """
+    Serialize a response payload, recording the time spent as the 'serialize' stage.
+    
+    The body is JSON, or MessagePack when the Accept header prefers it.
+    
+    Args:
+        payload (dict): JSON-serializable response body
+        
+    Returns:
+        Response: Encoded response
+    """
+    started = time.perf_counter()
+    response = encode_response(payload, negotiate_format(request.accept_mimetypes))
+    service_metrics.observe_stage('serialize', time.perf_counter() - started)
+    return response
+
+def response_options(data):
+    """
+    Read the response shaping options of a request.
+    
+    'fields' and 'layout' are taken from the JSON payload, falling back to
+    the query string (see response_shaping).
+    
+    Args:
+        data (dict): Request JSON payload
+        
+    Returns:
+        tuple: (fields, layout)
+        
+    Raises:
+        ValueError: On an invalid option
+    """
+    data = data if isinstance(data, dict) else {}
+    fields = data.get('fields', request.args.get('fields'))
+    layout = data.get('layout', request.args.get('layout'))
+    return parse_fields(fields), parse_layout(layout)
+
+# Sentiment analyzer instance, loaded from the published model artifact at
+# startup. The server never trains a model; use train_sentiment.py for that.
+# The model registry replaces it when a new version is published; request
+# handlers read it once (through get_analyzer) and use that reference until
+# they finish, so a swap never changes the model under a running request.
 analyzer = None
 
-@app.route('/analyze', methods=['POST'])
-def analyze_sentiment():
+# Registry loading, warming and swapping model versions (see load_analyzer)
+model_registry = None
+
+# Serializes loading, so concurrent first requests load the model only once
+_analyzer_lock = threading.RLock()
+
+# Whether new analyzers start a scoring pool; off in a preloading server
+# master until init_worker_process runs in the forked worker
+_parallel_scoring = True
+
+def create_analyzer(model_path=MODEL_DIR, version=None):
     """
-    Flask endpoint to analyze the sentiment of input text.
+    Build a serving analyzer for a published model version.
     
-    Expects a JSON payload with a 'text' field.
+    Args:
+        model_path (str): Versioned model directory (or a legacy pickle file)
+        version (str): Version to load (defaults to CURRENT)
+        
+    Returns:
+        BlockchainVotingSentimentAnalyzer: The loaded analyzer
     """
+    new_analyzer = BlockchainVotingSentimentAnalyzer(load_pretrained=True, model_path=model_path,
+                                                     metrics=service_metrics, version=version)
+    if SCORING_PROCESSES > 1 and _parallel_scoring:
+        new_analyzer.enable_parallel_scoring(SCORING_PROCESSES)
+    return new_analyzer
+
+def set_analyzer(new_analyzer):
+    """Make an analyzer the one served by the API (called by the model registry)."""
     global analyzer
+    analyzer = new_analyzer
+
+def load_analyzer(model_path=MODEL_DIR, watch=True, parallel=True):
+    """
+    Load the published model artifact into the global analyzer.
+    
+    When model_path is a model directory, its CURRENT pointer is watched and
+    newly published versions are hot-swapped in (see MODEL_WATCH_SECONDS).
+    A model directory with nothing published yet starts from the legacy
+    voting_sentiment_model.pkl.
+    
+    Args:
+        model_path (str): Versioned model directory (or a legacy pickle file)
+        watch (bool): Whether to watch the model directory for new versions
+        parallel (bool): Whether to start the scoring pool (a preloading
+            server master leaves it to init_worker_process, so it forks its
+            workers without the pool's threads)
+        
+    Returns:
+        BlockchainVotingSentimentAnalyzer: The loaded analyzer
+    """
+    global model_registry, _parallel_scoring
+    with _analyzer_lock:
+        _parallel_scoring = parallel
+        if model_registry is not None:
+            model_registry.stop()
+        
+        if not os.path.isfile(model_path):
+            # First start of a fresh deploy: serve the checked-in legacy model
+            migrate_legacy_model(model_path)
+        model_dir = model_path if os.path.isdir(model_path) else None
+        model_registry = ModelRegistry(
+            functools.partial(create_analyzer, model_path),
+            model_dir=model_dir,
+            on_swap=set_analyzer,
+            poll_seconds=MODEL_WATCH_SECONDS
+        )
+        model_registry.load()
+        if watch and model_dir is not None and MODEL_WATCH_SECONDS > 0:
+            model_registry.start_watching()
+        return analyzer
+
+def init_worker_process():
+    """
+    Prepare a server worker forked after the analyzer was loaded (see wsgi.py).
+    
+    Threads and process pools do not survive fork, so the scoring pool is
+    started and the model directory watched from inside the worker. The
+    model itself is inherited and shared with the other workers copy-on-write.
+    With SHARED_STATE_DIR set, the worker then starts publishing its metrics
+    and statistics for the other workers (see worker_state.py).
+    
+    The pool starts first, while the worker is still single-threaded, so its
+    processes are forked and share the inherited model too (see
+    parallel_scoring.default_start_method).
+    """
+    global worker_state, _parallel_scoring
+    with _analyzer_lock:
+        _parallel_scoring = True
+        if analyzer is not None and SCORING_PROCESSES > 1:
+            # An inherited pool belongs to the parent; start this worker's own
+            analyzer.parallel_scorer = None
+            analyzer.enable_parallel_scoring(SCORING_PROCESSES)
+        if model_registry is not None and MODEL_WATCH_SECONDS > 0:
+            model_registry.start_watching()
+    if SHARED_STATE_DIR:
+        worker_state = WorkerStatePublisher(SHARED_STATE_DIR, collect_worker_state, SHARED_STATE_SECONDS)
+        worker_state.start()
+
+def score_queued_texts(texts):
+    """
+    Score a micro-batch of queued /analyze texts with the current analyzer.
     
-    # Initialize analyzer if not already done
+    Returns:
+        list: (result, model version) per text
+    """
+    scoring_analyzer = get_analyzer()
+    return [(result, scoring_analyzer.model_version) for result in scoring_analyzer.batch_analyze(texts)]
+
+# Scheduler batching concurrent /analyze requests (None when disabled)
+analysis_scheduler = MicroBatchScheduler(
+    score_queued_texts,
+    max_batch_size=MICROBATCH_MAX_SIZE,
+    max_wait_ms=MICROBATCH_WAIT_MS,
+    max_queue_depth=MICROBATCH_QUEUE_DEPTH,
+    metrics=service_metrics
+) if MICROBATCH_ENABLED else None
+
+def get_analyzer():
+    """
+    Return the serving analyzer, loading (never training) it if startup did not.
+    
+    Returns:
+        BlockchainVotingSentimentAnalyzer: The analyzer, or None if no model is published
+    """
     if analyzer is None:
-        analyzer = BlockchainVotingSentimentAnalyzer(load_pretrained=False)
+        with _analyzer_lock:
+            # Checked again under the lock: concurrent first requests wait for
+            # the load started by the first one instead of loading again
+            if analyzer is None:
+                try:
+                    load_analyzer()
+                except FileNotFoundError as e:
+                    print(f"Sentiment model unavailable: {e}")
+                    return None
+    return analyzer
+
+# Live sentiment rollups served by /statistics. Every result returned by the
+# analysis endpoints is recorded unless the request sets "record": false
+# (e.g. dashboards re-querying texts that were already counted).
+sentiment_statistics = StatisticsAggregator()
+
+# Publishes this worker's metrics and statistics to SHARED_STATE_DIR (started
+# by init_worker_process)
+worker_state = None
+
+def collect_worker_state():
+    """This process's metrics and statistics, as shared with the other workers."""
+    return {
+        'metrics': service_metrics.to_dict(analyzer, analysis_scheduler),
+        'statistics': sentiment_statistics.to_dict()
+    }
+
+def shutdown_worker_process():
+    """Publish a worker's final metrics and statistics before it exits."""
+    if worker_state is not None:
+        worker_state.stop()
+
+def all_worker_statistics():
+    """
+    Live statistics of every server worker.
+    
+    Returns:
+        tuple: (StatisticsAggregator, number of running workers covered); only
+            this process's own statistics when SHARED_STATE_DIR is not set
+    """
+    if worker_state is None:
+        return sentiment_statistics, 1
+    combined = StatisticsAggregator()
+    states = worker_state.states()
+    for _, state in states:
+        combined.merge(StatisticsAggregator.from_dict(state['statistics']))
+    return combined, sum(worker is not None for worker, _ in states)
+
+def record_statistics(results, options):
+    """
+    Record analysis results in the live rollups.
+    
+    Args:
+        results (list): Sentiment analysis results returned to the client
+        options (dict): Request options; honours 'topic' and 'record'
+    """
+    if options.get('record', True) in (False, 'false', '0'):
+        return
+    topic = options.get('topic')
+    sentiment_statistics.record(results, topic=topic if isinstance(topic, str) and topic else None)
+
+@app.route('/analyze', methods=['POST'])
+def analyze_sentiment():
+    """
+    Flask endpoint to analyze the sentiment of input text.
+    
+    Expects a JSON payload with a 'text' field, and optionally a 'topic'
+    the result is counted under in /statistics and 'fields' selecting the
+    result fields returned. Concurrent requests are scored together in
+    micro-batches; a full queue answers 429.
+    """
+    sentiment_analyzer = get_analyzer()
+    if sentiment_analyzer is None:
+        return jsonify({'error': 'Sentiment model is not available. Publish one with train_sentiment.py.'}), 503
     
     data = request.json
     
@@ -544,21 +1233,188 @@ def analyze_sentiment():
     if not text or not isinstance(text, str):
         return jsonify({'error': 'Invalid text input. Please provide a non-empty string.'}), 400
     
-    result = analyzer.analyze_sentiment(text)
-    return jsonify(result)
+    try:
+        fields, _ = response_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if analysis_scheduler is None:
+        result = sentiment_analyzer.analyze_sentiment(text)
+        model_version = sentiment_analyzer.model_version
+    else:
+        try:
+            result, model_version = analysis_scheduler.analyze(text)
+        except QueueFullError:
+            return jsonify({'error': 'Too many pending requests. Please retry shortly.'}), 429, {'Retry-After': '1'}
+        except SchedulerUnavailableError as e:
+            return jsonify({'error': f'Sentiment analysis is temporarily unavailable: {e}'}), 503
+    record_statistics([result], data)
+    return json_response(dict(select_fields(result, fields), model_version=model_version))
 
 @app.route('/batch-analyze', methods=['POST'])
 def batch_analyze_sentiment():
     """
     Flask endpoint to analyze sentiment for multiple texts.
     
-    Expects a JSON payload with a 'texts' field containing an array of strings.
+    Expects a JSON payload with a 'texts' field containing an array of strings,
+    and optionally a 'topic' the results are counted under in /statistics.
+    'fields' and 'layout' shape the returned results (see response_shaping),
+    and an Accept header preferring application/msgpack returns MessagePack.
     """
-    global analyzer
+    sentiment_analyzer = get_analyzer()
+    if sentiment_analyzer is None:
+        return jsonify({'error': 'Sentiment model is not available. Publish one with train_sentiment.py.'}), 503
     
-    # Initialize analyzer if not already done
-    if analyzer is None:
-        analyzer = BlockchainVotingSentimentAnalyzer(load_pretrained=False)
+    data = request.json
+    
+    if not data or 'texts' not in data:
+        return jsonify({'error': 'Missing texts input. Please provide a JSON payload with a "texts" field.'}), 400
+    
+    texts = data['texts']
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({'error': 'Invalid texts input. Please provide an array of strings.'}), 400
+    
+    try:
+        fields, layout = response_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    results = sentiment_analyzer.batch_analyze(texts)
+    stats = sentiment_analyzer.get_sentiment_statistics(results)
+    record_statistics(results, data)
+    
+    return json_response({
+        'results': shape_results(results, fields, layout),
+        'statistics': stats,
+        'model_version': sentiment_analyzer.model_version
+    })
+
+@app.route('/batch-analyze/stream', methods=['POST'])
+def stream_batch_analyze_sentiment():
+    """
+    Flask endpoint to analyze a stream of texts as newline-delimited JSON.
+    
+    Each request line is either a JSON string or an object with a 'text'
+    field (and an optional 'id' echoed back). The body may be sent with
+    chunked transfer encoding. Texts are scored in fixed-size chunks and the
+    results are streamed back one JSON object per line; the final line
+    carries the statistics for the whole stream. Lines that cannot be
+    parsed produce an error line instead of a result. The 'topic' and
+    'record' query parameters control how results count in /statistics;
+    the 'fields' query parameter selects the result fields returned.
+    """
+    sentiment_analyzer = get_analyzer()
+    if sentiment_analyzer is None:
+        return jsonify({'error': 'Sentiment model is not available. Publish one with train_sentiment.py.'}), 503
+    
+    chunk_size = request.args.get('chunk_size', STREAM_CHUNK_SIZE, type=int)
+    if chunk_size is None or chunk_size < 1:
+        return jsonify({'error': 'Invalid chunk_size. Please provide a positive integer.'}), 400
+    
+    options = request.args.to_dict()
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def score_chunk(chunk, tally):
+        texts = [item['text'] for item in chunk if 'text' in item]
+        results = sentiment_analyzer.batch_analyze(texts)
+        record_statistics(results, options)
+        results = iter(results)
+        for item in chunk:
+            if 'text' not in item:
+                yield json.dumps(item) + '\n'
+                continue
+            result = next(results)
+            tally.add(result)
+            result = select_fields(result, fields)
+            if 'id' in item:
+                result = dict(result, id=item['id'])
+            yield json.dumps(result) + '\n'
+    
+    def generate():
+        tally = SentimentStatistics()
+        chunk = []
+        for line_number, line in enumerate(request.stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = {'line': line_number, 'error': 'Invalid JSON line.'}
+            else:
+                if isinstance(item, str):
+                    item = {'text': item}
+                elif not isinstance(item, dict) or not isinstance(item.get('text'), str):
+                    item = {'line': line_number, 'error': 'Each line must be a string or an object with a "text" string.'}
+                elif 'id' in item:
+                    item = {'text': item['text'], 'id': item['id']}
+                else:
+                    item = {'text': item['text']}
+            
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield from score_chunk(chunk, tally)
+                chunk = []
+        
+        if chunk:
+            yield from score_chunk(chunk, tally)
+        yield json.dumps({'statistics': tally.summary(), 'model_version': sentiment_analyzer.model_version}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Batch job manager behind /jobs, created on first use (see get_job_manager)
+job_manager = None
+_job_manager_lock = threading.Lock()
+
+def interactive_requests_waiting():
+    """Whether /analyze requests are queued for scoring; batch jobs pause while they are."""
+    return analysis_scheduler is not None and analysis_scheduler.stats()["queue_depth"] > 0
+
+def get_job_manager():
+    """
+    Return the batch job manager, opening its store on first use.
+    
+    Returns:
+        BatchJobManager: The manager
+    """
+    global job_manager
+    with _job_manager_lock:
+        if job_manager is None:
+            job_manager = BatchJobManager(
+                get_analyzer,
+                store=JobStore(JOB_DB),
+                workers=JOB_WORKERS,
+                jobs_per_client=JOBS_PER_CLIENT,
+                interactive_waiting=interactive_requests_waiting,
+                on_results=record_statistics
+            )
+    return job_manager
+
+def client_id():
+    """
+    Identify the client of a request for batch job limits and visibility.
+    
+    The API has no authentication, so this is the remote address, which a
+    client cannot choose (unlike a request header). Behind a reverse proxy,
+    wrap the app in werkzeug's ProxyFix so it is the client's, not the proxy's.
+    """
+    return request.remote_addr or 'unknown'
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Flask endpoint to submit an asynchronous batch job.
+    
+    Expects the same JSON payload as /batch-analyze. Answers 202 with the
+    job id at once; poll /jobs/<job_id> for progress and page through
+    /jobs/<job_id>/results. A client with too many jobs in progress gets 429.
+    """
+    if get_analyzer() is None:
+        return jsonify({'error': 'Sentiment model is not available. Publish one with train_sentiment.py.'}), 503
     
     data = request.json
     
@@ -568,19 +1424,177 @@ def batch_analyze_sentiment():
     texts = data['texts']
     if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
         return jsonify({'error': 'Invalid texts input. Please provide an array of strings.'}), 400
+    if len(texts) > JOB_MAX_TEXTS:
+        return jsonify({'error': f'Too many texts. A job may hold at most {JOB_MAX_TEXTS}.'}), 413
+    
+    options = {key: data[key] for key in ('topic', 'record') if key in data}
+    try:
+        status = get_job_manager().submit(client_id(), texts, options)
+    except JobLimitError as e:
+        return jsonify({'error': f'{e}. Please retry once a job has finished.'}), 429, {'Retry-After': '5'}
+    
+    job_id = status['job_id']
+    status['status_url'] = f'/jobs/{job_id}'
+    status['results_url'] = f'/jobs/{job_id}/results'
+    return jsonify(status), 202, {'Location': status['status_url']}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Flask endpoint reporting a batch job's status, progress and (once completed) statistics."""
+    try:
+        return json_response(get_job_manager().status(job_id, client_id()))
+    except JobNotFoundError:
+        return jsonify({'error': f'No job {job_id}. Jobs expire and are only visible to the client that submitted them.'}), 404
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """
+    Flask endpoint returning a page of a batch job's results.
+    
+    The 'offset' and 'limit' query parameters select the page; while the job
+    is running, the results scored so far are available. 'fields' and
+    'layout' shape the results as for /batch-analyze.
+    """
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    if offset is None or offset < 0 or limit is None or not 0 < limit <= JOB_RESULTS_PAGE_LIMIT:
+        return jsonify({'error': f'Invalid page. Use offset >= 0 and 0 < limit <= {JOB_RESULTS_PAGE_LIMIT}.'}), 400
+    try:
+        fields, layout = response_options(None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        status, results = get_job_manager().results(job_id, client_id(), offset, limit)
+    except JobNotFoundError:
+        return jsonify({'error': f'No job {job_id}. Jobs expire and are only visible to the client that submitted them.'}), 404
+    
+    next_offset = offset + len(results)
+    return json_response({
+        'job_id': job_id,
+        'status': status['status'],
+        'total': status['total'],
+        'offset': offset,
+        'results': shape_results(results, fields, layout),
+        'next_offset': next_offset if next_offset < status['total'] else None
+    })
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Flask endpoint cancelling a batch job and deleting it with its results."""
+    try:
+        get_job_manager().cancel(job_id, client_id())
+    except JobNotFoundError:
+        return jsonify({'error': f'No job {job_id}. Jobs expire and are only visible to the client that submitted them.'}), 404
+    return jsonify({'job_id': job_id, 'status': 'deleted'})
+
+@app.route('/statistics', methods=['GET'])
+def get_statistics():
+    """
+    Flask endpoint serving the live sentiment statistics.
+    
+    Optional query parameters: 'topic' to restrict to one topic and 'window'
+    (one of 5m, 1h, 1d) to restrict to recent results. Nothing is rescored.
+    Under gunicorn the statistics cover every worker, each as of its last
+    publication (at most SHARED_STATE_SECONDS old); 'workers' says how many.
+    """
+    topic = request.args.get('topic')
+    window = request.args.get('window')
+    if window is not None and window not in WINDOWS:
+        return jsonify({'error': f'Invalid window. Please use one of: {", ".join(WINDOWS)}.'}), 400
     
-    results = analyzer.batch_analyze(texts)
-    stats = analyzer.get_sentiment_statistics(results)
+    statistics, workers = all_worker_statistics()
+    stats = statistics.snapshot(topic=topic, window=window)
+    if stats is None:
+        return jsonify({'error': f'No statistics recorded for topic {topic}'}), 404
     
     return jsonify({
-        'results': results,
-        'statistics': stats
+        'topic': topic,
+        'window': window,
+        'statistics': stats,
+        'topics': statistics.topic_names(),
+        'workers': workers
     })
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Simple health check endpoint."""
-    return jsonify({'status': 'ok', 'service': 'Blockchain Voting Sentiment Analyzer API'})
+    response = {'status': 'ok', 'service': 'Blockchain Voting Sentiment Analyzer API'}
+    if analyzer is not None:
+        response['model_version'] = analyzer.model_version
+        response['startup_seconds'] = dict(analyzer.startup_timings, module_import=MODULE_IMPORT_SECONDS)
+        if analyzer.result_cache is not None:
+            response['cache'] = analyzer.result_cache.stats()
+    if model_registry is not None:
+        response['model_registry'] = model_registry.status()
+    if analysis_scheduler is not None:
+        response['microbatch'] = analysis_scheduler.stats()
+    return jsonify(response)
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """
+    Admin endpoint to load a model version in the background and swap it in.
+    
+    Requires the X-Admin-Token header to match SENTIMENT_ADMIN_TOKEN. Accepts
+    an optional JSON payload with a 'version' field (defaults to the version
+    CURRENT points at). Returns 202 while the load runs; /health reports the
+    outcome under 'model_registry'.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled. Set SENTIMENT_ADMIN_TOKEN to enable them.'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Invalid admin token.'}), 401
+    if model_registry is None:
+        return jsonify({'error': 'No model has been loaded yet.'}), 503
+    
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if version is not None and (not isinstance(version, str) or not version
+                                or os.path.basename(version) != version or version.startswith('.')):
+        return jsonify({'error': 'Invalid version. Please provide a model version name.'}), 400
+    if model_registry.model_dir is None:
+        return jsonify({'error': 'The served model is a single file; there are no versions to load.'}), 400
+    
+    if not model_registry.reload(version):
+        return jsonify({'error': 'A model load is already in progress.', 'status': model_registry.status()}), 409
+    return jsonify({'status': 'loading', 'version': version or 'CURRENT'}), 202
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus metrics endpoint: stage latencies, request counters, cache and model gauges.
+    
+    Under gunicorn the counters and histograms are summed over every worker
+    (including exited ones) and gauges carry a 'worker' label, each worker
+    as of its last publication (at most SHARED_STATE_SECONDS old).
+    """
+    if not service_metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled (SENTIMENT_METRICS=0).'}), 404
+    if worker_state is not None:
+        registry = MetricsRegistry.merged([(worker, state['metrics']) for worker, state in worker_state.states()])
+        body = registry.render()
+    else:
+        body = service_metrics.render(analyzer, analysis_scheduler)
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/metrics/profile', methods=['GET'])
+def get_profile():
+    """
+    Aggregated cProfile report of the sampled requests.
+    
+    Optional query parameters: 'top' (number of functions) and 'sort'
+    (a pstats sort key, 'cumulative' by default).
+    """
+    if service_metrics.profiler is None:
+        return jsonify({'error': 'Profiling is disabled. Set SENTIMENT_PROFILE_SAMPLE_EVERY to enable it.'}), 404
+    top = request.args.get('top', 40, type=int)
+    sort = request.args.get('sort', 'cumulative')
+    try:
+        report = service_metrics.profiler.report(top=top, sort=sort)
+    except KeyError:
+        return jsonify({'error': f'Invalid sort key: {sort}'}), 400
+    return Response(report, mimetype='text/plain')
 
 def main():
     """
@@ -616,6 +1630,8 @@ def main():
     print(json.dumps(stats, indent=2))
 
 if __name__ == "__main__":
-    # Always run as API server
+    # Always run as API server (the development server; production traffic
+    # is served by gunicorn, see wsgi.py)
     print("Starting Blockchain Voting Sentiment Analyzer API server...")
+    load_analyzer()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Latency and throughput benchmarks for the Sentiment Analysis Model
+
+Generates synthetic voter comments and measures every stage of the analyzer
+(_preprocess_text, _lexicon_based_score, pipeline prediction,
+analyze_sentiment, batch_analyze, get_sentiment_statistics) plus end-to-end
+calls through the Flask test client. Each benchmark reports p50/p95/p99
+latency, throughput and peak traced memory.
+
+    python sentiment_bench.py --output bench.json
+    python sentiment_bench.py --baseline bench.json --max-regression 0.15
+
+With --baseline the run is compared against a saved result file and the
+command exits non-zero if any p50 latency regressed by more than the
+allowed fraction.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from sentiment import BlockchainVotingSentimentAnalyzer, MODEL_DIR, app
+import sentiment
+
+# Filler words mixed into synthetic comments
+FILLER_WORDS = (
+    "the vote blockchain system process my was it and to a of is for with "
+    "election ballot voter booth result count identity verification app"
+).split()
+
+
+def generate_comments(analyzer, count, min_words=4, max_words=40, emoji_density=0.1,
+                      duplicate_rate=0.2, seed=42):
+    """
+    Generate synthetic voter comments.
+
+    Args:
+        analyzer (BlockchainVotingSentimentAnalyzer): Source of the lexicons and sample texts
+        count (int): Number of comments
+        min_words (int): Minimum words per comment
+        max_words (int): Maximum words per comment
+        emoji_density (float): Probability of each word being followed by an emoji
+        duplicate_rate (float): Fraction of comments repeating an earlier comment
+        seed (int): Random seed
+
+    Returns:
+        list: Synthetic comments
+    """
+    rng = random.Random(seed)
+    vocabulary = (
+        FILLER_WORDS
+        + sorted(analyzer.positive_words)
+        + sorted(analyzer.negative_words)
+        + ' '.join(analyzer.sample_data["texts"]).split()
+    )
+    emojis = sorted(analyzer.emoji_sentiment)
+    punctuation = ['', '', '', '!', '?', '.', ',']
+
+    comments = []
+    for _ in range(count):
+        if comments and rng.random() < duplicate_rate:
+            comments.append(rng.choice(comments))
+            continue
+        words = []
+        for _ in range(rng.randint(min_words, max_words)):
+            words.append(rng.choice(vocabulary) + rng.choice(punctuation))
+            if rng.random() < emoji_density:
+                words.append(rng.choice(emojis))
+        comments.append(' '.join(words))
+    return comments
+
+
+def _summarize(latencies, items_per_call, peak_bytes):
+    """Turn raw latencies (seconds) into the reported statistics."""
+    latencies = np.asarray(latencies)
+    total = latencies.sum()
+    return {
+        "calls": len(latencies),
+        "items_per_call": items_per_call,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4),
+        "mean_ms": round(float(latencies.mean()) * 1000, 4),
+        "throughput_items_per_s": round(len(latencies) * items_per_call / total, 2) if total else None,
+        "peak_memory_bytes": peak_bytes
+    }
+
+
+def measure(function, inputs, items_per_call=1, warmup=3):
+    """
+    Benchmark a function over a list of inputs.
+
+    Latencies are measured without tracing; peak memory comes from a second,
+    traced pass over a sample of the inputs so tracing does not skew timings.
+
+    Args:
+        function (callable): Function called with each input
+        inputs (list): Inputs, one per call
+        items_per_call (int): Items processed per call (for throughput)
+        warmup (int): Untimed calls made first
+
+    Returns:
+        dict: Latency percentiles, throughput and peak memory
+    """
+    for value in inputs[:warmup]:
+        function(value)
+
+    gc.collect()
+    gc.disable()
+    try:
+        latencies = []
+        for value in inputs:
+            started = time.perf_counter()
+            function(value)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        for value in inputs[:max(1, min(len(inputs), 20))]:
+            function(value)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return _summarize(latencies, items_per_call, peak_bytes)
+
+
+def run_benchmarks(analyzer, comments, batch_sizes=(1, 100, 1000), use_cache=False):
+    """
+    Run every benchmark.
+
+    Args:
+        analyzer (BlockchainVotingSentimentAnalyzer): Analyzer under test
+        comments (list): Synthetic comments
+        batch_sizes (tuple): Batch sizes for batch_analyze and /batch-analyze
+        use_cache (bool): Keep the result cache enabled (off by default, so
+            repeated comments are scored every time)
+
+    Returns:
+        dict: Results keyed by benchmark name
+    """
+    result_cache = analyzer.result_cache
+    if not use_cache:
+        analyzer.result_cache = None
+
+    # Route the Flask endpoints to the analyzer under test
+    sentiment.set_analyzer(analyzer)
+    client = app.test_client()
+
+    try:
+        preprocessed = [analyzer._preprocess_text(text)[0] for text in comments]
+        results = analyzer.batch_analyze(comments)
+        results_by_size = {size: results[:size] for size in batch_sizes}
+
+        def batches(size):
+            return [comments[i:i + size] for i in range(0, len(comments) - size + 1, size)] or [comments[:size]]
+
+        benchmarks = {
+            "preprocess_text": measure(analyzer._preprocess_text, comments),
+            "lexicon_based_score": measure(analyzer._lexicon_based_score, preprocessed),
+            "analyze_sentiment": measure(analyzer.analyze_sentiment, comments[:1000]),
+        }
+        if analyzer.pipeline is not None:
+            # Not loaded when serving from the compact model format
+            benchmarks["pipeline_predict_proba"] = measure(
+                lambda text: analyzer.pipeline.predict_proba([text]), preprocessed[:500])
+        if analyzer.engine is not None:
+            benchmarks["engine_predict_proba"] = measure(
+                lambda text: analyzer.engine.predict_proba([text]), preprocessed[:500])
+
+        for size in batch_sizes:
+            benchmarks[f"batch_analyze[{size}]"] = measure(
+                analyzer.batch_analyze, batches(size)[:50], items_per_call=size, warmup=1)
+            benchmarks[f"get_sentiment_statistics[{size}]"] = measure(
+                analyzer.get_sentiment_statistics, [results_by_size[size]] * 20, items_per_call=size)
+
+        benchmarks["flask_analyze"] = measure(
+            lambda text: client.post('/analyze', json={'text': text, 'record': False}), comments[:500])
+        for size in batch_sizes:
+            benchmarks[f"flask_batch_analyze[{size}]"] = measure(
+                lambda texts: client.post('/batch-analyze', json={'texts': texts, 'record': False}),
+                batches(size)[:20], items_per_call=size, warmup=1)
+        return benchmarks
+    finally:
+        analyzer.result_cache = result_cache
+
+
+def compare(current, baseline, max_regression):
+    """
+    Compare benchmark results against a baseline.
+
+    Args:
+        current (dict): Benchmarks of this run
+        baseline (dict): Benchmarks of the baseline run
+        max_regression (float): Allowed relative p50 slowdown (0.1 = 10%)
+
+    Returns:
+        tuple: (rows of comparison data, list of regressed benchmark names)
+    """
+    rows = []
+    regressions = []
+    for name, stats in current.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p50_ms"], stats["p50_ms"]
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change))
+        if change > max_regression:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the voting sentiment analyzer.")
+    parser.add_argument('--model-dir', default=MODEL_DIR, help="Model directory to load")
+    parser.add_argument('--train', action='store_true', help="Train in-process instead of loading a model")
+    parser.add_argument('--comments', type=int, default=5000, help="Number of synthetic comments")
+    parser.add_argument('--min-words', type=int, default=4)
+    parser.add_argument('--max-words', type=int, default=40)
+    parser.add_argument('--emoji-density', type=float, default=0.1)
+    parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    parser.add_argument('--batch-sizes', default='1,100,1000', help="Comma-separated batch sizes")
+    parser.add_argument('--cache', action='store_true', help="Keep the result cache enabled")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against a saved JSON result file")
+    parser.add_argument('--max-regression', type=float, default=0.1,
+                        help="Allowed relative p50 slowdown versus the baseline")
+    args = parser.parse_args()
+
+    if args.train:
+        analyzer = BlockchainVotingSentimentAnalyzer(load_pretrained=False)
+    else:
+        analyzer = BlockchainVotingSentimentAnalyzer(load_pretrained=True, model_path=args.model_dir)
+
+    comments = generate_comments(
+        analyzer, args.comments, args.min_words, args.max_words,
+        args.emoji_density, args.duplicate_rate, args.seed
+    )
+    batch_sizes = tuple(int(size) for size in args.batch_sizes.split(','))
+    benchmarks = run_benchmarks(analyzer, comments, batch_sizes, use_cache=args.cache)
+
+    report = {
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "model_version": analyzer.model_version,
+        "compiled_engine": analyzer.engine is not None,
+        "parameters": {
+            "comments": args.comments,
+            "min_words": args.min_words,
+            "max_words": args.max_words,
+            "emoji_density": args.emoji_density,
+            "duplicate_rate": args.duplicate_rate,
+            "batch_sizes": list(batch_sizes),
+            "cache": args.cache,
+            "seed": args.seed
+        },
+        "benchmarks": benchmarks
+    }
+
+    print(f"\n{'benchmark':34} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'items/s':>12} {'peak KiB':>10}")
+    for name, stats in benchmarks.items():
+        print(f"{name:34} {stats['p50_ms']:10.3f} {stats['p95_ms']:10.3f} {stats['p99_ms']:10.3f} "
+              f"{stats['throughput_items_per_s']:12.1f} {stats['peak_memory_bytes'] / 1024:10.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = compare(benchmarks, baseline["benchmarks"], args.max_regression)
+        print(f"\n{'benchmark':34} {'base p50':>10} {'p50':>10} {'change':>8}")
+        for name, before, after, change in rows:
+            print(f"{name:34} {before:10.3f} {after:10.3f} {change:+8.1%}")
+        if regressions:
+            print(f"\np50 regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Result cache for the Sentiment Analysis Model
+
+Voters and seeding scripts submit the same feedback strings over and over.
+This module keeps an LRU cache with a size limit and a TTL in front of the
+analyzer, keyed on a hash of the normalized text plus the model version, so
+repeated texts skip the scoring pipeline entirely.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from sentiment_metrics import NULL_METRICS
+
+
+def normalize_text(text):
+    """
+    Normalize text for cache lookups.
+
+    Runs of whitespace are collapsed and the ends stripped. Preprocessing
+    splits on whitespace anyway, so this never changes the analysis result.
+
+    Args:
+        text (str): Raw input text
+
+    Returns:
+        str: Normalized text
+    """
+    return ' '.join(text.split())
+
+
+def make_cache_key(text, model_version):
+    """
+    Build the cache key for a text scored by a given model version.
+
+    Args:
+        text (str): Raw input text
+        model_version (str): Version of the model producing the result
+
+    Returns:
+        str: Hex digest identifying the (model version, text) pair
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(model_version).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_text(text).encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def copy_result(result):
+    """
+    Copy an analysis result, including its nested dictionaries and lists.
+
+    Results only hold dicts, lists and immutable scalars, so this is a much
+    cheaper equivalent of copy.deepcopy.
+
+    Args:
+        result: Result (or part of one) to copy
+
+    Returns:
+        A copy sharing no mutable containers with the original
+    """
+    if isinstance(result, dict):
+        return {key: copy_result(value) for key, value in result.items()}
+    if isinstance(result, list):
+        return [copy_result(value) for value in result]
+    return result
+
+
+class SentimentResultCache:
+    """
+    Thread-safe LRU cache with a TTL for sentiment analysis results.
+
+    The cache remembers the model version it holds results for; the first
+    access with a different version drops every entry, so a model change
+    invalidates the cache automatically. Results are copied on the way in
+    and on the way out, so callers may modify what they store or receive.
+    Every event is also counted in the service metrics as it happens, so the
+    exported counters keep increasing across model swaps and new caches.
+    """
+
+    def __init__(self, max_size=10000, ttl=300, metrics=None):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size (int): Maximum number of cached results
+            ttl (float): Seconds a result stays valid, or None for no expiry
+            metrics (SentimentMetrics): Metrics counting cache events
+                (defaults to NULL_METRICS)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, model_version):
+        """
+        Drop every entry when the model version changes (lock must be held).
+
+        Returns:
+            bool: Whether entries were dropped
+        """
+        if model_version == self.model_version:
+            return False
+        self.model_version = model_version
+        if not self._entries:
+            return False
+        self.invalidations += 1
+        self._entries.clear()
+        return True
+
+    def get(self, key, model_version):
+        """
+        Look up a cached result.
+
+        Args:
+            key (str): Cache key from make_cache_key
+            model_version (str): Version of the model currently serving
+
+        Returns:
+            dict: Copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            invalidated = self._check_version(model_version)
+            entry = self._entries.get(key)
+            expired = False
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at is not None and expires_at <= time.monotonic():
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                    expired = True
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+        if invalidated:
+            self.metrics.observe_cache_event('invalidations')
+        if expired:
+            self.metrics.observe_cache_event('expirations')
+        if entry is None:
+            self.metrics.observe_cache_event('misses')
+            return None
+        self.metrics.observe_cache_event('hits')
+        return copy_result(result)
+
+    def put(self, key, result, model_version):
+        """
+        Store a result, evicting the least recently used entries if full.
+
+        Args:
+            key (str): Cache key from make_cache_key
+            result (dict): Analysis result (a copy is stored)
+            model_version (str): Version of the model that produced the result
+        """
+        result = copy_result(result)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        evicted = 0
+        with self._lock:
+            invalidated = self._check_version(model_version)
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+
+        if invalidated:
+            self.metrics.observe_cache_event('invalidations')
+        if evicted:
+            self.metrics.observe_cache_event('evictions', evicted)
+
+    def clear(self):
+        """Drop every cached result."""
+        with self._lock:
+            invalidated = bool(self._entries)
+            if invalidated:
+                self.invalidations += 1
+            self._entries.clear()
+        if invalidated:
+            self.metrics.observe_cache_event('invalidations')
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Size, limits, and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "model_version": self.model_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
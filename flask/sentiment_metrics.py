@@ -0,0 +1,600 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Runtime metrics for the Sentiment Analysis API
+
+Collects per-stage scoring latency histograms (tokenize, lemmatize, lexicon,
+vectorize, inference, ensemble, results, serialize), request and batch-size
+counters, micro-batch fill and queueing delay, and cache and model-version
+gauges, and renders them in the
+Prometheus text exposition format served on /metrics.
+
+Stages are timed once per scored batch, never per text, so the hot path only
+pays for a handful of clock reads. With metrics disabled the analyzer and
+the API use NULL_METRICS, whose methods do nothing.
+
+Each process only sees its own metrics. A registry can be serialized with
+to_dict and the snapshots of several server workers combined with
+MetricsRegistry.merged: counters and histograms add up, gauges keep one
+series per worker under a 'worker' label.
+
+ProfileSampler optionally runs one request in every N under cProfile and
+aggregates the samples, to see where a slow stage spends its time.
+"""
+
+import bisect
+import cProfile
+import io
+import itertools
+import pstats
+import threading
+
+# Latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Batch size histogram buckets, in texts
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+# Micro-batch fill ratio buckets (batch size / maximum batch size)
+FILL_RATIO_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+# Scoring stages, in pipeline order
+STAGES = ('tokenize', 'lemmatize', 'lexicon', 'vectorize', 'inference', 'ensemble', 'results', 'serialize')
+
+
+def _escape(value):
+    """Escape a label value for the exposition format."""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    """Render a label set such as {stage="tokenize",le="0.01"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    """Render a sample value; integral floats are printed without a fraction."""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Base class of the metric types: a name, help text and label names."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self):
+        """
+        Render the metric in the Prometheus text format.
+
+        Returns:
+            list: Output lines
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def to_dict(self):
+        """
+        Serialize the metric so another process can merge it (see MetricsRegistry.merged).
+
+        Returns:
+            dict: Name, type, help text, label names and samples
+        """
+        with self._lock:
+            samples = [[list(labels), value] for labels, value in self._values.items()]
+        return {"name": self.name, "type": self.kind, "help": self.documentation,
+                "labelnames": list(self.labelnames), "samples": samples}
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        """
+        Increase the counter.
+
+        Args:
+            *labels: Label values, in labelnames order
+            amount (float): Increment
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        """Current value of a label set."""
+        return self._values.get(labels, 0)
+
+    def merge_dict(self, data, worker=None):
+        """Add the counts of a serialized counter."""
+        for labels, value in data["samples"]:
+            self.inc(*labels, amount=value)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, per label set."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value, *labels):
+        """
+        Set the gauge.
+
+        Args:
+            value (float): New value
+            *labels: Label values, in labelnames order
+        """
+        with self._lock:
+            self._values[labels] = value
+
+    def clear(self):
+        """Drop every label set (e.g. before re-publishing the model version)."""
+        with self._lock:
+            self._values.clear()
+
+    def value(self, *labels):
+        """Current value of a label set."""
+        return self._values.get(labels)
+
+    def merge_dict(self, data, worker=None):
+        """Copy the values of a serialized gauge under a worker label (skipped without one)."""
+        if worker is None:
+            return
+        for labels, value in data["samples"]:
+            self.set(value, *labels, worker)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed cumulative buckets, per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, *labels):
+        """
+        Record an observation.
+
+        Args:
+            value (float): Observed value
+            *labels: Label values, in labelnames order
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        """Number of observations of a label set."""
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def to_dict(self):
+        """Serialize the histogram so another process can merge it."""
+        with self._lock:
+            samples = [[list(labels), list(series[0]), series[1], series[2]]
+                       for labels, series in self._series.items()]
+        return {"name": self.name, "type": self.kind, "help": self.documentation,
+                "labelnames": list(self.labelnames), "buckets": list(self.buckets), "samples": samples}
+
+    def merge_dict(self, data, worker=None):
+        """Add the observations of a serialized histogram with the same buckets."""
+        with self._lock:
+            for labels, counts, total, count in data["samples"]:
+                series = self._series.setdefault(tuple(labels), [[0] * (len(self.buckets) + 1), 0.0, 0])
+                series[0] = [mine + theirs for mine, theirs in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((labels, (list(series[0]), series[1], series[2]))
+                           for labels, series in self._series.items())
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                label_text = _format_labels(self.labelnames, labels, [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{label_text} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Ordered collection of metrics rendered together.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """
+        Add a metric to the registry.
+
+        Args:
+            metric (_Metric): Metric to render
+
+        Returns:
+            _Metric: The metric, for chaining
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format.
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        """
+        Serialize every metric so another process can merge them.
+
+        Returns:
+            list: One dict per metric, in registration order
+        """
+        return [metric.to_dict() for metric in self._metrics]
+
+    @classmethod
+    def merged(cls, snapshots):
+        """
+        Combine the registries of several processes.
+
+        Counters and histograms are summed. Gauges describe a live process,
+        so each worker's values are kept under a 'worker' label, and
+        snapshots without a worker (e.g. of exited workers) contribute none.
+
+        Args:
+            snapshots (list): (worker name or None, to_dict output) pairs
+
+        Returns:
+            MetricsRegistry: Registry holding the combined metrics
+        """
+        registry = cls()
+        metrics = {}
+        for worker, snapshot in snapshots:
+            for data in snapshot:
+                metric = metrics.get(data["name"])
+                if metric is None:
+                    if data["type"] == 'counter':
+                        metric = registry.counter(data["name"], data["help"], data["labelnames"])
+                    elif data["type"] == 'histogram':
+                        metric = registry.histogram(data["name"], data["help"], data["labelnames"],
+                                                    data["buckets"])
+                    else:
+                        metric = registry.gauge(data["name"], data["help"], data["labelnames"] + ['worker'])
+                    metrics[data["name"]] = metric
+                metric.merge_dict(data, worker)
+        return registry
+
+
+class ProfileSampler:
+    """
+    Profiles one call in every sample_every with cProfile and aggregates
+    the samples.
+    """
+
+    def __init__(self, sample_every):
+        """
+        Args:
+            sample_every (int): Profile one call in this many
+        """
+        self.sample_every = sample_every
+        self.samples = 0
+        self._calls = itertools.count(1)
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start profiling the current call if it is sampled.
+
+        Returns:
+            cProfile.Profile: The running profiler, or None if this call is not sampled
+        """
+        if next(self._calls) % self.sample_every:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (a concurrent sampled call)
+            return None
+        return profiler
+
+    def stop(self, profiler):
+        """
+        Stop a profiler returned by start and add its samples to the aggregate.
+
+        Args:
+            profiler (cProfile.Profile): Profiler returned by start (None is ignored)
+        """
+        if profiler is None:
+            return
+        profiler.disable()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profiler)
+            else:
+                self._stats.add(profiler)
+            self.samples += 1
+
+    def report(self, top=40, sort='cumulative'):
+        """
+        Render the aggregated profile.
+
+        Args:
+            top (int): Number of functions to list
+            sort (str): pstats sort key
+
+        Returns:
+            str: Profile report
+        """
+        with self._lock:
+            if self._stats is None:
+                return "No calls profiled yet.\n"
+            stream = io.StringIO()
+            self._stats.stream = stream
+            stream.write(f"{self.samples} sampled calls (1 in {self.sample_every})\n")
+            self._stats.sort_stats(sort).print_stats(top)
+            return stream.getvalue()
+
+    def reset(self):
+        """Drop the aggregated samples."""
+        with self._lock:
+            self._stats = None
+            self.samples = 0
+
+
+class SentimentMetrics:
+    """
+    Metrics of the sentiment service.
+    """
+
+    enabled = True
+
+    def __init__(self, profile_every=0):
+        """
+        Create the metrics.
+
+        Args:
+            profile_every (int): Profile one request in this many (0 disables profiling)
+        """
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter(
+            'sentiment_requests_total', 'HTTP requests handled, by endpoint and status code',
+            ('endpoint', 'status'))
+        self.request_seconds = self.registry.histogram(
+            'sentiment_request_seconds', 'HTTP request latency, by endpoint', ('endpoint',))
+        self.stage_seconds = self.registry.histogram(
+            'sentiment_stage_seconds', 'Time spent in each scoring stage per batch', ('stage',))
+        self.batch_texts = self.registry.histogram(
+            'sentiment_batch_texts', 'Texts per analyzed batch', buckets=BATCH_SIZE_BUCKETS)
+        self.texts = self.registry.counter(
+            'sentiment_texts_total', 'Texts analyzed, by whether they were scored or reused',
+            ('source',))
+        self.cache_entries = self.registry.gauge(
+            'sentiment_cache_entries', 'Results currently held by the result cache')
+        self.cache_events = self.registry.counter(
+            'sentiment_cache_events_total', 'Result cache events, by type', ('event',))
+        self.cache_hit_rate = self.registry.gauge(
+            'sentiment_cache_hit_rate', 'Fraction of cache lookups that were hits')
+        self.microbatch_fill = self.registry.histogram(
+            'sentiment_microbatch_fill_ratio', 'Micro-batch size as a fraction of the maximum batch size',
+            buckets=FILL_RATIO_BUCKETS)
+        self.queue_seconds = self.registry.histogram(
+            'sentiment_microbatch_queue_seconds', 'Time requests wait in the micro-batch queue')
+        self.queue_depth = self.registry.gauge(
+            'sentiment_microbatch_queue_depth', 'Requests waiting in the micro-batch queue')
+        self.rejections = self.registry.counter(
+            'sentiment_rejected_requests_total', 'Requests turned away by back-pressure, by reason',
+            ('reason',))
+        self.model_info = self.registry.gauge(
+            'sentiment_model_info', 'Model version being served (always 1)', ('version', 'engine'))
+        self.profiler = ProfileSampler(profile_every) if profile_every else None
+
+    def observe_stages(self, stage_seconds):
+        """
+        Record the stage timings of one batch.
+
+        Args:
+            stage_seconds (dict): Seconds per stage name
+        """
+        for stage, seconds in stage_seconds.items():
+            self.stage_seconds.observe(seconds, stage)
+
+    def observe_stage(self, stage, seconds):
+        """Record one stage timing."""
+        self.stage_seconds.observe(seconds, stage)
+
+    def observe_batch(self, requested, scored):
+        """
+        Record an analyzed batch.
+
+        Args:
+            requested (int): Texts in the batch
+            scored (int): Texts actually scored (the rest came from the cache
+                or were duplicates within the batch)
+        """
+        self.batch_texts.observe(requested)
+        self.texts.inc('scored', amount=scored)
+        self.texts.inc('reused', amount=requested - scored)
+
+    def observe_request(self, endpoint, status, seconds):
+        """Record a handled HTTP request."""
+        self.requests.inc(endpoint, str(status))
+        self.request_seconds.observe(seconds, endpoint)
+
+    def observe_microbatch(self, size, capacity, queue_delays):
+        """
+        Record a scored micro-batch.
+
+        Args:
+            size (int): Texts in the batch
+            capacity (int): Maximum batch size
+            queue_delays (list): Seconds each text waited in the queue
+        """
+        self.microbatch_fill.observe(size / capacity)
+        for delay in queue_delays:
+            self.queue_seconds.observe(delay)
+
+    def observe_rejection(self, reason):
+        """Record a request turned away by back-pressure (e.g. 'queue_full', 'timeout')."""
+        self.rejections.inc(reason)
+
+    def observe_cache_event(self, event, count=1):
+        """Record result cache events ('hits', 'misses', 'evictions', 'expirations' or 'invalidations')."""
+        self.cache_events.inc(event, amount=count)
+
+    def start_profile(self):
+        """Start profiling the current request if it is sampled (see ProfileSampler)."""
+        return self.profiler.start() if self.profiler is not None else None
+
+    def stop_profile(self, profiler):
+        """Stop a profiler returned by start_profile."""
+        if profiler is not None:
+            self.profiler.stop(profiler)
+
+    def render(self, analyzer=None, scheduler=None):
+        """
+        Render the metrics, refreshing the analyzer and scheduler gauges first.
+
+        Args:
+            analyzer (BlockchainVotingSentimentAnalyzer): Serving analyzer, if loaded
+            scheduler (MicroBatchScheduler): Micro-batch scheduler, if enabled
+
+        Returns:
+            str: Prometheus exposition text
+        """
+        self.refresh(analyzer, scheduler)
+        return self.registry.render()
+
+    def to_dict(self, analyzer=None, scheduler=None):
+        """Serialize the metrics after refreshing the gauges (see MetricsRegistry.merged)."""
+        self.refresh(analyzer, scheduler)
+        return self.registry.to_dict()
+
+    def refresh(self, analyzer=None, scheduler=None):
+        """Update the gauges read from the analyzer and scheduler."""
+        if scheduler is not None:
+            self.queue_depth.set(scheduler.stats()['queue_depth'])
+        if analyzer is not None:
+            self.model_info.clear()
+            self.model_info.set(1, analyzer.model_version,
+                                'compiled' if analyzer.engine is not None else 'sklearn')
+            if analyzer.result_cache is not None:
+                stats = analyzer.result_cache.stats()
+                self.cache_entries.set(stats['size'])
+                self.cache_hit_rate.set(stats['hit_rate'])
+
+
+class NullMetrics:
+    """
+    Disabled metrics: every method is a no-op.
+    """
+
+    enabled = False
+    profiler = None
+
+    def observe_stages(self, stage_seconds):
+        pass
+
+    def observe_stage(self, stage, seconds):
+        pass
+
+    def observe_batch(self, requested, scored):
+        pass
+
+    def observe_request(self, endpoint, status, seconds):
+        pass
+
+    def observe_microbatch(self, size, capacity, queue_delays):
+        pass
+
+    def observe_rejection(self, reason):
+        pass
+
+    def observe_cache_event(self, event, count=1):
+        pass
+
+    def start_profile(self):
+        return None
+
+    def stop_profile(self, profiler):
+        pass
+
+    def render(self, analyzer=None, scheduler=None):
+        return ''
+
+    def to_dict(self, analyzer=None, scheduler=None):
+        return []
+
+
+# Shared disabled instance
+NULL_METRICS = NullMetrics()
+
@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Online statistics for the Sentiment Analysis Model
+
+Sentiment statistics are accumulated as results are produced instead of
+being recomputed from the full result history. Every structure here updates
+in O(1) per result, keeps bounded memory, and can be merged with the same
+structure from another batch or worker process (see to_dict/from_dict).
+
+    SentimentStatistics    totals behind get_sentiment_statistics
+    RollupStatistics       all-time totals plus minute and hour buckets
+    StatisticsAggregator   overall and per-topic rollups for the API server
+"""
+
+import heapq
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Sentiment labels reported in the distribution
+SENTIMENT_NAMES = ("positive", "neutral", "negative")
+
+# Number of terms tracked per polarity by the heavy-hitters summary
+TERM_CAPACITY = 128
+
+# Windows served by StatisticsAggregator.snapshot, in seconds
+WINDOWS = {"5m": 300, "1h": 3600, "1d": 86400}
+
+# Bucket resolutions and how long buckets are kept
+MINUTE_BUCKET_SECONDS = 60
+MINUTE_BUCKET_RETENTION = 3600
+HOUR_BUCKET_SECONDS = 3600
+HOUR_BUCKET_RETENTION = 86400
+
+
+class HeavyHitters:
+    """
+    Bounded top-terms counter (Space-Saving summary).
+
+    Counts are exact while fewer than ``capacity`` distinct terms have been
+    seen; the lexicon is smaller than the default capacity, so in practice
+    the reported top terms match a full Counter. Once full, a new term
+    replaces the least frequent one and inherits its count, which bounds the
+    overestimate of any reported count by the smallest tracked count.
+
+    Terms are grouped in buckets by count (the stream-summary structure), and
+    a heap of bucket counts with lazy invalidation finds the least frequent
+    bucket, so no update ever scans the tracked terms.
+    """
+
+    def __init__(self, capacity=TERM_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        # count -> terms with that count, oldest first; heap of bucket counts,
+        # possibly holding counts whose bucket has since emptied
+        self._buckets = {}
+        self._heap = []
+
+    def _bucket_add(self, term, count):
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = self._buckets[count] = {}
+            heapq.heappush(self._heap, count)
+        bucket[term] = None
+
+    def _bucket_remove(self, term, count):
+        bucket = self._buckets[count]
+        del bucket[term]
+        if not bucket:
+            del self._buckets[count]
+            # Empty buckets stay in the heap until they surface; rebuild it
+            # before the stale entries outnumber the live ones
+            if len(self._heap) > 2 * len(self._buckets) + 16:
+                self._heap = list(self._buckets)
+                heapq.heapify(self._heap)
+
+    def _least_frequent(self):
+        """The oldest term in the lowest-count bucket."""
+        heap = self._heap
+        while heap[0] not in self._buckets:
+            heapq.heappop(heap)
+        return next(iter(self._buckets[heap[0]]))
+
+    def _rebuild(self):
+        """Recreate the buckets and heap from ``counts``."""
+        self._buckets = {}
+        self._heap = []
+        for term, count in self.counts.items():
+            self._bucket_add(term, count)
+
+    def add(self, term, count=1):
+        """Count one or more occurrences of a term."""
+        counts = self.counts
+        previous = counts.get(term)
+        if previous is not None:
+            self._bucket_remove(term, previous)
+            counts[term] = previous + count
+        elif len(counts) < self.capacity:
+            counts[term] = count
+        else:
+            victim = self._least_frequent()
+            inherited = counts.pop(victim)
+            self._bucket_remove(victim, inherited)
+            counts[term] = inherited + count
+        self._bucket_add(term, counts[term])
+
+    def update(self, terms):
+        """Count every term in an iterable."""
+        for term in terms:
+            self.add(term)
+
+    def merge(self, other):
+        """Add the counts of another summary, keeping the top ``capacity`` terms."""
+        counts = self.counts
+        for term, count in other.counts.items():
+            counts[term] = counts.get(term, 0) + count
+        if len(counts) > self.capacity:
+            kept = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:self.capacity]
+            kept_terms = {term for term, _ in kept}
+            self.counts = {term: count for term, count in counts.items() if term in kept_terms}
+        self._rebuild()
+
+    def most_common(self, n=None):
+        """List the most frequent terms, ties kept in first-seen order (like Counter)."""
+        return Counter(self.counts).most_common(n)
+
+
+class SentimentStatistics:
+    """
+    Running totals for sentiment statistics.
+
+    Results can be added one at a time or in chunks and summaries can be
+    merged, so statistics over a stream of results need bounded memory.
+    """
+
+    def __init__(self, term_capacity=TERM_CAPACITY):
+        self.sentiment_counts = Counter()
+        self.confidence_sum = 0
+        self.positive_terms = HeavyHitters(term_capacity)
+        self.negative_terms = HeavyHitters(term_capacity)
+
+    @property
+    def total(self):
+        """Number of results added so far."""
+        return sum(self.sentiment_counts.values())
+
+    def add(self, result):
+        """
+        Add a single analysis result.
+
+        Args:
+            result (dict): Sentiment analysis result
+        """
+        self.sentiment_counts[result["sentiment"]] += 1
+        self.confidence_sum += result["confidence"]
+        self.positive_terms.update(result["key_terms"]["positive"])
+        self.negative_terms.update(result["key_terms"]["negative"])
+
+    def update(self, analysis_results):
+        """
+        Add analysis results to the running totals.
+
+        Args:
+            analysis_results (list): List of sentiment analysis results
+
+        Returns:
+            SentimentStatistics: These statistics, for chaining
+        """
+        for result in analysis_results:
+            self.add(result)
+        return self
+
+    def merge(self, other):
+        """
+        Add the totals of another SentimentStatistics.
+
+        Args:
+            other (SentimentStatistics): Statistics from another batch or worker
+
+        Returns:
+            SentimentStatistics: These statistics, for chaining
+        """
+        self.sentiment_counts.update(other.sentiment_counts)
+        self.confidence_sum += other.confidence_sum
+        self.positive_terms.merge(other.positive_terms)
+        self.negative_terms.merge(other.negative_terms)
+        return self
+
+    def summary(self):
+        """
+        Build the statistics dictionary for the results added so far.
+
+        Returns:
+            dict: Statistics about the sentiment distribution
+        """
+        sentiment_counts = self.sentiment_counts
+        total = self.total
+
+        statistics = {
+            "total_analyzed": total,
+            "sentiment_distribution": {
+                name: {
+                    "count": sentiment_counts.get(name, 0),
+                    "percentage": round(sentiment_counts.get(name, 0) / total * 100 if total else 0, 1)
+                }
+                for name in SENTIMENT_NAMES
+            }
+        }
+
+        # Add overall sentiment score (weighted average)
+        weighted_sum = sentiment_counts.get("positive", 0) - sentiment_counts.get("negative", 0)
+        statistics["overall_sentiment_score"] = round(weighted_sum / total if total else 0, 2)
+
+        # Calculate average confidence score
+        avg_confidence = self.confidence_sum / total if total else 0
+        statistics["average_confidence"] = round(avg_confidence, 2)
+
+        # Add most common positive and negative terms
+        statistics["most_common_terms"] = {
+            "positive": [term for term, _ in self.positive_terms.most_common(10)],
+            "negative": [term for term, _ in self.negative_terms.most_common(10)]
+        }
+
+        return statistics
+
+    def to_dict(self):
+        """
+        Serialize the totals so another process can merge them.
+
+        Returns:
+            dict: JSON-serializable totals
+        """
+        return {
+            "sentiment_counts": dict(self.sentiment_counts),
+            "confidence_sum": float(self.confidence_sum),
+            "positive_terms": dict(self.positive_terms.counts),
+            "negative_terms": dict(self.negative_terms.counts)
+        }
+
+    @classmethod
+    def from_dict(cls, data, term_capacity=TERM_CAPACITY):
+        """
+        Rebuild statistics serialized with to_dict.
+
+        Args:
+            data (dict): Output of to_dict
+            term_capacity (int): Terms tracked per polarity
+
+        Returns:
+            SentimentStatistics: The restored statistics
+        """
+        statistics = cls(term_capacity)
+        statistics.sentiment_counts.update(data["sentiment_counts"])
+        statistics.confidence_sum = data["confidence_sum"]
+        for term, count in data["positive_terms"].items():
+            statistics.positive_terms.add(term, count)
+        for term, count in data["negative_terms"].items():
+            statistics.negative_terms.add(term, count)
+        return statistics
+
+
+class RollupStatistics:
+    """
+    All-time statistics plus time-bucketed rollups.
+
+    Results are counted in one-minute buckets kept for an hour and in
+    one-hour buckets kept for a day, so the last 5 minutes, hour and day can
+    be summarized by merging a bounded number of buckets.
+    """
+
+    def __init__(self):
+        self.all_time = SentimentStatistics()
+        self.minute_buckets = OrderedDict()
+        self.hour_buckets = OrderedDict()
+
+    @staticmethod
+    def _bucket(buckets, start, retention, now):
+        """Return the bucket starting at ``start``, expiring buckets older than ``retention``."""
+        while buckets:
+            oldest = next(iter(buckets))
+            if oldest > now - retention:
+                break
+            del buckets[oldest]
+
+        statistics = buckets.get(start)
+        if statistics is None:
+            newest = next(reversed(buckets), None)
+            statistics = buckets[start] = SentimentStatistics()
+            if newest is not None and start < newest:
+                # Late result for an older bucket: restore chronological order
+                for key in sorted(buckets):
+                    buckets.move_to_end(key)
+        return statistics
+
+    def add(self, result, timestamp):
+        """
+        Add a single analysis result.
+
+        Args:
+            result (dict): Sentiment analysis result
+            timestamp (float): Unix time the result was produced
+        """
+        self.all_time.add(result)
+        if timestamp is None:
+            return
+        minute = timestamp - timestamp % MINUTE_BUCKET_SECONDS
+        hour = timestamp - timestamp % HOUR_BUCKET_SECONDS
+        self._bucket(self.minute_buckets, minute, MINUTE_BUCKET_RETENTION, timestamp).add(result)
+        self._bucket(self.hour_buckets, hour, HOUR_BUCKET_RETENTION, timestamp).add(result)
+
+    def window(self, seconds, now):
+        """
+        Merge the buckets covering the last ``seconds`` seconds.
+
+        Windows up to an hour use minute buckets, longer ones hour buckets,
+        so a window may include up to one bucket's worth of older results.
+
+        Args:
+            seconds (float): Window length
+            now (float): Unix time the window ends at
+
+        Returns:
+            SentimentStatistics: Statistics for the window
+        """
+        if seconds <= MINUTE_BUCKET_RETENTION:
+            buckets, width = self.minute_buckets, MINUTE_BUCKET_SECONDS
+        else:
+            buckets, width = self.hour_buckets, HOUR_BUCKET_SECONDS
+
+        merged = SentimentStatistics()
+        for start, statistics in buckets.items():
+            if start + width > now - seconds:
+                merged.merge(statistics)
+        return merged
+
+    def merge(self, other):
+        """Add the totals and buckets of another RollupStatistics."""
+        self.all_time.merge(other.all_time)
+        for mine, theirs in ((self.minute_buckets, other.minute_buckets),
+                             (self.hour_buckets, other.hour_buckets)):
+            for start, statistics in theirs.items():
+                if start in mine:
+                    mine[start].merge(statistics)
+                else:
+                    mine[start] = SentimentStatistics().merge(statistics)
+            for key in sorted(mine):
+                mine.move_to_end(key)
+        return self
+
+    def to_dict(self):
+        """Serialize the totals and buckets so another process can merge them."""
+        return {
+            "all_time": self.all_time.to_dict(),
+            "minute_buckets": {str(start): s.to_dict() for start, s in self.minute_buckets.items()},
+            "hour_buckets": {str(start): s.to_dict() for start, s in self.hour_buckets.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild rollups serialized with to_dict."""
+        rollup = cls()
+        rollup.all_time = SentimentStatistics.from_dict(data["all_time"])
+        for name in ("minute_buckets", "hour_buckets"):
+            buckets = getattr(rollup, name)
+            for start in sorted(data[name], key=float):
+                buckets[float(start)] = SentimentStatistics.from_dict(data[name][start])
+        return rollup
+
+
+class StatisticsAggregator:
+    """
+    Thread-safe overall and per-topic sentiment rollups for the API server.
+
+    Handlers record every result they return; /statistics serves snapshots
+    from these totals without rescoring anything.
+    """
+
+    def __init__(self, max_topics=1000):
+        """
+        Initialize empty rollups.
+
+        Args:
+            max_topics (int): Maximum number of topics tracked separately;
+                results for further topics only count towards the overall totals
+        """
+        self.max_topics = max_topics
+        self.overall = RollupStatistics()
+        self.topics = {}
+        self._lock = threading.Lock()
+
+    def record(self, analysis_results, topic=None, timestamp=None):
+        """
+        Record analysis results.
+
+        Args:
+            analysis_results (list): List of sentiment analysis results
+            topic (str): Topic the results belong to, if any
+            timestamp (float): Unix time of the results (defaults to now)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            rollups = [self.overall]
+            if topic is not None:
+                topic_rollup = self.topics.get(topic)
+                if topic_rollup is None and len(self.topics) < self.max_topics:
+                    topic_rollup = self.topics[topic] = RollupStatistics()
+                if topic_rollup is not None:
+                    rollups.append(topic_rollup)
+
+            for result in analysis_results:
+                for rollup in rollups:
+                    rollup.add(result, timestamp)
+
+    def snapshot(self, topic=None, window=None, now=None):
+        """
+        Summarize the recorded results.
+
+        Args:
+            topic (str): Restrict to one topic (None for all results)
+            window (str): One of WINDOWS (None for all time)
+            now (float): Unix time the window ends at (defaults to now)
+
+        Returns:
+            dict: Statistics in the get_sentiment_statistics format, or None
+                if the topic is unknown
+        """
+        if window is not None and window not in WINDOWS:
+            raise ValueError(f"Unknown window '{window}'. Use one of: {', '.join(WINDOWS)}")
+
+        now = time.time() if now is None else now
+        with self._lock:
+            rollup = self.overall if topic is None else self.topics.get(topic)
+            if rollup is None:
+                return None
+            statistics = rollup.all_time if window is None else rollup.window(WINDOWS[window], now)
+            return statistics.summary()
+
+    def topic_names(self):
+        """List the topics with recorded results."""
+        with self._lock:
+            return sorted(self.topics)
+
+    def merge(self, other):
+        """Add the rollups of another aggregator (e.g. from another worker)."""
+        with self._lock:
+            self.overall.merge(other.overall)
+            for topic, rollup in other.topics.items():
+                if topic in self.topics:
+                    self.topics[topic].merge(rollup)
+                elif len(self.topics) < self.max_topics:
+                    self.topics[topic] = RollupStatistics().merge(rollup)
+        return self
+
+    def to_dict(self):
+        """Serialize every rollup so another process can merge them."""
+        with self._lock:
+            return {
+                "overall": self.overall.to_dict(),
+                "topics": {topic: rollup.to_dict() for topic, rollup in self.topics.items()}
+            }
+
+    @classmethod
+    def from_dict(cls, data, max_topics=1000):
+        """Rebuild an aggregator serialized with to_dict."""
+        aggregator = cls(max_topics)
+        aggregator.overall = RollupStatistics.from_dict(data["overall"])
+        for topic, rollup in data["topics"].items():
+            aggregator.topics[topic] = RollupStatistics.from_dict(rollup)
+        return aggregator
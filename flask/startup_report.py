@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Cold-start timing report for the Sentiment Analysis API
+
+Reports how long the serving process takes to become ready, broken down into
+module imports (measured with ``python -X importtime`` in a fresh
+interpreter), NLTK resource loading and model loading:
+
+    python startup_report.py --top 15
+    python startup_report.py --json --budget 3.0
+
+With --budget the command exits non-zero when the total cold start exceeds
+the given number of seconds, so regressions fail the build.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_breakdown(module='sentiment', top=15):
+    """
+    Measure the import time of a module and its top-level dependencies.
+
+    Args:
+        module (str): Module to import in a fresh interpreter
+        top (int): Number of top-level imports to report
+
+    Returns:
+        dict: Total import seconds and the slowest top-level imports
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=HERE, capture_output=True, text=True, check=True
+    )
+
+    # Lines look like "import time: self [us] | cumulative | <indent>package",
+    # two spaces of indent per nesting level, children listed before their
+    # parent; keep the direct imports of the measured module
+    total = 0.0
+    children = []
+    direct_imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative) / 1e6))
+        elif depth == 0:
+            if name.strip() == module:
+                total = int(cumulative) / 1e6
+                direct_imports = children
+            children = []
+
+    direct_imports.sort(key=lambda item: item[1], reverse=True)
+    return {
+        "module": module,
+        "total_seconds": round(total, 4),
+        "slowest_imports": [
+            {"module": name, "cumulative_seconds": round(seconds, 4)}
+            for name, seconds in direct_imports[:top]
+        ]
+    }
+
+
+def serving_startup(model_path=None):
+    """
+    Time the in-process startup of the API server.
+
+    Args:
+        model_path (str): Model directory to load (defaults to the published one)
+
+    Returns:
+        dict: Seconds spent in each startup stage
+    """
+    sys.path.insert(0, HERE)
+    started = time.perf_counter()
+    import sentiment
+    import_seconds = time.perf_counter() - started
+
+    analyzer = sentiment.load_analyzer(model_path or sentiment.MODEL_DIR, watch=False)
+    stages = {"module_import": import_seconds}
+    stages.update(analyzer.startup_timings)
+    stages["total"] = time.perf_counter() - started
+    return {name: round(seconds, 4) for name, seconds in stages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the sentiment API cold-start time.")
+    parser.add_argument('--model-dir', default=None, help="Model directory to load")
+    parser.add_argument('--top', type=int, default=15, help="Number of slow imports to list")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument('--budget', type=float, default=None,
+                        help="Fail when the total startup exceeds this many seconds")
+    args = parser.parse_args()
+
+    report = {
+        "imports": import_breakdown(top=args.top),
+        "startup": serving_startup(args.model_dir)
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Fresh-interpreter import of sentiment: {report['imports']['total_seconds']:.3f}s")
+        for entry in report['imports']['slowest_imports']:
+            print(f"  {entry['cumulative_seconds']:8.3f}s  {entry['module']}")
+        print("\nServing startup stages:")
+        for stage, seconds in report['startup'].items():
+            print(f"  {seconds:8.3f}s  {stage}")
+
+    if args.budget is not None and report['startup']['total'] > args.budget:
+        print(f"\nStartup took {report['startup']['total']:.3f}s, over the {args.budget:.3f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
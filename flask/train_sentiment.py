@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Offline training command for the Sentiment Analysis Model
+
+Trains the sentiment pipeline and publishes it as a new versioned artifact
+that the API server (sentiment.py) loads at startup. Run this at build or
+deploy time, never inside the serving process:
+
+    python train_sentiment.py --model-dir models
+
+The serving process never downloads NLTK corpora. Bundle them once, next to
+the code, with:
+
+    python train_sentiment.py --download-only
+"""
+
+import argparse
+import json
+
+from model_artifacts import MODEL_DIR, publish_version, write_compact_engine, write_model_artifact
+from sentiment import NLTK_DATA_DIR, NLTK_RESOURCES, BlockchainVotingSentimentAnalyzer
+
+
+def download_nltk_resources(data_dir=NLTK_DATA_DIR):
+    """
+    Download the NLTK corpora used by the analyzer into the bundled directory.
+
+    Args:
+        data_dir (str): Directory the API server resolves NLTK data from
+    """
+    import nltk
+
+    for resource in NLTK_RESOURCES:
+        if not nltk.download(resource, download_dir=data_dir, quiet=True):
+            raise RuntimeError(f"Failed to download NLTK resource '{resource}'")
+        print(f"Downloaded NLTK resource '{resource}' to {data_dir}")
+
+
+def train_and_publish(model_dir=MODEL_DIR, publish=True, compact=True):
+    """
+    Train the sentiment pipeline and write it as a versioned artifact.
+
+    Args:
+        model_dir (str): Model directory to write the artifact into
+        publish (bool): Whether to point CURRENT at the new version
+        compact (bool): Whether to add the compact serving format (when the
+            pipeline compiles exactly)
+
+    Returns:
+        dict: Manifest of the written artifact
+    """
+    analyzer = BlockchainVotingSentimentAnalyzer(load_pretrained=False, cache_size=0)
+    manifest = write_model_artifact(
+        analyzer.pipeline,
+        model_dir,
+        metadata={"trainer": "BlockchainVotingSentimentAnalyzer", "evaluation": analyzer.training_report},
+        publish=False
+    )
+    # Added before publishing, so servers never load the version without it
+    if compact and analyzer.engine is not None:
+        manifest = write_compact_engine(analyzer.engine, model_dir, manifest["version"])
+    if publish:
+        publish_version(manifest["version"], model_dir)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish the voting sentiment model.")
+    parser.add_argument('--model-dir', default=MODEL_DIR, help="Versioned model directory")
+    parser.add_argument('--no-publish', action='store_true',
+                        help="Write the artifact without pointing CURRENT at it")
+    parser.add_argument('--no-compact', action='store_true',
+                        help="Do not add the compact serving format to the artifact")
+    parser.add_argument('--download-nltk', action='store_true',
+                        help=f"Download the NLTK corpora into {NLTK_DATA_DIR} before training")
+    parser.add_argument('--download-only', action='store_true',
+                        help="Only download the NLTK corpora, do not train")
+    args = parser.parse_args()
+
+    if args.download_nltk or args.download_only:
+        download_nltk_resources()
+        if args.download_only:
+            return
+
+    manifest = train_and_publish(args.model_dir, publish=not args.no_publish, compact=not args.no_compact)
+    print(f"\nWrote model artifact {manifest['version']} to {args.model_dir}")
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+Cross-worker metrics and statistics for the Sentiment Analysis API
+
+Under gunicorn every worker process keeps its own metrics registry and
+statistics aggregator, so a request to /metrics or /statistics would only
+describe the worker that happened to answer it. Instead, each worker
+publishes its state as a JSON file in a shared directory, every few seconds
+and when it exits:
+
+    <directory>/
+        worker-<pid>.json       state of a running worker
+        exited.json             combined state of every worker that exited
+
+A worker answering /metrics or /statistics publishes its own state and
+merges the other files into the response, so it covers every worker as of
+their last publication (at most SHARED_STATE_SECONDS old). When a worker
+exits, the master folds its last state into exited.json, so counters never
+go backwards and the directory only holds one file per running worker.
+A worker that is killed loses what it recorded since its last publication.
+"""
+
+import json
+import os
+import threading
+
+from file_utils import atomic_write_text
+from sentiment_metrics import MetricsRegistry
+from sentiment_stats import StatisticsAggregator
+
+WORKER_FILE_PREFIX = 'worker-'
+EXITED_FILE = 'exited.json'
+
+
+def _worker_path(directory, pid):
+    """Path of a running worker's state file."""
+    return os.path.join(directory, f"{WORKER_FILE_PREFIX}{pid}.json")
+
+
+def _read_state(path):
+    """Read a state file, or None if it has gone (e.g. its worker just exited)."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def reset_state_directory(directory):
+    """
+    Create the shared directory, dropping the state of a previous server run.
+
+    Args:
+        directory (str): Shared state directory
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name == EXITED_FILE or name.startswith(WORKER_FILE_PREFIX):
+            os.remove(os.path.join(directory, name))
+
+
+def retire_worker(directory, pid):
+    """
+    Fold an exited worker's last state into exited.json (called by the master).
+
+    Args:
+        directory (str): Shared state directory
+        pid (int): Process id of the exited worker
+    """
+    worker = _read_state(_worker_path(directory, pid))
+    if worker is None:
+        return
+    exited = _read_state(os.path.join(directory, EXITED_FILE)) or {"metrics": [], "statistics": None}
+    atomic_write_text(os.path.join(directory, EXITED_FILE), json.dumps(merge_states([(None, exited), (None, worker)])))
+    os.remove(_worker_path(directory, pid))
+
+
+def merge_states(states):
+    """
+    Combine worker states.
+
+    Args:
+        states (list): (worker name or None, state dict) pairs; gauges are
+            only kept for named workers
+
+    Returns:
+        dict: Combined state ('metrics' as MetricsRegistry.to_dict output,
+            'statistics' as StatisticsAggregator.to_dict output or None)
+    """
+    metrics = MetricsRegistry.merged([(worker, state["metrics"]) for worker, state in states])
+    statistics = None
+    for _, state in states:
+        if state["statistics"] is not None:
+            part = StatisticsAggregator.from_dict(state["statistics"])
+            statistics = part if statistics is None else statistics.merge(part)
+    return {"metrics": metrics.to_dict(),
+            "statistics": statistics.to_dict() if statistics is not None else None}
+
+
+class WorkerStatePublisher:
+    """
+    Publishes one worker's state to the shared directory and reads everyone's.
+    """
+
+    def __init__(self, directory, collect, interval):
+        """
+        Args:
+            directory (str): Shared state directory
+            collect (callable): Returns this worker's state, a dict with
+                'metrics' and 'statistics'
+            interval (float): Seconds between publications
+        """
+        self.directory = directory
+        self.collect = collect
+        self.interval = interval
+        self.pid = os.getpid()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self):
+        """
+        Write this worker's current state.
+
+        Returns:
+            dict: The state written
+        """
+        state = self.collect()
+        atomic_write_text(_worker_path(self.directory, self.pid), json.dumps(state))
+        return state
+
+    def start(self):
+        """Publish in the background every interval seconds."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='worker-state', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"Could not publish worker state: {e}")
+
+    def stop(self):
+        """Stop publishing and write the final state."""
+        self._stop.set()
+        self.publish()
+
+    def states(self):
+        """
+        Fresh state of this worker plus the last published state of the others.
+
+        Returns:
+            list: (worker name or None for exited workers, state dict) pairs
+        """
+        states = [(str(self.pid), self.publish())]
+        own_file = os.path.basename(_worker_path(self.directory, self.pid))
+        for name in sorted(os.listdir(self.directory)):
+            if name == own_file or not (name == EXITED_FILE or name.startswith(WORKER_FILE_PREFIX)):
+                continue
+            state = _read_state(os.path.join(self.directory, name))
+            if state is not None:
+                worker = None if name == EXITED_FILE else name[len(WORKER_FILE_PREFIX):-len('.json')]
+                states.append((worker, state))
+        return states
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Blockchain Enhanced Voter Authentication System
+WSGI entry point for the Sentiment Analysis API
+
+Production serving runs the API under gunicorn with several worker
+processes, each handling requests on several threads:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+gunicorn.conf.py preloads this module, so the analyzer is loaded once in the
+master process before the workers are forked. The workers then share the
+model's pages copy-on-write instead of each holding a private copy, and
+start their own scoring pool and model watcher after the fork (see
+sentiment.init_worker_process). Worker and thread counts come from the
+SENTIMENT_WORKERS and SENTIMENT_THREADS environment variables. Each worker
+publishes its metrics and statistics to SENTIMENT_SHARED_STATE_DIR, so
+/metrics and /statistics describe every worker (see worker_state.py).
+"""
+
+import gc
+
+import sentiment
+
+# Load the published model before forking; the scoring pool and the model
+# directory watcher are started in each worker instead, as threads and pools
+# do not survive fork (and the master forks its workers thread-free)
+sentiment.load_analyzer(watch=False, parallel=False)
+
+# Move everything allocated so far out of the garbage collector's reach, so
+# collections in the workers do not write to (and thereby copy) shared pages
+gc.freeze()
+
+application = sentiment.app